@@ -0,0 +1,307 @@
+"""Local stand-in for the Webex REST API endpoints used by webexcortex.
+
+    python -m benchmarks.emulator --port 8990 --latency lognormal:0.05:0.5 --rate-limit 20
+
+Serves /v1/rooms, /v1/memberships and /v1/messages with Link header pagination, a
+configurable latency distribution, per-token rate limiting with 429 and
+Retry-After, and random fault injection. Point the responder at it with the
+`webex_base_url` config, e.g. http://127.0.0.1:8990/v1/.
+"""
+import argparse
+import collections
+import itertools
+import json
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+#region Latency
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """fixed:S, uniform:LO:HI, or lognormal:MEDIAN:SIGMA, all in seconds."""
+    kind, *args = spec.split(":")
+    values = [float(a) for a in args]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        import math
+        mu = math.log(values[0]) if values[0] > 0 else float("-inf")
+        return lambda rng: rng.lognormvariate(mu, values[1]) if values[0] > 0 else 0.0
+    raise ValueError(f"Unknown latency distribution [{spec}]")
+
+#endregion
+
+
+class _Bucket:
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def take(self) -> Optional[float]:
+        """None if the request may pass, otherwise seconds until it may."""
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return None
+        return (1 - self.tokens) / self.rate
+
+
+class Emulator:
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: str = "fixed:0",
+        rate_limit: float = 0.0,
+        fault_rate: float = 0.0,
+        page_size: int = 100,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.latency = parse_latency(latency)
+        self.rate_limit = rate_limit
+        self.fault_rate = fault_rate
+        self.page_size = page_size
+        self.rng = random.Random(seed)
+        self.rooms: Dict[str, Dict[str, Any]] = {}
+        self.memberships: Dict[str, Dict[str, Any]] = {}
+        self.room_memberships: Dict[str, Dict[str, Dict[str, Any]]] = collections.defaultdict(dict)
+        self.room_messages: Dict[str, List[Dict[str, Any]]] = collections.defaultdict(list)
+        self.stats: Dict[str, int] = collections.Counter()
+        self._ids = itertools.count()
+        self._buckets: Dict[str, _Bucket] = {}
+        self._lock = threading.RLock()
+        self.server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1/"
+
+    def start(self) -> "Emulator":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    #region State
+
+    def _id(self, kind: str) -> str:
+        return f"{kind}-{next(self._ids)}"
+
+    def add_room(self, title: str, members: int = 0, messages: int = 0) -> Dict[str, Any]:
+        with self._lock:
+            room = {"id": self._id("room"), "title": title, "type": "group", "isLocked": False}
+            self.rooms[room["id"]] = room
+        for i in range(members):
+            self.add_membership(room["id"], f"user{i}@example.com", isModerator=i == 0)
+        for i in range(messages):
+            files = [f"{self.url}contents/{i}"] if i % 10 == 0 else []
+            self.add_message(room["id"], f"user{i % max(members, 1)}@example.com", f"message {i}", files)
+        return room
+
+    def add_message(self, roomId: str, personEmail: str, text: str, files: Optional[List[str]] = None) -> Dict[str, Any]:
+        with self._lock:
+            messages = self.room_messages[roomId]
+            n = len(messages)
+            message = {
+                "id": self._id("message"),
+                "roomId": roomId,
+                "roomType": "group",
+                "text": text,
+                "personId": f"person-{personEmail}",
+                "personEmail": personEmail,
+                "created": f"2024-01-01T{n // 3600 % 24:02d}:{n // 60 % 60:02d}:{n % 60:02d}.000Z",
+            }
+            if files:
+                message["files"] = list(files)
+            messages.append(message)
+        return message
+
+    def add_membership(self, roomId: str, personEmail: str, isModerator: bool = False) -> Dict[str, Any]:
+        with self._lock:
+            membership = {
+                "id": self._id("membership"),
+                "roomId": roomId,
+                "personId": f"person-{personEmail}",
+                "personEmail": personEmail,
+                "personDisplayName": personEmail.split("@")[0],
+                "isModerator": isModerator,
+                "isMonitor": False,
+            }
+            self.memberships[membership["id"]] = membership
+            self.room_memberships[roomId][membership["id"]] = membership
+        return membership
+
+    #endregion
+
+    def admit(self, token: str) -> Tuple[Optional[int], Dict[str, str]]:
+        """Throttle or fail a request before it is served; (None, {}) lets it through."""
+        if self.rate_limit > 0:
+            with self._lock:
+                bucket = self._buckets.setdefault(token, _Bucket(self.rate_limit))
+                wait = bucket.take()
+            if wait is not None:
+                self.stats["429"] += 1
+                return 429, {"Retry-After": str(max(1, round(wait)))}
+        if self.fault_rate > 0 and self.rng.random() < self.fault_rate:
+            self.stats["fault"] += 1
+            return self.rng.choice([500, 502, 503]), {}
+        return None, {}
+
+    def page(self, endpoint: str, items: List[Dict[str, Any]], query: Dict[str, str]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        size = int(query.get("max", self.page_size))
+        start = int(query.get("cursor", 0))
+        headers = {}
+        if start + size < len(items):
+            next_query = dict(query, max=str(size), cursor=str(start + size))
+            headers["Link"] = f'<{self.url}{endpoint}?{urllib.parse.urlencode(next_query)}>; rel="next"'
+        return {"items": items[start:start + size]}, headers
+
+    def serve(self, method: str, path: str, query: Dict[str, str], body: Dict[str, Any]) -> Tuple[int, Any, Dict[str, str]]:
+        parts = [p for p in path.split("/") if p][1:]  # drop the version
+        endpoint = parts[0] if len(parts) > 0 else ""
+        self.stats[f"{method} /{endpoint}{'/{id}' if len(parts) > 1 else ''}"] += 1
+
+        with self._lock:
+            if endpoint == "rooms":
+                if method == "POST" and len(parts) == 1:
+                    return 200, self.add_room(body.get("title", "")), {}
+                if method == "GET" and len(parts) == 1:
+                    rooms = [r for r in self.rooms.values() if query.get("type") in (None, r["type"])]
+                    if query.get("sortBy") == "created":
+                        rooms.reverse()
+                    return (200, *self.page("rooms", rooms, query))
+                room = self.rooms.get(parts[1]) if len(parts) > 1 else None
+                if room is None:
+                    return 404, {"message": "The requested resource could not be found."}, {}
+                if method == "GET":
+                    return 200, room, {}
+                if method == "DELETE":
+                    del self.rooms[room["id"]]
+                    for membership_id in self.room_memberships.pop(room["id"], {}):
+                        del self.memberships[membership_id]
+                    self.room_messages.pop(room["id"], None)
+                    return 204, None, {}
+
+            if endpoint == "messages" and method == "GET" and len(parts) == 1:
+                if query.get("roomId") not in self.rooms:
+                    return 404, {"message": "Room not found."}, {}
+                # Newest first, like Webex
+                return (200, *self.page("messages", self.room_messages[query["roomId"]][::-1], query))
+
+            if endpoint == "memberships":
+                if method == "POST" and len(parts) == 1:
+                    if body.get("roomId") not in self.rooms:
+                        return 404, {"message": "Room not found."}, {}
+                    mail = str(body.get("personEmail", "")).casefold()
+                    if any(m["personEmail"].casefold() == mail for m in self.room_memberships[body["roomId"]].values()):
+                        return 409, {"message": "Person is already in the room."}, {}
+                    return 200, self.add_membership(body["roomId"], body["personEmail"], bool(body.get("isModerator"))), {}
+                if method == "GET" and len(parts) == 1:
+                    memberships = [
+                        m for m in self.room_memberships.get(query.get("roomId"), {}).values()
+                        if "personEmail" not in query or m["personEmail"].casefold() == query["personEmail"].casefold()
+                    ]
+                    return (200, *self.page("memberships", memberships, query))
+                membership = self.memberships.get(parts[1]) if len(parts) > 1 else None
+                if membership is None:
+                    return 404, {"message": "The requested resource could not be found."}, {}
+                if method == "GET":
+                    return 200, membership, {}
+                if method == "DELETE":
+                    del self.memberships[membership["id"]]
+                    del self.room_memberships[membership["roomId"]][membership["id"]]
+                    return 204, None, {}
+
+        return 404, {"message": f"Unsupported endpoint {method} {path}"}, {}
+
+
+def _make_handler(emulator: Emulator):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _handle(self, method: str):
+            url = urllib.parse.urlsplit(self.path)
+            query = dict(urllib.parse.parse_qsl(url.query))
+            length = int(self.headers.get("Content-Length", 0))
+            raw = self.rfile.read(length) if length > 0 else b""
+            body = json.loads(raw) if len(raw) > 0 else {}
+
+            time.sleep(emulator.latency(emulator.rng))
+
+            status, headers = emulator.admit(self.headers.get("Authorization", ""))
+            payload = {"message": "Too Many Requests" if status == 429 else "Injected fault"}
+            if status is None:
+                status, payload, headers = emulator.serve(method, url.path, query, body)
+
+            data = json.dumps(payload).encode() if payload is not None else b""
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(data)))
+            self.send_header("TrackingID", f"EMULATOR_{id(self)}")
+            if len(data) > 0:
+                self.send_header("Content-Type", "application/json;charset=UTF-8")
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._handle("GET")
+
+        def do_POST(self):
+            self._handle("POST")
+
+        def do_PUT(self):
+            self._handle("PUT")
+
+        def do_DELETE(self):
+            self._handle("DELETE")
+
+    return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8990)
+    parser.add_argument("--latency", default="fixed:0", help="fixed:S, uniform:LO:HI or lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="requests per second per token, 0 for none")
+    parser.add_argument("--fault-rate", type=float, default=0.0, help="fraction of requests failing with 5xx")
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    emulator = Emulator(args.host, args.port, args.latency, args.rate_limit, args.fault_rate, args.page_size)
+    print(f"Webex emulator on {emulator.url}", flush=True)
+    try:
+        emulator.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
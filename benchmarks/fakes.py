@@ -0,0 +1,168 @@
+"""In-memory stand-ins for the Webex rooms, memberships and messages APIs.
+
+They follow the RoomsAPI/MembershipsAPI/MessagesAPI protocols of webexcortex.client, page
+listings like the SDK does and sleep `latency` seconds per request.
+"""
+import itertools
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+
+class FakeRoom:
+    __slots__ = ("id", "title")
+
+    def __init__(self, id: str, title: str) -> None:
+        self.id = id
+        self.title = title
+
+
+class FakeMembership:
+    __slots__ = ("id", "roomId", "personEmail", "personDisplayName", "isModerator")
+
+    def __init__(self, id: str, roomId: str, personEmail: str, personDisplayName: str, isModerator: bool) -> None:
+        self.id = id
+        self.roomId = roomId
+        self.personEmail = personEmail
+        self.personDisplayName = personDisplayName
+        self.isModerator = isModerator
+
+
+class FakeMessage:
+    __slots__ = ("id", "roomId", "created", "personEmail", "text", "files", "parentId")
+
+    def __init__(self, id: str, roomId: str, created: str, personEmail: str, text: str, files: List[str]) -> None:
+        self.id = id
+        self.roomId = roomId
+        self.created = created
+        self.personEmail = personEmail
+        self.text = text
+        self.files = files
+        self.parentId = None
+
+
+class FakeWebex:
+    """Shared state behind the fake APIs, with a request counter."""
+
+    def __init__(self, latency: float = 0.0, page_size: int = 100) -> None:
+        self.latency = latency
+        self.page_size = page_size
+        self.requests = 0
+        self.rooms: Dict[str, FakeRoom] = {}
+        self.memberships: Dict[str, Dict[str, FakeMembership]] = {}
+        self.messages: Dict[str, List[FakeMessage]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.rooms_api = FakeRoomsAPI(self)
+        self.memberships_api = FakeMembershipsAPI(self)
+        self.messages_api = FakeMessagesAPI(self)
+
+    def request(self):
+        with self._lock:
+            self.requests += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def new_id(self, prefix: str) -> str:
+        with self._lock:
+            return f"{prefix}{next(self._ids)}"
+
+    def pages(self, items: List, page_size: Optional[int] = None) -> Iterator:
+        page_size = page_size or self.page_size
+        for start in range(0, max(len(items), 1), page_size):
+            self.request()
+            yield from items[start:start + page_size]
+
+    def add_room(self, title: str, members: int = 0, moderators: int = 1, messages: int = 0) -> FakeRoom:
+        room = FakeRoom(self.new_id("room"), title)
+        self.rooms[room.id] = room
+        self.memberships[room.id] = {}
+        self.messages[room.id] = []
+        for i in range(members):
+            self.add_membership(room.id, f"user{i}@example.com", isModerator=i < moderators)
+        for i in range(messages):
+            self.add_message(room.id, f"user{i % max(members, 1)}@example.com", f"message {i}", files=[f"https://files/{i}"] if i % 10 == 0 else [])
+        return room
+
+    def add_message(self, roomId: str, personEmail: str, text: str, files: Optional[List[str]] = None) -> FakeMessage:
+        with self._lock:
+            n = len(self.messages[roomId])
+            message = FakeMessage(
+                id=f"message{next(self._ids)}",
+                roomId=roomId,
+                created=f"2024-01-01T00:00:{n % 60:02d}.{n:06d}Z",
+                personEmail=personEmail,
+                text=text,
+                files=files or [],
+            )
+            self.messages[roomId].append(message)
+        return message
+
+    def add_membership(self, roomId: str, personEmail: str, isModerator: bool = False) -> FakeMembership:
+        membership = FakeMembership(
+            id=self.new_id("membership"),
+            roomId=roomId,
+            personEmail=personEmail,
+            personDisplayName=personEmail.split("@")[0],
+            isModerator=isModerator,
+        )
+        with self._lock:
+            self.memberships[roomId][membership.id] = membership
+        return membership
+
+
+class FakeRoomsAPI:
+    def __init__(self, webex: FakeWebex) -> None:
+        self.webex = webex
+
+    def create(self, title: str, teamId: Optional[str] = None) -> FakeRoom:
+        self.webex.request()
+        return self.webex.add_room(title)
+
+    def delete(self, roomId: str) -> None:
+        self.webex.request()
+        del self.webex.rooms[roomId]
+        del self.webex.memberships[roomId]
+        self.webex.messages.pop(roomId, None)
+
+    def list(self, type: str = None, sortBy: Optional[str] = None) -> Iterator[FakeRoom]:
+        rooms = list(self.webex.rooms.values())
+        if sortBy == "created":
+            rooms.reverse()
+        return self.webex.pages(rooms)
+
+    def get(self, roomId: str) -> FakeRoom:
+        self.webex.request()
+        return self.webex.rooms[roomId]
+
+
+class FakeMembershipsAPI:
+    def __init__(self, webex: FakeWebex) -> None:
+        self.webex = webex
+
+    def create(self, roomId: str, personEmail: str, isModerator: bool = False) -> FakeMembership:
+        self.webex.request()
+        return self.webex.add_membership(roomId, personEmail, isModerator)
+
+    def delete(self, membershipId: str) -> None:
+        self.webex.request()
+        with self.webex._lock:
+            for memberships in self.webex.memberships.values():
+                if memberships.pop(membershipId, None) is not None:
+                    return
+        raise KeyError(membershipId)
+
+    def list(self, roomId: str, personEmail: Optional[str] = None) -> Iterator[FakeMembership]:
+        memberships = list(self.webex.memberships[roomId].values())
+        if personEmail is not None:
+            memberships = [m for m in memberships if m.personEmail.casefold() == personEmail.casefold()]
+        return self.webex.pages(memberships)
+
+
+class FakeMessagesAPI:
+    def __init__(self, webex: FakeWebex) -> None:
+        self.webex = webex
+
+    def list(self, roomId: str, max: Optional[int] = None) -> Iterator[FakeMessage]:
+        # Newest first, like Webex
+        return self.webex.pages(self.webex.messages[roomId][::-1], max)
@@ -0,0 +1,76 @@
+"""Cold-start import budget for the console entry point.
+
+    python -m benchmarks.importtime [--budget-ms 60] [--runs 7]
+
+Imports webexcortex.main in fresh interpreters with -X importtime, reports the
+median cumulative time and exits non-zero when it is over budget or when a
+module that should only load on demand was imported.
+"""
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+MODULE = "webexcortex.main"
+
+# Only needed once a job talks to Webex
+LAZY_MODULES = ["webexteamssdk", "requests", "urllib3", "cortexutils", "concurrent.futures"]
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def import_times(module: str = MODULE) -> Dict[str, int]:
+    """Cumulative import time in microseconds of every top level import in a fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match is not None:
+            times[match.group(4)] = int(match.group(2))
+    return times
+
+
+def loaded_modules(module: str = MODULE) -> List[str]:
+    proc = subprocess.run(
+        [sys.executable, "-c", f"import sys, json, {module}; print(json.dumps(sorted(sys.modules)))"],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=60.0)
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args(argv)
+
+    samples = [import_times()[MODULE] / 1000 for _ in range(args.runs)]
+    median = statistics.median(samples)
+    leaked = [m for m in LAZY_MODULES if m in loaded_modules()]
+
+    result = {
+        "module": MODULE,
+        "median_ms": round(median, 2),
+        "min_ms": round(min(samples), 2),
+        "budget_ms": args.budget_ms,
+        "eager_imports": leaked,
+    }
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print(f"{MODULE}: median {median:.1f} ms (min {min(samples):.1f} ms, budget {args.budget_ms:.0f} ms)")
+        for m in leaked:
+            print(f"{m} is imported eagerly")
+
+    return 1 if median > args.budget_ms or len(leaked) > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""Load test the full entry point against the local Webex emulator.
+
+    python -m benchmarks.loaddriver --jobs 200 --concurrency 16 --members 500 --latency lognormal:0.03:0.4
+
+Every job gets its own Cortex job directory and room, and is run through the
+real `webexcortex` entry point and webexteamssdk over HTTP, either as a fresh
+process per job (the way Cortex runs it) or on threads in this process.
+Reports throughput and p50/p99 job latency.
+
+With `--bots N` every job gets the same pool of N bot tokens instead of one of
+four single bots; with `--rate-limit` set, e.g.
+
+    python -m benchmarks.loaddriver --mode thread --actions "Open room" --rate-limit 20 --bots 4
+
+shows how throughput grows with the bots of the pool.
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+import webexcortex
+
+from .emulator import Emulator
+
+ACTIONS = ["Add guests", "Remove guests", "Open room", "Delete room", "Sync guests"]
+
+
+def percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def make_job(root: str, index: int, action: str, roomid: str, base_url: str, guests: int, bots: int = 0) -> str:
+    job = os.path.join(root, f"job-{index}")
+    os.makedirs(os.path.join(job, "input"))
+    config: Dict[str, Any] = {
+        "webex_bot_token": f"token-{index % 4}",
+        "webex_base_url": base_url,
+        "organization": "LOAD",
+        "state_directory": os.path.join(root, "state"),
+    }
+    if bots > 0:
+        config["webex_bot_token"] = "token-0"
+        config["webex_bot_tokens"] = [f"token-{i}" for i in range(bots)]
+    job_input = {
+        "dataType": "thehive:case",
+        "config": config,
+        "data": {
+            "caseId": index,
+            "title": f"load {index}",
+            "owner": "owner@example.com",
+            "tags": [f'wbx="user{i}@example.com"' for i in range(guests)],
+            "customFields": {
+                "webexteams": {"string": action},
+                "webexroomid": {"string": roomid},
+            },
+        },
+    }
+    with open(os.path.join(job, "input", "input.json"), "w") as f:
+        json.dump(job_input, f)
+    return job
+
+
+def _succeeded(job: str) -> bool:
+    try:
+        with open(os.path.join(job, "output", "output.json")) as f:
+            return bool(json.load(f).get("success"))
+    except (OSError, ValueError):
+        return False
+
+
+def run_process(job: str) -> Tuple[float, bool]:
+    env = dict(os.environ)
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(webexcortex.__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(p for p in [package_root, env.get("PYTHONPATH")] if p)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "webexcortex", job], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start, _succeeded(job)
+
+
+def run_thread(job: str) -> Tuple[float, bool]:
+    from webexcortex.main import cached_handler, make_responder, run
+
+    start = time.perf_counter()
+    try:
+        run(make_responder(job), cached_handler)
+    except SystemExit:
+        pass
+    return time.perf_counter() - start, _succeeded(job)
+
+
+def load(
+    emulator: Emulator, jobs: int, concurrency: int, members: int, guests: int, mode: str,
+    bots: int = 0, actions: List[str] = ACTIONS,
+) -> Dict[str, Any]:
+    runner = run_process if mode == "process" else run_thread
+    with tempfile.TemporaryDirectory() as root:
+        job_dirs = []
+        for i in range(jobs):
+            action = actions[i % len(actions)]
+            roomid = "" if action == "Open room" else emulator.add_room(f"LOAD #{i} - load {i}", members=members)["id"]
+            job_dirs.append(make_job(root, i, action, roomid, emulator.url, guests, bots))
+
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(runner, job_dirs))
+        elapsed = time.perf_counter() - start
+
+    latencies = [seconds for seconds, _ in results]
+    result = {
+        "mode": mode,
+        "jobs": jobs,
+        "concurrency": concurrency,
+        "members": members,
+        "guests": guests,
+        "bots": bots,
+        "succeeded": sum(1 for _, ok in results if ok),
+        "seconds": round(elapsed, 3),
+        "throughput_jobs_s": round(jobs / elapsed, 2),
+        "p50_s": round(percentile(latencies, 50), 4),
+        "p99_s": round(percentile(latencies, 99), 4),
+        "mean_s": round(statistics.mean(latencies), 4),
+        "emulator": dict(emulator.stats),
+    }
+    if mode == "thread":
+        from webexcortex import transport
+        result["http"] = transport.stats()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--members", type=int, default=100)
+    parser.add_argument("--guests", type=int, default=5)
+    parser.add_argument("--mode", choices=["process", "thread"], default="process")
+    parser.add_argument("--latency", default="fixed:0.01")
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--fault-rate", type=float, default=0.0)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--bots", type=int, default=0, help="size of the bot token pool of every job, 0 for one of four single bots")
+    parser.add_argument("--actions", default=",".join(ACTIONS), help="comma separated actions the jobs cycle through")
+    args = parser.parse_args(argv)
+
+    with Emulator(latency=args.latency, rate_limit=args.rate_limit, fault_rate=args.fault_rate, page_size=args.page_size) as emulator:
+        result = load(
+            emulator, args.jobs, args.concurrency, args.members, args.guests, args.mode,
+            bots=args.bots, actions=args.actions.split(","),
+        )
+    print(json.dumps(result, indent=2))
+    return 0 if result["succeeded"] == result["jobs"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
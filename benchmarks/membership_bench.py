@@ -0,0 +1,58 @@
+"""Compare the list based membership diff with MembershipIndex as rooms grow.
+
+    python -m benchmarks.membership_bench
+
+Each size doubles the members and the guests; a linear diff roughly doubles its
+time per step, the old quadratic one roughly quadruples it.
+"""
+import timeit
+
+from webexcortex.datatypes import Member, MemberID
+from webexcortex.membership import MembershipIndex
+
+
+def make_members(n: int):
+    return [
+        Member(ID=MemberID(f"id{i}"), Name=f"name{i}", Mail=f"user{i}@mail.com", IsModerator=False)
+        for i in range(n)
+    ]
+
+
+def make_guests(n: int):
+    # Half of the guests are already in the room, in another case
+    return [f"USER{i}@mail.com" for i in range(0, n, 2)] + [f"guest{i}@mail.com" for i in range(n // 2)]
+
+
+def list_diff(members, guests):
+    membermails = [m.Mail.casefold() for m in members]
+    missing = [g for g in guests if g.casefold() not in membermails]
+    present = [m for m in members if m.Mail.casefold() in [g.casefold() for g in guests]]
+    return missing, present
+
+
+def index_diff(members, guests):
+    index = MembershipIndex(members)
+    return index.missing(guests), index.present(guests)
+
+
+def measure(fn, members, guests) -> float:
+    timer = timeit.Timer(lambda: fn(members, guests))
+    loops, _ = timer.autorange()
+    return min(timer.repeat(repeat=3, number=loops)) / loops
+
+
+def main():
+    print(f"{'members':>8} {'guests':>7} {'list (s)':>10} {'index (s)':>10} {'index step':>10}")
+    previous = None
+    for members_count in (625, 1250, 2500, 5000, 10000):
+        guests_count = members_count // 5
+        members, guests = make_members(members_count), make_guests(guests_count)
+        listed = measure(list_diff, members, guests) if members_count <= 5000 else float("nan")
+        indexed = measure(index_diff, members, guests)
+        step = f"{indexed / previous:.2f}x" if previous else "-"
+        print(f"{members_count:>8} {guests_count:>7} {listed:>10.5f} {indexed:>10.5f} {step:>10}")
+        previous = indexed
+
+
+if __name__ == "__main__":
+    main()
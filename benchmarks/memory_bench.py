@@ -0,0 +1,79 @@
+"""Memory held by the member records and the report of a job as rooms grow.
+
+    python -m benchmarks.memory_bench
+
+For each room size it lists the room twice through the client (the same people
+in two rooms), then runs "Remove guests" and "Add guests" against it and
+serializes their reports, whole and streamed, measuring with tracemalloc. The first room pays for
+interning the mails and names, the second one shares them; `dict records` is
+what the members of a room cost as plain dataclasses with a __dict__.
+"""
+import dataclasses
+import json
+import tracemalloc
+from typing import Any, Callable, Tuple
+
+from webexcortex.batch import BatchWorker
+from webexcortex.client import Client
+from webexcortex.handler import Handler
+from webexcortex.output import write_json
+from webexcortex.responder import Request
+
+from .fakes import FakeWebex
+from .suite import job_input
+
+
+class DictMemberID(str): pass
+
+
+@dataclasses.dataclass
+class DictMember:
+    ID: DictMemberID
+    Name: str
+    Mail: str
+    IsModerator: bool
+
+
+class Discard:
+    def write(self, text: str):
+        pass
+
+
+def traced(fn: Callable[[], Any]) -> Tuple[Any, int, int]:
+    """The result of fn, the memory it still holds and the peak while it ran."""
+    tracemalloc.start()
+    try:
+        result = fn()
+        held, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, held, peak
+
+
+def main():
+    print(f"{'members':>8} {'1st room':>10} {'dict records':>13} {'2nd room':>10} {'report peak':>12} {'json peak':>10} {'stream peak':>12}")
+    for members_count in (1000, 10000, 50000):
+        webex = FakeWebex()
+        first = webex.add_room("org #42 - first", members=members_count)
+        second = webex.add_room("org #43 - second", members=members_count)
+        client = Client(room_api=webex.rooms_api, memberships_api=webex.memberships_api)
+
+        members, held, _ = traced(lambda: client.get_members(first.id))
+        _, held_dict, _ = traced(lambda: [DictMember(DictMemberID(m.ID), m.Name, m.Mail, m.IsModerator) for m in members])
+        _, held_second, _ = traced(lambda: client.get_members(second.id))
+
+        handler = Handler(client)
+        remove = Request.parse(BatchWorker(job_input("Remove guests", first.id, members_count // 10, members_count)))
+        add = Request.parse(BatchWorker(job_input("Add guests", second.id, members_count // 10, members_count)))
+        reports, _, report_peak = traced(lambda: [handler.handle(remove), handler.handle(add)])
+        _, _, json_peak = traced(lambda: [json.dumps(report.to_dict()) for report in reports])
+        _, _, stream_peak = traced(lambda: [write_json(Discard(), report.to_records()) for report in reports])
+
+        print(
+            f"{members_count:>8} {held / members_count:>8.0f} B {held_dict / members_count:>11.0f} B "
+            f"{held_second / members_count:>8.0f} B {report_peak / 2**20:>9.2f} MB {json_peak / 2**20:>7.2f} MB {stream_peak / 2**20:>9.2f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
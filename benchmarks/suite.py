@@ -0,0 +1,210 @@
+"""Micro-benchmarks for the handler, request parsing and report serialization.
+
+    python -m benchmarks.suite [--full] [--output results.json] [--compare baseline.json]
+
+Every case runs against the in-memory fakes in benchmarks.fakes, scaled by room
+size, number of guest tags and injected per-request latency. Results are saved
+as JSON; with --compare the run fails when a case got slower than --threshold
+times its baseline.
+"""
+import argparse
+import io
+import itertools
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from webexcortex.batch import BatchWorker
+from webexcortex.client import Client
+from webexcortex.handler import Handler
+from webexcortex.output import write_json
+from webexcortex.responder import Request, Responder
+
+from .fakes import FakeWebex
+
+QUICK = {
+    "members": [10, 1000],
+    "guests": [1, 50],
+    "latency": [0.0],
+}
+
+FULL = {
+    "members": [10, 100, 1000, 10000],
+    "guests": [1, 10, 100, 1000],
+    "latency": [0.0, 0.001],
+}
+
+
+def job_input(action: str, roomid: str = "", guests: int = 0, members: int = 0) -> Dict[str, Any]:
+    # Half of the guests are already members of the room
+    tags = [f'wbx="user{i}@example.com"' for i in range(0, min(guests, members) // 2)]
+    tags += [f'wbx="guest{i}@example.com"' for i in range(guests - len(tags))]
+    return {
+        "config": {"webex_bot_token": "token", "organization": "org"},
+        "data": {
+            "caseId": 42,
+            "title": "benchmark",
+            "owner": "owner@example.com",
+            "tags": ["other"] + tags,
+            "customFields": {
+                "webexteams": {"string": action},
+                "webexroomid": {"string": roomid},
+            },
+        },
+    }
+
+
+#region Cases
+
+# A case prepares fresh state and returns the callable that is timed
+Case = Callable[[int, int, float], Callable[[], Any]]
+
+
+def _handler(webex: FakeWebex) -> Handler:
+    return Handler(client=Client(room_api=webex.rooms_api, memberships_api=webex.memberships_api))
+
+
+def _handler_case(action: str, existing_room: bool = True) -> Case:
+    def setup(members: int, guests: int, latency: float):
+        webex = FakeWebex(latency=latency)
+        roomid = webex.add_room("org #42 - benchmark", members=members).id if existing_room else ""
+        req = Request.parse(BatchWorker(job_input(action, roomid, guests, members)))
+        handler = _handler(webex)
+        return lambda: handler.handle(req)
+    return setup
+
+
+def _parse_case(members: int, guests: int, latency: float):
+    worker = BatchWorker(job_input("Open room", guests=guests))
+    return lambda: Request.parse(worker)
+
+
+def _report_case(members: int, guests: int, latency: float):
+    webex = FakeWebex()
+    room = webex.add_room("org #42 - benchmark", members=members)
+    req = Request.parse(BatchWorker(job_input("Add guests", room.id, guests, members)))
+    report = _handler(webex).handle(req)
+
+    def serialize():
+        worker = BatchWorker({})
+        Responder(worker).report(report)
+        json.dump(worker.output, io.StringIO())
+    return serialize
+
+
+def _stream_case(members: int, guests: int, latency: float):
+    webex = FakeWebex()
+    room = webex.add_room("org #42 - benchmark", members=members)
+    req = Request.parse(BatchWorker(job_input("Add guests", room.id, guests, members)))
+    report = _handler(webex).handle(req)
+
+    class StringOutput:
+        def write(self, output, ensure_ascii=False):
+            write_json(io.StringIO(), output, ensure_ascii=ensure_ascii)
+
+    return lambda: Responder(BatchWorker({}), output=StringOutput()).report(report)
+
+
+CASES: Dict[str, Tuple[Case, List[str]]] = {
+    "handler.create_room": (_handler_case("Open room", existing_room=False), ["guests", "latency"]),
+    "handler.add_guests": (_handler_case("Add guests"), ["members", "guests", "latency"]),
+    "handler.remove_guests": (_handler_case("Remove guests"), ["members", "guests", "latency"]),
+    "handler.sync_guests": (_handler_case("Sync guests"), ["members", "guests", "latency"]),
+    "handler.delete_room": (_handler_case("Delete room"), ["members", "latency"]),
+    "request.parse": (_parse_case, ["guests"]),
+    "responder.report": (_report_case, ["members", "guests"]),
+    "responder.stream": (_stream_case, ["members", "guests"]),
+}
+
+#endregion
+
+
+def _grid(axes: List[str], grid: Dict[str, List]) -> Iterator[Dict[str, Any]]:
+    defaults = {"members": 0, "guests": 0, "latency": 0.0}
+    for values in itertools.product(*[grid[axis] for axis in axes]):
+        params = dict(defaults)
+        params.update(zip(axes, values))
+        yield params
+
+
+def measure(setup: Case, params: Dict[str, Any], repeat: int, min_time: float) -> Dict[str, Any]:
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < repeat or time.perf_counter() < deadline:
+        fn = setup(params["members"], params["guests"], params["latency"])
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+        if len(samples) >= repeat * 20:
+            break
+    return {
+        "median_s": statistics.median(samples),
+        "min_s": min(samples),
+        "runs": len(samples),
+    }
+
+
+def run(grid: Dict[str, List], repeat: int = 5, min_time: float = 0.2, only: str = "") -> List[Dict[str, Any]]:
+    results = []
+    for name, (setup, axes) in CASES.items():
+        if only not in name:
+            continue
+        for params in _grid(axes, grid):
+            result = {"name": name, "params": params}
+            result.update(measure(setup, params, repeat, min_time))
+            results.append(result)
+            print(f"{name:<24} {json.dumps(params):<52} {result['median_s'] * 1000:>10.3f} ms", file=sys.stderr)
+    return results
+
+
+def _key(result: Dict[str, Any]) -> str:
+    return f"{result['name']} {json.dumps(result['params'], sort_keys=True)}"
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float) -> List[str]:
+    previous = {_key(r): r for r in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(_key(result))
+        if before is None or before["median_s"] == 0:
+            continue
+        ratio = result["median_s"] / before["median_s"]
+        if ratio > threshold:
+            regressions.append(f"{_key(result)}: {ratio:.2f}x slower")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--full", action="store_true", help="run the full parameter grid")
+    parser.add_argument("--only", default="", help="run the cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    results = run(FULL if args.full else QUICK, repeat=args.repeat, only=args.only)
+    document = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(document, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f)["results"], args.threshold)
+        for regression in regressions:
+            print(regression)
+        return 1 if len(regressions) > 0 else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
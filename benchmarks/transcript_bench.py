@@ -0,0 +1,55 @@
+"""Time the transcript export of a large room against the local Webex emulator.
+
+    python -m benchmarks.transcript_bench --messages 20000 --latency lognormal:0.05:0.4
+
+Lists the messages of one room through the real webexteamssdk over HTTP and
+writes them to a gzip JSONL transcript, once reading the pages in turn with the
+writer and once with the next page prefetched while the current one is
+compressed. Webex pages messages with a cursor, so the pages of one listing
+cannot be requested in parallel; the gain is the overlap of the two.
+"""
+import argparse
+import tempfile
+import time
+from unittest.mock import patch
+
+from webexcortex.client import MESSAGE_PAGE_SIZE, Client
+from webexcortex.datatypes import Room, RoomID
+from webexcortex.transcript import Transcripts
+from webexcortex.transport import shared_api
+
+from .emulator import Emulator
+
+
+def export(client: Client, room: Room, directory: str) -> float:
+    start = time.perf_counter()
+    transcript = Transcripts(directory).export(room, client.iter_messages(room.ID))
+    elapsed = time.perf_counter() - start
+    print(f"  {transcript.messages} messages, {transcript.files} files, {transcript.bytes / 2**20:.2f} MB")
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--latency", default="lognormal:0.05:0.4")
+    args = parser.parse_args(argv)
+
+    with Emulator(latency=args.latency, page_size=MESSAGE_PAGE_SIZE) as emulator, tempfile.TemporaryDirectory() as directory:
+        created = emulator.add_room("transcript", members=50, messages=args.messages)
+        room = Room(ID=RoomID(created["id"]), Title=created["title"])
+        api = shared_api("token", emulator.url)
+        client = Client(room_api=api.rooms, memberships_api=api.memberships, messages_api=api.messages)
+
+        print("sequential")
+        with patch("webexcortex.transcript.prefetch", lambda items: iter(items)):
+            sequential = export(client, room, directory)
+        print("prefetched")
+        prefetched = export(client, room, directory)
+
+    print(f"{'sequential':>12} {'prefetched':>12} {'speedup':>8}")
+    print(f"{sequential:>10.2f} s {prefetched:>10.2f} s {sequential / prefetched:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,18 @@
 from .client_test import *
 from .handler_test import *
-from .main_test import *
\ No newline at end of file
+from .main_test import *
+from .daemon_test import *
+from .aio_test import *
+from .ratelimit_test import *
+from .cache_test import *
+from .membership_test import *
+from .batch_test import *
+from .tracing_test import *
+from .metrics_test import *
+from .roomindex_test import *
+from .transport_test import *
+from .output_test import *
+from .journal_test import *
+from .transcript_test import *
+from .pool_test import *
+from .steps_test import *
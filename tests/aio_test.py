@@ -0,0 +1,172 @@
+import asyncio
+import threading
+import unittest
+
+from webexcortex.datatypes import Member, MemberID, RoomAction, RoomID, Room
+from webexcortex.client import MembershipError
+from webexcortex.handler import Handler
+from webexcortex.aio import AsyncHandler, BlockingHandler
+from webexcortex.journal import Journal, Journals
+from webexcortex.membership import MembershipIndex, RoomSizes
+from webexcortex.transcript import Transcript, Transcripts
+from unittest.mock import ANY, MagicMock, patch, call
+
+ValidRoomID = RoomID("validid")
+ValidRoomTitle = "new title"
+ValidRoom = Room(ID=ValidRoomID, Title=ValidRoomTitle)
+
+ValidMember = Member(
+    ID=MemberID("validmemberid"),
+    Name="validname",
+    Mail="valid@mail.com",
+    IsModerator=True
+)
+
+ExtraMember = Member(
+    ID=MemberID("Extramemberid"),
+    Name="Extraname",
+    Mail="Extra@mail.com",
+    IsModerator=False
+)
+
+
+def _members_by_mail(roomID, memberMails, isModerator=False, on_added=None):
+    known = {ValidMember.Mail: ValidMember, ExtraMember.Mail: ExtraMember}
+    members = [known.get(mail, Member(ID=MemberID(mail), Name=mail, Mail=mail, IsModerator=isModerator)) for mail in memberMails]
+    if on_added is not None:
+        for mail, member in zip(memberMails, members):
+            on_added(mail, member)
+    return members
+
+
+class TestAsyncHandler(unittest.TestCase):
+    @patch('webexcortex.client.Client', autospec=True, spec_set=True)
+    def test_same_report_as_handler(self, client_cls):
+        requests = [
+            MagicMock(action=RoomAction.CREATE, roomid="", title=ValidRoomTitle, owners=[ValidMember.Mail], guests=[ExtraMember.Mail]),
+            MagicMock(action=RoomAction.ADD_GUESTS, roomid=ValidRoomID, guests=[ExtraMember.Mail]),
+            MagicMock(action=RoomAction.REMOVE_GUESTS, roomid=ValidRoomID, guests=[ExtraMember.Mail]),
+            MagicMock(action=RoomAction.SYNC_GUESTS, roomid=ValidRoomID, owners=[], guests=["new@mail.com"]),
+            MagicMock(action=RoomAction.DELETE, roomid=ValidRoomID),
+        ]
+        for req in requests:
+            with self.subTest(action=req.action):
+                client_mock = client_cls(None, None)
+                client_mock.get_room.side_effect = Exception("error") if req.action == RoomAction.CREATE else None
+                client_mock.get_room.return_value = ValidRoom
+                client_mock.create_room.return_value = ValidRoom
+                client_mock.get_members.return_value = [ValidMember, ExtraMember] if req.action in (RoomAction.REMOVE_GUESTS, RoomAction.SYNC_GUESTS) else [ValidMember]
+                client_mock.iter_members.side_effect = lambda roomID: iter(client_mock.get_members.return_value)
+                client_mock.find_members.side_effect = lambda roomID, mails: MembershipIndex(client_mock.get_members.return_value).present(mails)
+                client_mock.add_members.side_effect = _members_by_mail
+                client_mock.remove_members.side_effect = lambda roomID, memberIDs: memberIDs
+
+                want = Handler(client_mock).handle(req)
+                got = BlockingHandler(AsyncHandler(Handler(client_mock))).handle(req)
+
+                self.assertEqual(got, want)
+
+    def test_add_guests_overlaps_lookups(self):
+        both = threading.Barrier(2, timeout=5)
+        client_mock = MagicMock()
+
+        def get_room(roomid):
+            both.wait()
+            return ValidRoom
+
+        def get_members(roomID):
+            both.wait()
+            return [ValidMember]
+
+        client_mock.get_room.side_effect = get_room
+        client_mock.get_members.side_effect = get_members
+        client_mock.add_members.return_value = []
+        room_sizes = RoomSizes()
+        room_sizes.put(ValidRoomID, 1)
+        req = MagicMock(action=RoomAction.ADD_GUESTS, roomid=ValidRoomID, guests=[ValidMember.Mail])
+
+        async def handle_with_ticks():
+            ticks = 0
+            task = asyncio.ensure_future(AsyncHandler(Handler(client_mock, room_sizes)).handle(req))
+            while not task.done():
+                ticks += 1
+                await asyncio.sleep(0)
+            return await task, ticks
+
+        report, ticks = asyncio.run(handle_with_ticks())
+
+        self.assertEqual(report.message, "Guests added to new title", "the room is read while its members are listed")
+        self.assertGreater(ticks, 0, "the blocking calls do not hold up the loop")
+
+    def test_create_room_resumes_from_journal(self):
+        journal = Journal()
+        journals = MagicMock(spec=Journals)
+        journals.open.return_value = journal
+        journal.record("room", result=ValidRoom.to_dict())
+        journal.record("owner", "valid@mail.com", ValidMember.to_dict())
+
+        def get_room(roomid):
+            if roomid != ValidRoomID:
+                raise Exception("error")
+            return ValidRoom
+
+        client_mock = MagicMock(spec=["get_room", "add_members", "create_room"])
+        client_mock.get_room.side_effect = get_room
+        client_mock.add_members.side_effect = _members_by_mail
+        req = MagicMock(action=RoomAction.CREATE, roomid="", title=ValidRoomTitle, organization="org", case_id=42,
+                        owners=[ValidMember.Mail], guests=[ExtraMember.Mail])
+
+        report = asyncio.run(AsyncHandler(Handler(client_mock, journals=journals)).handle(req))
+
+        client_mock.create_room.assert_not_called()
+        self.assertListEqual([c for c in client_mock.add_members.call_args_list if len(c.args[1]) > 0], [call(ValidRoomID, [ExtraMember.Mail], isModerator=False, on_added=ANY)], "only the guest left is added")
+        self.assertEqual(report.to_dict()["events"], [
+            {"room resumed": ValidRoom.to_dict()},
+            {"owners added": [ValidMember.to_dict()]},
+            {"guests added": [ExtraMember.to_dict()]},
+            {"steps run": [{"step": "room", "after": []}, {"step": "add owners", "after": ["room"]}, {"step": "add guests", "after": ["room"]}]},
+        ])
+        self.assertEqual(len(journal), 0)
+
+    def test_delete_room_exports_transcript(self):
+        transcripts = MagicMock(spec=Transcripts)
+        transcripts.export.return_value = Transcript(path="t.jsonl.gz", messages=2, files=0, bytes=10, sha256="abc")
+        client_mock = MagicMock()
+        client_mock.get_room.return_value = ValidRoom
+        req = MagicMock(action=RoomAction.DELETE, roomid=ValidRoomID)
+
+        report = asyncio.run(AsyncHandler(Handler(client_mock, transcripts=transcripts)).handle(req))
+
+        transcripts.export.assert_called_once_with(ValidRoom, client_mock.iter_messages.return_value)
+        client_mock.delete_room.assert_called_once_with(ValidRoomID)
+        self.assertEqual(report.to_dict()["events"], [
+            {"room found": ValidRoom.to_dict()},
+            {"transcript exported": {"path": "t.jsonl.gz", "messages": 2, "files": 0, "bytes": 10, "sha256": "abc"}},
+            {"room deleted": ValidRoom.to_dict()},
+            {"steps run": [
+                {"step": "room", "after": []},
+                {"step": "transcript", "after": ["room"]},
+                {"step": "delete room", "after": ["room", "transcript"]},
+            ]},
+        ])
+
+    def test_add_guests_fails_when_every_guest_fails(self):
+        client_mock = MagicMock()
+        client_mock.get_room.return_value = ValidRoom
+        client_mock.get_members.return_value = []
+        client_mock.add_members.side_effect = MembershipError([], {ExtraMember.Mail: "401 unauthorized"})
+        room_sizes = RoomSizes()
+        room_sizes.put(ValidRoomID, 1)
+        req = MagicMock(action=RoomAction.ADD_GUESTS, roomid=ValidRoomID, guests=[ExtraMember.Mail])
+
+        with self.assertRaises(MembershipError):
+            asyncio.run(AsyncHandler(Handler(client_mock, room_sizes)).handle(req))
+
+    def test_handle_exception(self):
+        req = MagicMock(action="fa")
+        with self.assertRaises(Exception):
+            asyncio.run(AsyncHandler(Handler(MagicMock())).handle(req))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import io
+import json
+import threading
+import time
+import unittest
+
+from webexcortex.batch import BatchWorker, DictParams, Job, read_jobs, run_batch
+from webexcortex.handler import FullReport
+from unittest.mock import MagicMock
+
+
+def _job_input(action, roomid="", token="token"):
+    return {
+        "config": {"webex_bot_token": token, "organization": "org", "api_key": "secret"},
+        "data": {
+            "caseId": 42,
+            "title": "cstitle",
+            "owner": "me@org.com",
+            "tags": ["wbx=\"user@com.org\""],
+            "customFields": {
+                "webexteams": {"string": action},
+                "webexroomid": {"string": roomid},
+            },
+        },
+    }
+
+
+class RecordingHandler:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.running = {}
+        self.overlaps = []
+        self.order = []
+
+    def handle(self, req):
+        key = str(req.roomid)
+        with self.lock:
+            if self.running.get(key):
+                self.overlaps.append(key)
+            self.running[key] = True
+            self.order.append((key, req.action.value))
+        time.sleep(0.01)
+        with self.lock:
+            self.running[key] = False
+        return FullReport(message=f"{req.action.value} {key}")
+
+
+class TestDictParams(unittest.TestCase):
+    def test_get_param(self):
+        uut = DictParams({"a": {"b": {"c": 1}}, "d": 2})
+
+        self.assertEqual(uut.get_param("a.b.c"), 1)
+        self.assertEqual(uut.get_param("d"), 2)
+        self.assertDictEqual(uut.get_param("a"), {"b": {"c": 1}})
+        self.assertIsNone(uut.get_param("a.x"))
+        self.assertEqual(uut.get_param("d.e", default=3), 3)
+
+
+class TestBatchWorker(unittest.TestCase):
+    def test_error_scrubs_secrets(self):
+        job_input = _job_input("Delete room")
+        uut = BatchWorker(job_input)
+
+        uut.error("boom")
+
+        self.assertFalse(uut.output["success"])
+        self.assertEqual(uut.output["errorMessage"], "boom")
+        self.assertEqual(uut.output["input"]["config"]["api_key"], "REMOVED")
+        self.assertEqual(job_input["config"]["api_key"], "secret", "the job input is not modified")
+
+
+class TestBatch(unittest.TestCase):
+    def test_ordering_key(self):
+        self.assertEqual(Job(0, _job_input("Delete room", "room1")).key, ("room", "room1"))
+        self.assertEqual(Job(1, _job_input("Open room")).key, ("case", 42))
+        self.assertEqual(Job(2, {}).key, ("job", 2))
+
+    def test_run_batch(self):
+        inputs = [
+            _job_input("Add guests", "room1"),
+            _job_input("Add guests", "room2"),
+            _job_input("Remove guests", "room1"),
+            _job_input("Delete room", "room1"),
+        ]
+        stream = io.StringIO("\n".join(json.dumps(i) for i in inputs) + "\n\nnot json\n")
+        out = io.StringIO()
+        handler = RecordingHandler()
+        factory = MagicMock(return_value=handler)
+
+        run_batch(read_jobs(stream), out, factory, concurrency=4)
+
+        outputs = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertListEqual([o["success"] for o in outputs], [True, True, True, True, False])
+        self.assertListEqual(
+            [o["full"]["message"] for o in outputs[:4]],
+            ["Add guests room1", "Add guests room2", "Remove guests room1", "Delete room room1"],
+            "outputs are written in input order",
+        )
+        self.assertListEqual(
+            [action for key, action in handler.order if key == "room1"],
+            ["Add guests", "Remove guests", "Delete room"],
+            "jobs on the same room run in input order",
+        )
+        self.assertListEqual(handler.overlaps, [])
+        self.assertTrue(outputs[4]["errorMessage"].startswith("Invalid job input"))
+
+
+if __name__ == '__main__':
+    unittest.main()
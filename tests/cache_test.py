@@ -0,0 +1,141 @@
+import unittest
+
+from webexcortex.datatypes import Member, MemberID, RoomID, Room
+from webexcortex.client import MembershipError
+from webexcortex.cache import CachingClient, TTLCache
+from unittest.mock import patch, call
+
+ValidRoomID = RoomID("validid")
+ValidRoom = Room(ID=ValidRoomID, Title="new title")
+
+ExtraRoom = Room(ID=RoomID("extraroomid"), Title="extra room")
+
+ValidMember = Member(
+    ID=MemberID("validmemberid"),
+    Name="validname",
+    Mail="valid@mail.com",
+    IsModerator=True
+)
+
+ExtraMember = Member(
+    ID=MemberID("Extramemberid"),
+    Name="Extraname",
+    Mail="Extra@mail.com",
+    IsModerator=False
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_lru(self):
+        uut = TTLCache(maxsize=2)
+        uut.put("a", 1)
+        uut.put("b", 2)
+        uut.get("a")
+        uut.put("c", 3)
+
+        self.assertEqual(uut.get("a"), 1)
+        self.assertIsNone(uut.get("b"), "least recently used entry is evicted")
+        self.assertEqual(uut.get("c"), 3)
+
+    def test_ttl(self):
+        clock = FakeClock()
+        uut = TTLCache(ttl=10, clock=clock)
+        uut.put("a", 1)
+
+        clock.now = 9.9
+        self.assertEqual(uut.get("a"), 1)
+        clock.now = 10
+        self.assertIsNone(uut.get("a"))
+        self.assertEqual(len(uut), 0)
+
+
+class TestCachingClient(unittest.TestCase):
+    @patch('webexcortex.client.Client', autospec=True, spec_set=True)
+    def test_get_room(self, client_cls):
+        client_mock = client_cls(None, None)
+        client_mock.get_room.return_value = ValidRoom
+
+        uut = CachingClient(client_mock)
+
+        self.assertEqual(uut.get_room(ValidRoomID), ValidRoom)
+        self.assertEqual(uut.get_room(ValidRoomID), ValidRoom)
+        self.assertListEqual(client_mock.method_calls, [call.get_room(ValidRoomID)])
+        self.assertDictEqual(uut.stats(), {"hits": 1, "misses": 1, "size": 1})
+
+    @patch('webexcortex.client.Client', autospec=True, spec_set=True)
+    def test_expired(self, client_cls):
+        clock = FakeClock()
+        client_mock = client_cls(None, None)
+        client_mock.get_members.return_value = [ValidMember]
+
+        uut = CachingClient(client_mock, ttl=5, clock=clock)
+        uut.get_members(ValidRoomID)
+        clock.now = 6
+        uut.get_members(ValidRoomID)
+
+        self.assertEqual(client_mock.get_members.call_count, 2)
+
+    @patch('webexcortex.client.Client', autospec=True, spec_set=True)
+    def test_writes_update_members(self, client_cls):
+        client_mock = client_cls(None, None)
+        client_mock.get_members.return_value = [ValidMember]
+        client_mock.add_members.return_value = [ExtraMember]
+        client_mock.remove_members.return_value = [ValidMember.ID]
+
+        uut = CachingClient(client_mock)
+        uut.get_members(ValidRoomID)
+
+        uut.add_members(ValidRoomID, [ExtraMember.Mail])
+        self.assertListEqual(uut.get_members(ValidRoomID), [ValidMember, ExtraMember])
+
+        uut.remove_members(ValidRoomID, [ValidMember.ID])
+        self.assertListEqual(uut.get_members(ValidRoomID), [ExtraMember])
+
+        self.assertEqual(client_mock.get_members.call_count, 1)
+
+    @patch('webexcortex.client.Client', autospec=True, spec_set=True)
+    def test_partial_failure_updates_members(self, client_cls):
+        client_mock = client_cls(None, None)
+        client_mock.get_members.return_value = [ValidMember]
+        client_mock.add_members.side_effect = MembershipError([ExtraMember], {"bad@mail.com": "no such user"})
+
+        uut = CachingClient(client_mock)
+        uut.get_members(ValidRoomID)
+
+        with self.assertRaises(MembershipError):
+            uut.add_members(ValidRoomID, [ExtraMember.Mail, "bad@mail.com"])
+        self.assertListEqual(uut.get_members(ValidRoomID), [ValidMember, ExtraMember])
+
+    @patch('webexcortex.client.Client', autospec=True, spec_set=True)
+    def test_room_writes_update_rooms(self, client_cls):
+        client_mock = client_cls(None, None)
+        client_mock.get_rooms.return_value = [ValidRoom]
+        client_mock.create_room.return_value = ExtraRoom
+
+        uut = CachingClient(client_mock)
+        uut.get_rooms()
+        uut.get_members(ValidRoomID)
+
+        uut.create_room(ExtraRoom.Title)
+        self.assertListEqual(uut.get_rooms(), [ValidRoom, ExtraRoom])
+        self.assertEqual(uut.get_room(ExtraRoom.ID), ExtraRoom)
+
+        uut.delete_room(ValidRoomID)
+        self.assertListEqual(uut.get_rooms(), [ExtraRoom])
+
+        uut.get_members(ValidRoomID)
+        self.assertEqual(client_mock.get_members.call_count, 2, "members of a deleted room are dropped")
+        self.assertEqual(client_mock.get_rooms.call_count, 1)
+        self.assertEqual(client_mock.get_room.call_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,7 @@
 import unittest
 
-from webexcortex.datatypes import Member, MemberID, RoomID, Room
-from webexcortex.client import Client
+from webexcortex.datatypes import Member, MemberID, Message, MessageID, RoomID, Room
+from webexcortex.client import Client, MembershipError
 from unittest.mock import MagicMock, patch, call
 
 InvalidRoomID = RoomID("")
@@ -181,6 +181,87 @@ class TestClientMemberships(unittest.TestCase):
         self.assertListEqual(room_mock.method_calls, [], "rooms should not be touched")
         self.assertListEqual(members, [ValidMember, ExtraMember, ModMember], "invalid members returned")
 
+    @patch('webexcortex.client.MembershipsAPI', autospec=True, spec_set=True)
+    @patch("webexcortex.client.RoomsAPI", autospec=True, spec_set=True)
+    def test_members_are_compact(self, room_cls, membership_cls):
+        mail = "".join(["shared", "@mail.com"])
+        membership_mock = membership_cls()
+        membership_mock.list.side_effect = lambda roomId: [
+            MagicMock(id=f"{roomId}-member", personEmail="".join(["shared", "@mail.com"]), personDisplayName="shared", isModerator=False)
+        ]
+
+        uut = Client(room_cls(), membership_mock)
+        first, = uut.get_members(ValidRoomID)
+        second, = uut.get_members(ExtraRoomID)
+
+        self.assertEqual(first.Mail, mail)
+        self.assertIs(first.Mail, second.Mail, "the same person in two rooms shares one mail string")
+        self.assertFalse(hasattr(first, "__dict__"))
+        self.assertFalse(hasattr(first.ID, "__dict__"))
+        with self.assertRaises(AttributeError):
+            first.Mail = "other@mail.com"
+
+    @patch('webexcortex.client.MembershipsAPI', autospec=True, spec_set=True)
+    @patch("webexcortex.client.RoomsAPI", autospec=True, spec_set=True)
+    def test_find_members(self, room_cls, membership_cls):
+        extra = MagicMock(id=str(ExtraMemberID), personEmail=ExtraMemberMail, personDisplayName=ExtraMemberName, isModerator=ExtraIsModerator)
+        membership_mock = membership_cls()
+        membership_mock.list.side_effect = lambda roomId, personEmail: [extra] if personEmail == ExtraMemberMail.casefold() else []
+
+        uut = Client(room_cls(), membership_mock)
+        members = uut.find_members(ValidRoomID, [ExtraMemberMail, "nobody@mail.com", ExtraMemberMail.upper()])
+
+        self.assertListEqual(members, [ExtraMember])
+        self.assertCountEqual(membership_mock.list.call_args_list, [
+            call(roomId=str(ValidRoomID), personEmail=ExtraMemberMail.casefold()),
+            call(roomId=str(ValidRoomID), personEmail="nobody@mail.com"),
+        ], "one filtered listing per distinct mail")
+
+    @patch('webexcortex.client.MembershipsAPI', autospec=True, spec_set=True)
+    @patch("webexcortex.client.RoomsAPI", autospec=True, spec_set=True)
+    def test_iter_members(self, room_cls, membership_cls):
+        membership_mock = membership_cls()
+        membership_mock.list.return_value = iter([
+            MagicMock(id=str(ValidMemberID), personEmail=ValidMemberMail, personDisplayName=ValidMemberName, isModerator=ValidIsModerator),
+            MagicMock(id=str(ExtraMemberID), personEmail=ExtraMemberMail, personDisplayName=ExtraMemberName, isModerator=ExtraIsModerator),
+        ])
+
+        uut = Client(room_cls(), membership_mock)
+        members = uut.iter_members(ValidRoomID)
+
+        self.assertListEqual(membership_mock.mock_calls, [], "nothing is listed before the first member is read")
+        self.assertEqual(next(members), ValidMember)
+        self.assertListEqual(membership_mock.mock_calls, [call.list(roomId=str(ValidRoomID))])
+        self.assertListEqual(list(members), [ExtraMember])
+
+    @patch('webexcortex.client.MessagesAPI', autospec=True, spec_set=True)
+    @patch('webexcortex.client.MembershipsAPI', autospec=True, spec_set=True)
+    @patch("webexcortex.client.RoomsAPI", autospec=True, spec_set=True)
+    def test_iter_messages(self, room_cls, membership_cls, messages_cls):
+        messages_mock = messages_cls()
+        messages_mock.list.return_value = iter([
+            MagicMock(id="m2", created="2024-01-01T00:00:02.000Z", personEmail=ValidMemberMail, text="reply", files=None, parentId="m1"),
+            MagicMock(id="m1", created="2024-01-01T00:00:01.000Z", personEmail=ExtraMemberMail, text="hello", files=["https://files/1"], parentId=None),
+        ])
+
+        uut = Client(room_cls(), membership_cls(), messages_api=messages_mock)
+        messages = uut.iter_messages(ValidRoomID)
+
+        self.assertListEqual(messages_mock.mock_calls, [], "nothing is listed before the first message is read")
+        self.assertListEqual(list(messages), [
+            Message(ID=MessageID("m2"), Created="2024-01-01T00:00:02.000Z", PersonEmail=ValidMemberMail, Text="reply", Files=(), ParentID=MessageID("m1")),
+            Message(ID=MessageID("m1"), Created="2024-01-01T00:00:01.000Z", PersonEmail=ExtraMemberMail, Text="hello", Files=("https://files/1",), ParentID=None),
+        ])
+        self.assertListEqual(messages_mock.mock_calls, [call.list(roomId=str(ValidRoomID), max=1000)])
+
+    @patch('webexcortex.client.MembershipsAPI', autospec=True, spec_set=True)
+    @patch("webexcortex.client.RoomsAPI", autospec=True, spec_set=True)
+    def test_iter_messages_without_api(self, room_cls, membership_cls):
+        uut = Client(room_cls(), membership_cls())
+
+        with self.assertRaises(Exception):
+            list(uut.iter_messages(ValidRoomID))
+
     @patch('webexcortex.client.MembershipsAPI', autospec=True, spec_set=True)
     @patch("webexcortex.client.RoomsAPI", autospec=True, spec_set=True)
     def test_add_members(self, room_cls, membership_cls):
@@ -214,20 +295,21 @@ class TestClientMemberships(unittest.TestCase):
         
         room_mock = room_cls()
         membership_mock = membership_cls()
-        membership_mock.create.side_effect = [
-            MagicMock(
+        created = {
+            ValidMemberMail: MagicMock(
                 id=str(ValidMemberID),
                 personEmail=ValidMemberMail,
                 personDisplayName=ValidMemberName,
                 isModerator=True
             ),
-            MagicMock(
+            ModMemberMail: MagicMock(
                 id=str(ModMemberID),
                 personEmail=ModMemberMail,
                 personDisplayName=ModMemberName,
                 isModerator=True
             ),
-        ]
+        }
+        membership_mock.create.side_effect = lambda roomId, personEmail, isModerator: created[personEmail]
 
         mails = [
             ValidMemberMail,
@@ -236,12 +318,38 @@ class TestClientMemberships(unittest.TestCase):
         uut = Client(room_mock, membership_mock)
         members = uut.add_members(ValidRoomID, mails, True)
 
-        self.assertListEqual(membership_mock.mock_calls, [
+        self.assertCountEqual(membership_mock.mock_calls, [
             call.create(roomId=ValidRoomID, personEmail=ValidMemberMail, isModerator=True),
             call.create(roomId=ValidRoomID, personEmail=ModMemberMail, isModerator=True)
         ], "only two calls to create")
         self.assertListEqual(room_mock.method_calls, [], "rooms should not be touched")
-        self.assertListEqual(members, [ValidMember, ModMember], "invalid members returned")
+        self.assertListEqual(members, [ValidMember, ModMember], "members must be returned in input order")
+
+    @patch('webexcortex.client.MembershipsAPI', autospec=True, spec_set=True)
+    @patch("webexcortex.client.RoomsAPI", autospec=True, spec_set=True)
+    def test_add_members_partial_failure(self, room_cls, membership_cls):
+        
+        room_mock = room_cls()
+        membership_mock = membership_cls()
+
+        def create(roomId, personEmail, isModerator):
+            if personEmail == ValidMemberMail:
+                raise Exception("no such user")
+            return MagicMock(
+                id=str(ExtraMemberID),
+                personEmail=ExtraMemberMail,
+                personDisplayName=ExtraMemberName,
+                isModerator=False
+            )
+        membership_mock.create.side_effect = create
+
+        uut = Client(room_mock, membership_mock, max_workers=2)
+        with self.assertRaises(MembershipError) as ctx:
+            uut.add_members(ValidRoomID, [ValidMemberMail, ExtraMemberMail], False)
+
+        self.assertEqual(membership_mock.create.call_count, 2, "a failure must not abort the batch")
+        self.assertListEqual(ctx.exception.succeeded, [ExtraMember])
+        self.assertDictEqual(ctx.exception.failures, {ValidMemberMail: "no such user"})
 
     @patch('webexcortex.client.MembershipsAPI', autospec=True, spec_set=True)
     @patch("webexcortex.client.RoomsAPI", autospec=True, spec_set=True)
@@ -258,11 +366,11 @@ class TestClientMemberships(unittest.TestCase):
         uut = Client(room_mock, membership_mock)
         uut.remove_members(ValidRoomID, ids)
 
-        self.assertListEqual(membership_mock.mock_calls, [
+        self.assertCountEqual(membership_mock.mock_calls, [
             call.delete(membershipId=ValidMemberID),
             call.delete(membershipId=ModMemberID),
             call.delete(membershipId=ExtraMemberID)
-        ], "only three calls to create")
+        ], "only three calls to delete")
         self.assertListEqual(room_mock.method_calls, [], "rooms should not be touched")
         
 
@@ -0,0 +1,85 @@
+import os
+import json
+import tempfile
+import unittest
+
+from webexcortex.main import cached_handler
+from webexcortex.daemon import Daemon, JobResult, find_jobs, claim_job, run_job
+from unittest.mock import MagicMock, patch
+
+
+def _make_job(root: str, name: str, done: bool = False):
+    job = os.path.join(root, name)
+    os.makedirs(os.path.join(job, "input"))
+    with open(os.path.join(job, "input", "input.json"), "w") as f:
+        json.dump({"data": {}, "config": {}}, f)
+    if done:
+        os.makedirs(os.path.join(job, "output"))
+        with open(os.path.join(job, "output", "output.json"), "w") as f:
+            json.dump({"success": True}, f)
+    return job
+
+
+class TestJobDiscovery(unittest.TestCase):
+    def test_find_jobs(self):
+        with tempfile.TemporaryDirectory() as root:
+            pending = _make_job(root, "a")
+            _make_job(root, "b", done=True)
+            os.makedirs(os.path.join(root, "c"))
+
+            self.assertListEqual(list(find_jobs(root)), [pending])
+
+    def test_claim_job(self):
+        with tempfile.TemporaryDirectory() as root:
+            job = _make_job(root, "a")
+
+            self.assertTrue(claim_job(job))
+            self.assertFalse(claim_job(job))
+
+
+class TestRunJob(unittest.TestCase):
+    @patch('webexcortex.main.run', return_value=True)
+    @patch('webexcortex.main.make_responder')
+    def test_run_job(self, responder_mock, run_mock):
+        with tempfile.TemporaryDirectory() as root:
+            job = _make_job(root, "a")
+
+            result = run_job(job)
+
+            responder_mock.assert_called_once_with(job)
+            run_mock.assert_called_once_with(responder_mock.return_value, cached_handler)
+            self.assertEqual(result.job_directory, job)
+            self.assertTrue(result.success)
+            self.assertGreaterEqual(result.seconds, 0)
+
+    @patch('webexcortex.main.run', side_effect=SystemExit(1))
+    @patch('webexcortex.main.make_responder')
+    def test_run_job_error(self, responder_mock, run_mock):
+        with tempfile.TemporaryDirectory() as root:
+            job = _make_job(root, "a")
+
+            result = run_job(job)
+
+            self.assertFalse(result.success)
+
+
+class TestDaemon(unittest.TestCase):
+    def test_poll(self):
+        with tempfile.TemporaryDirectory() as root:
+            job = _make_job(root, "a")
+            _make_job(root, "b", done=True)
+
+            uut = Daemon(root)
+            uut._pool = MagicMock()
+
+            self.assertEqual(uut.poll(), 1)
+            self.assertEqual(uut.poll(), 0, "a claimed job must not be dispatched twice")
+            uut._pool.apply_async.assert_called_once_with(run_job, (job,), callback=uut._done)
+
+            uut._done(JobResult(job_directory=job, success=True, seconds=0.1))
+            self.assertEqual(len(uut.results), 1)
+            uut.drain()
+
+
+if __name__ == '__main__':
+    unittest.main()
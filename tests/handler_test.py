@@ -1,8 +1,15 @@
 import unittest
 import json
-from webexcortex.datatypes import Fields, Member, MemberID, RoomAction, RoomID, Room
+import os
+import tempfile
+from webexcortex.datatypes import Fields, Member, MemberID, Message, MessageID, RoomAction, RoomID, Room
+from webexcortex.client import MembershipError
 from webexcortex.handler import FullReport, Handler
-from unittest.mock import MagicMock, patch, call
+from webexcortex.journal import Journals
+from webexcortex.membership import RoomSizes
+from webexcortex.roomindex import RoomIndex
+from webexcortex.transcript import Transcripts
+from unittest.mock import ANY, MagicMock, patch, call
 
 InvalidRoomID = RoomID("")
 
@@ -50,6 +57,37 @@ ExtraMember = Member(
     IsModerator=ExtraIsModerator
 )
 
+def _steps(*steps):
+    """The steps run event, every step given as its name followed by the steps it ran after."""
+    return {'steps run': [{'step': name, 'after': list(after)} for name, *after in steps]}
+
+
+def _added_by_role(owners, guests):
+    """add_members for the owners and guests of a job, called in any order."""
+    def add_members(roomID, mails, isModerator=False, **kwargs):
+        added = owners if isModerator else guests
+        if isinstance(added, Exception):
+            raise added
+        return added
+    return add_members
+
+
+def _only_room(room: Room):
+    """get_room for a Webex where only room exists."""
+    def get_room(roomid):
+        if roomid != room.ID:
+            raise Exception(f"Invalid roomid [{roomid}]")
+        return room
+    return get_room
+
+
+def _small_room():
+    """A room known to fit in one page, so listing it is cheaper than looking guests up."""
+    room_sizes = RoomSizes()
+    room_sizes.put(ValidRoomID, 2)
+    return room_sizes
+
+
 class TestHandler(unittest.TestCase):
     @patch('webexcortex.client.Client', autospec=True, spec_set=True)
     def test_delete_room(self, client_cls):
@@ -73,11 +111,62 @@ class TestHandler(unittest.TestCase):
             fields=Fields(roomid=''),
             events=[
                 {'room found': {'ID': 'validid', 'Title': 'new title'}},
-                {'room deleted': {'ID': 'validid', 'Title': 'new title'}}
+                {'room deleted': {'ID': 'validid', 'Title': 'new title'}},
+                _steps(("room",), ("delete room", "room")),
             ]
         )
 
-        self.assertEqual(report, want)
+        self.assertEqual(report.to_dict(), want.to_dict())
+
+    @patch('webexcortex.client.Client', autospec=True, spec_set=True)
+    def test_delete_room_exports_transcript(self, client_cls):
+        req = MagicMock(
+            action=RoomAction.DELETE,
+            roomid=ValidRoomID
+        )
+        client_mock = client_cls(None, None)
+        client_mock.get_room.return_value = ValidRoom
+        client_mock.iter_messages.return_value = iter([
+            Message(ID=MessageID("m1"), Created="2024-01-01T00:00:01.000Z", PersonEmail=ValidMemberMail, Text="hello", Files=("https://files/1",), ParentID=None),
+        ])
+
+        with tempfile.TemporaryDirectory() as directory:
+            uut = Handler(client_mock, transcripts=Transcripts(directory))
+            report = uut.handle(req)
+
+        self.assertListEqual(client_mock.method_calls, [
+            call.get_room('validid'),
+            call.iter_messages('validid'),
+            call.delete_room('validid')
+        ])
+
+        events = report.to_dict()["events"]
+        self.assertEqual(events[0], {'room found': {'ID': 'validid', 'Title': 'new title'}})
+        self.assertEqual(events[1]["transcript exported"]["messages"], 1)
+        self.assertEqual(events[1]["transcript exported"]["files"], 1)
+        self.assertEqual(events[2], {'room deleted': {'ID': 'validid', 'Title': 'new title'}})
+        self.assertEqual(events[3], _steps(("room",), ("transcript", "room"), ("delete room", "room", "transcript")))
+
+    @patch('webexcortex.client.Client', autospec=True, spec_set=True)
+    def test_delete_room_keeps_room_when_export_fails(self, client_cls):
+        req = MagicMock(
+            action=RoomAction.DELETE,
+            roomid=ValidRoomID
+        )
+        client_mock = client_cls(None, None)
+        client_mock.get_room.return_value = ValidRoom
+        def messages():
+            yield Message(ID=MessageID("m1"), Created="2024-01-01T00:00:01.000Z", PersonEmail=ValidMemberMail, Text="hello", Files=(), ParentID=None)
+            raise Exception("listing failed")
+        client_mock.iter_messages.return_value = messages()
+
+        with tempfile.TemporaryDirectory() as directory:
+            uut = Handler(client_mock, transcripts=Transcripts(directory))
+            with self.assertRaises(Exception):
+                uut.handle(req)
+            self.assertListEqual(os.listdir(directory), [], "no partial transcript is left behind")
+
+        client_mock.delete_room.assert_not_called()
 
     @patch('webexcortex.client.Client', autospec=True, spec_set=True)
     def test_add_guests(self, client_cls):
@@ -91,14 +180,11 @@ class TestHandler(unittest.TestCase):
         client_mock.get_members.return_value = [ValidMember]
         client_mock.add_members.return_value = [ExtraMember]
         
-        uut = Handler(client_mock)
+        uut = Handler(client_mock, _small_room())
         report = uut.handle(req)
 
-        self.assertListEqual(client_mock.method_calls, [
-            call.get_room(ValidRoomID),
-            call.get_members(ValidRoomID),
-            call.add_members(ValidRoomID, [ExtraMemberMail], isModerator=False)
-        ])
+        self.assertCountEqual(client_mock.method_calls[:2], [call.get_room(ValidRoomID), call.get_members(ValidRoomID)], "the room is read while its members are listed")
+        self.assertListEqual(client_mock.method_calls[2:], [call.add_members(ValidRoomID, [ExtraMemberMail], isModerator=False)])
 
         want = FullReport(
             message=f'Guests added to new title',
@@ -110,11 +196,34 @@ class TestHandler(unittest.TestCase):
                 {'guests not in room': ['Extra@mail.com']},
                 {'guests added': [
                     {'ID': 'Extramemberid', 'Name': 'Extraname', 'Mail': 'Extra@mail.com', 'IsModerator': False}
-                ]}
+                ]},
+                _steps(("room",), ("members",), ("plan", "members"), ("add guests", "room", "plan")),
             ]
         )
 
-        self.assertEqual(report, want, msg=report.to_dict())
+        self.assertEqual(report.to_dict(), want.to_dict(), msg=report.to_dict())
+
+    @patch('webexcortex.client.Client', autospec=True, spec_set=True)
+    def test_add_guests_summarized(self, client_cls):
+        def report(members: int):
+            req = MagicMock(action=RoomAction.ADD_GUESTS, roomid=ValidRoomID, guests=[ExtraMemberMail])
+            client_mock = client_cls(None, None)
+            client_mock.get_room.return_value = ValidRoom
+            client_mock.get_members.return_value = [
+                Member(ID=MemberID(f"id{i}"), Name=f"name{i}", Mail=f"user{i}@mail.com", IsModerator=False) for i in range(members)
+            ]
+            client_mock.add_members.return_value = [ExtraMember]
+            return Handler(client_mock, _small_room()).handle(req).summarized().to_dict()
+
+        small, large = report(1000), report(9000)
+
+        self.assertEqual(large['events'][1]['members in room']['count'], 9000)
+        self.assertEqual(len(large['events'][1]['members in room']['digest']), 16)
+        self.assertListEqual(large['events'][2:4], [
+            {'guests not in room': ['Extra@mail.com']},
+            {'guests added': [{'ID': 'Extramemberid', 'Name': 'Extraname', 'Mail': 'Extra@mail.com', 'IsModerator': False}]},
+        ], "the members that changed are still listed")
+        self.assertEqual(len(json.dumps(small)), len(json.dumps(large)), "the report does not grow with the room")
 
     @patch('webexcortex.client.Client', autospec=True, spec_set=True)
     def test_remove_guests(self, client_cls):
@@ -125,35 +234,139 @@ class TestHandler(unittest.TestCase):
         )
         client_mock = client_cls(None, None)
         client_mock.get_room.return_value = ValidRoom
-        client_mock.get_members.return_value = [ValidMember, ExtraMember]
+        client_mock.iter_members.return_value = iter([ValidMember, ExtraMember])
         
-        uut = Handler(client_mock)
+        uut = Handler(client_mock, _small_room())
         report = uut.handle(req)
 
-        self.assertListEqual(client_mock.method_calls, [
-            call.get_room(ValidRoomID),
-            call.get_members(ValidRoomID),
-            call.remove_members(ValidRoomID, [ExtraMemberID])
-        ])
+        self.assertCountEqual(client_mock.method_calls[:2], [call.get_room(ValidRoomID), call.iter_members(ValidRoomID)])
+        self.assertListEqual(client_mock.method_calls[2:], [call.remove_members(ValidRoomID, [ExtraMemberID])])
 
         want = FullReport(
             message=f'Guests removed from new title',
             events=[
                 {'room found': {'ID': 'validid', 'Title': 'new title'}},
-                {'members in room': [
-                        {'ID': 'validmemberid', 'Name': 'validname', 'Mail': 'valid@mail.com', 'IsModerator': True},
-                        {"ID": "Extramemberid", "Name": "Extraname", "Mail": "Extra@mail.com", "IsModerator": False}
-                ]},
+                {'members scanned': 2},
                 {'guests in room': [
                     {"ID": "Extramemberid", "Name": "Extraname", "Mail": "Extra@mail.com", "IsModerator": False}
                 ]},
                 {'guests removed': [
                     {'ID': 'Extramemberid', 'Name': 'Extraname', 'Mail': 'Extra@mail.com', 'IsModerator': False}
-                ]}
+                ]},
+                _steps(("room",), ("members",), ("remove guests", "room", "members")),
             ]
         )
 
-        self.assertEqual(report, want, msg=json.dumps(report.to_dict(), indent=2))
+        self.assertEqual(report.to_dict(), want.to_dict(), msg=json.dumps(report.to_dict(), indent=2))
+
+        # A member mentioned by several events is serialized once
+        events = report.to_dict()['events']
+        self.assertIs(events[2]['guests in room'][0], events[3]['guests removed'][0])
+
+    @patch('webexcortex.client.Client', autospec=True, spec_set=True)
+    def test_remove_guests_reports_failures_by_mail(self, client_cls):
+        other = Member(ID=MemberID("otherid"), Name="other", Mail="other@mail.com", IsModerator=False)
+        req = MagicMock(action=RoomAction.REMOVE_GUESTS, roomid=ValidRoomID, guests=[ExtraMemberMail, "other@mail.com"])
+        client_mock = client_cls(None, None)
+        client_mock.get_room.return_value = ValidRoom
+        client_mock.iter_members.return_value = iter([ValidMember, ExtraMember, other])
+        client_mock.remove_members.side_effect = MembershipError([ExtraMemberID], {"otherid": "403 forbidden"})
+
+        report = Handler(client_mock, _small_room()).handle(req)
+
+        self.assertListEqual(report.to_dict()["events"][3:5], [
+            {'guests removed': [ExtraMember.to_dict()]},
+            {'guests failed': {"other@mail.com": "403 forbidden"}},
+        ], "failures are reported by mail, like those of an addition")
+
+    @patch('webexcortex.client.Client', autospec=True, spec_set=True)
+    def test_add_guests_looks_up_guests(self, client_cls):
+        req = MagicMock(
+            action=RoomAction.ADD_GUESTS,
+            roomid=ValidRoomID,
+            guests=[ValidMemberMail, ExtraMemberMail],
+        )
+        client_mock = client_cls(None, None)
+        client_mock.get_room.return_value = ValidRoom
+        client_mock.find_members.return_value = [ValidMember]
+        client_mock.add_members.return_value = [ExtraMember]
+
+        uut = Handler(client_mock)
+        report = uut.handle(req)
+
+        self.assertCountEqual(client_mock.method_calls[:2], [
+            call.get_room(ValidRoomID),
+            call.find_members(ValidRoomID, [ValidMemberMail, ExtraMemberMail]),
+        ])
+        self.assertListEqual(client_mock.method_calls[2:], [call.add_members(ValidRoomID, [ExtraMemberMail], isModerator=False)])
+        self.assertIn({'guests not in room': ['Extra@mail.com']}, report.events)
+        self.assertEqual(report.to_dict()['events'][1], {'guests in room': [ValidMember.to_dict()]}, "a lookup does not read the whole room")
+        self.assertNotIn('members in room', report.summarized().to_dict()['events'][1], "nor is it summarized as the membership")
+
+    @patch('webexcortex.client.Client', autospec=True, spec_set=True)
+    def test_remove_guests_in_large_room(self, client_cls):
+        req = MagicMock(
+            action=RoomAction.REMOVE_GUESTS,
+            roomid=ValidRoomID,
+            guests=[ExtraMemberMail, "nobody@mail.com"],
+        )
+        client_mock = client_cls(None, None)
+        client_mock.get_room.return_value = ValidRoom
+        client_mock.iter_members.return_value = iter([ValidMember, ExtraMember])
+        client_mock.find_members.return_value = [ExtraMember]
+        room_sizes = RoomSizes()
+
+        uut = Handler(client_mock, room_sizes)
+        uut.handle(req)
+        room_sizes.put(ValidRoomID, 1000)
+        uut.handle(req)
+
+        self.assertListEqual([c for c in client_mock.method_calls if c != call.get_room(ValidRoomID)], [
+            call.find_members(ValidRoomID, ["extra@mail.com", "nobody@mail.com"]),
+            call.remove_members(ValidRoomID, [ExtraMemberID]),
+            call.find_members(ValidRoomID, ["extra@mail.com", "nobody@mail.com"]),
+            call.remove_members(ValidRoomID, [ExtraMemberID]),
+        ], "two guests are cheaper to look up than ten pages of members")
+
+    @patch('webexcortex.client.Client', autospec=True, spec_set=True)
+    def test_sync_guests(self, client_cls):
+        owner = Member(ID=MemberID("ownerid"), Name="owner", Mail="owner@mail.com", IsModerator=False)
+        bot = Member(ID=MemberID("botid"), Name="bot", Mail="responder@webex.bot", IsModerator=False)
+        newcomer = Member(ID=MemberID("newid"), Name="new", Mail="new@mail.com", IsModerator=False)
+        req = MagicMock(
+            action=RoomAction.SYNC_GUESTS,
+            roomid=ValidRoomID,
+            owners=["OWNER@mail.com"],
+            guests=["new@mail.com"],
+        )
+        client_mock = client_cls(None, None)
+        client_mock.get_room.return_value = ValidRoom
+        client_mock.get_members.return_value = [ValidMember, ExtraMember, owner, bot]
+        client_mock.add_members.return_value = [newcomer]
+        client_mock.remove_members.return_value = [ExtraMemberID]
+
+        uut = Handler(client_mock)
+        report = uut.handle(req)
+
+        self.assertCountEqual(client_mock.method_calls[:2], [call.get_room(ValidRoomID), call.get_members(ValidRoomID)], "a single read of the room")
+        self.assertCountEqual(client_mock.method_calls[2:], [
+            call.add_members(ValidRoomID, ["new@mail.com"], isModerator=False),
+            call.remove_members(ValidRoomID, [ExtraMemberID]),
+        ], "moderators, owners and bots stay")
+
+        want = FullReport(
+            message='Guests synced in new title',
+            events=[
+                {'room found': {'ID': 'validid', 'Title': 'new title'}},
+                {'members scanned': 4},
+                {'guests not in room': ['new@mail.com']},
+                {'guests not wanted': [ExtraMember.to_dict()]},
+                {'guests added': [newcomer.to_dict()]},
+                {'guests removed': [ExtraMember.to_dict()]},
+                _steps(("room",), ("members",), ("plan", "members"), ("add guests", "room", "plan"), ("remove guests", "room", "plan")),
+            ]
+        )
+        self.assertEqual(report.to_dict(), want.to_dict(), msg=json.dumps(report.to_dict(), indent=2))
 
     @patch('webexcortex.client.Client', autospec=True, spec_set=True)
     def test_create_room(self, client_cls):
@@ -167,17 +380,16 @@ class TestHandler(unittest.TestCase):
         client_mock = client_cls(None, None)
         client_mock.get_room.side_effect = Exception("error")
         client_mock.create_room.return_value = ValidRoom
-        client_mock.add_members.side_effect = [[ValidMember], [ExtraMember]]
+        client_mock.add_members.side_effect = _added_by_role([ValidMember], [ExtraMember])
         
         uut = Handler(client_mock)
         report = uut.handle(req)
 
-        self.assertListEqual(client_mock.method_calls, [
-            call.get_room(''),
-            call.create_room('new title'),
+        self.assertListEqual(client_mock.method_calls[:2], [call.get_room(''), call.create_room('new title')])
+        self.assertCountEqual(client_mock.method_calls[2:], [
             call.add_members('validid', ['valid@mail.com'], isModerator=True),
             call.add_members('validid', ['Extra@mail.com'], isModerator=False)
-        ])
+        ], "owners and guests are added at the same time")
 
         want = FullReport(
             message='Room created new title',
@@ -189,11 +401,234 @@ class TestHandler(unittest.TestCase):
                 ]},
                 {'guests added': [
                     {'ID': 'Extramemberid', 'Name': 'Extraname', 'Mail': 'Extra@mail.com', 'IsModerator': False}
-                ]}
+                ]},
+                _steps(("room",), ("add owners", "room"), ("add guests", "room")),
             ]
         )
 
-        self.assertEqual(report, want, msg=repr(report))
+        self.assertEqual(report.to_dict(), want.to_dict(), msg=repr(report))
+
+    @patch('webexcortex.client.Client', autospec=True, spec_set=True)
+    def test_create_room_resumes_from_journal(self, client_cls):
+        req = MagicMock(
+            action=RoomAction.CREATE,
+            roomid="",
+            title=ValidRoomTitle,
+            organization="org",
+            case_id=42,
+            owners=[ValidMemberMail],
+            guests=[ExtraMemberMail, ModMemberMail],
+        )
+
+        def died_halfway(roomID, mails, isModerator, on_added):
+            if isModerator:
+                on_added(ValidMemberMail, ValidMember)
+                return [ValidMember]
+            on_added(ExtraMemberMail, ExtraMember)
+            raise TimeoutError("job timed out")
+
+        with tempfile.TemporaryDirectory() as directory:
+            journals = Journals(directory, "token")
+            client_mock = client_cls(None, None)
+            client_mock.get_room.side_effect = Exception("error")
+            client_mock.create_room.return_value = ValidRoom
+            client_mock.add_members.side_effect = died_halfway
+            with self.assertRaises(TimeoutError):
+                Handler(client_mock, journals=journals).handle(req)
+
+            client_mock.reset_mock()
+            client_mock.get_room.side_effect = _only_room(ValidRoom)
+            client_mock.add_members.side_effect = lambda roomID, mails, isModerator, on_added: [ModMember] if mails else []
+            report = Handler(client_mock, journals=journals).handle(req)
+
+            self.assertListEqual(client_mock.method_calls[:2], [call.get_room(''), call.get_room('validid')], "the journaled room is checked before it is resumed")
+            self.assertCountEqual(client_mock.method_calls[2:], [
+                call.add_members('validid', [], isModerator=True, on_added=ANY),
+                call.add_members('validid', [ModMemberMail], isModerator=False, on_added=ANY),
+            ], "neither the room nor the members added before are created again")
+            self.assertEqual(len(journals.open("org #42")), 0, "a finished job leaves no journal behind")
+
+        want = FullReport(
+            message='Room created new title',
+            fields=Fields(roomid='validid'),
+            events=[
+                {'room resumed': {'ID': 'validid', 'Title': 'new title'}},
+                {'owners added': [
+                    {'ID': 'validmemberid', 'Name': 'validname', 'Mail': 'valid@mail.com', 'IsModerator': True}
+                ]},
+                {'guests added': [
+                    {'ID': 'Extramemberid', 'Name': 'Extraname', 'Mail': 'Extra@mail.com', 'IsModerator': False},
+                    {'ID': 'Modmemberid', 'Name': 'Modname', 'Mail': 'Mod@mail.com', 'IsModerator': True}
+                ]},
+                _steps(("room",), ("add owners", "room"), ("add guests", "room")),
+            ]
+        )
+        self.assertEqual(report.to_dict(), want.to_dict(), msg=json.dumps(report.to_dict(), indent=2))
+
+    @patch('webexcortex.client.Client', autospec=True, spec_set=True)
+    def test_create_room_starts_over_when_journaled_room_is_gone(self, client_cls):
+        req = MagicMock(action=RoomAction.CREATE, roomid="", organization="org", case_id=42, title="org #42 - case", owners=[ValidMemberMail], guests=[])
+        gone = Exception("Room not found")
+        gone.status_code = 404
+        with tempfile.TemporaryDirectory() as directory:
+            journals = Journals(directory, "token")
+            journal = journals.open("org #42")
+            journal.record("room", result=ExtraRoom.to_dict())
+            journal.record("owner", "valid@mail.com", ValidMember.to_dict())
+            client_mock = client_cls(None, None)
+            client_mock.get_room.side_effect = gone
+            client_mock.create_room.return_value = ValidRoom
+            client_mock.add_members.side_effect = _added_by_role([ValidMember], [])
+
+            report = Handler(client_mock, journals=journals).handle(req)
+
+            client_mock.create_room.assert_called_once_with("org #42 - case")
+            self.assertIn(call.add_members(ValidRoomID, [ValidMemberMail], isModerator=True, on_added=ANY), client_mock.method_calls, "the owners are added to the new room")
+            self.assertEqual(report.to_dict()["events"][0], {'room create': ValidRoom.to_dict()})
+            self.assertEqual(len(journals.open("org #42")), 0)
+
+    @patch('webexcortex.client.Client', autospec=True, spec_set=True)
+    def test_delete_room_clears_case_journal(self, client_cls):
+        room = Room(ID=ValidRoomID, Title="org #42 - case")
+        with tempfile.TemporaryDirectory() as directory:
+            journals = Journals(directory, "token")
+            journals.open("org #42").record("room", result=room.to_dict())
+            client_mock = client_cls(None, None)
+            client_mock.get_room.return_value = room
+
+            Handler(client_mock, journals=journals).handle(MagicMock(action=RoomAction.DELETE, roomid=ValidRoomID))
+
+            self.assertEqual(len(journals.open("org #42")), 0, "a later Open room does not resume the deleted room")
+
+    @patch('webexcortex.client.Client', autospec=True, spec_set=True)
+    def test_create_room_relinks_case_room(self, client_cls):
+        req = MagicMock(
+            action=RoomAction.CREATE,
+            roomid="",
+            organization="org",
+            case_id=42,
+            title="org #42 - case",
+            owners=[ValidMemberMail],
+            guests=[ExtraMemberMail],
+        )
+        case_room = Room(ID=RoomID("caseroomid"), Title="org #42 - case")
+        client_mock = client_cls(None, None)
+        client_mock.get_room.side_effect = lambda roomid: {case_room.ID: case_room}[roomid]
+        client_mock.iter_rooms.return_value = iter([ExtraRoom, case_room])
+        client_mock.get_members.return_value = [ValidMember]
+        client_mock.add_members.side_effect = _added_by_role([], [ExtraMember])
+        rooms = RoomIndex()
+
+        uut = Handler(client_mock, rooms=rooms)
+        report = uut.handle(req)
+
+        self.assertListEqual(client_mock.method_calls[:4], [
+            call.get_room(''),
+            call.iter_rooms(),
+            call.get_room('caseroomid'),
+            call.get_members('caseroomid'),
+        ])
+        self.assertCountEqual(client_mock.method_calls[4:], [
+            call.add_members('caseroomid', [], isModerator=True),
+            call.add_members('caseroomid', ['Extra@mail.com'], isModerator=False)
+        ], "only the missing guest is added")
+        self.assertEqual(report.to_dict()["events"][-1], _steps(("members",), ("add owners", "members"), ("add guests", "members")))
+        self.assertEqual(report.message, 'Room relinked org #42 - case')
+        self.assertEqual(report.fields, Fields(roomid='caseroomid'))
+        self.assertEqual(report.to_dict()["events"][0], {'room relinked': {'ID': 'caseroomid', 'Title': 'org #42 - case'}})
+
+    @patch('webexcortex.client.Client', autospec=True, spec_set=True)
+    def test_create_room_indexes_new_room(self, client_cls):
+        req = MagicMock(action=RoomAction.CREATE, roomid="", organization="org", case_id=42, title="org #42 - case", owners=[], guests=[])
+        client_mock = client_cls(None, None)
+        client_mock.get_room.side_effect = Exception("error")
+        client_mock.iter_rooms.return_value = iter([])
+        client_mock.create_room.return_value = ValidRoom
+        client_mock.add_members.return_value = []
+        rooms = RoomIndex()
+
+        uut = Handler(client_mock, rooms=rooms)
+        uut.handle(req)
+        self.assertEqual(rooms.get("org #42"), ValidRoomID)
+
+        client_mock.get_room.side_effect = None
+        client_mock.get_room.return_value = ValidRoom
+        uut.handle(MagicMock(action=RoomAction.DELETE, roomid=ValidRoomID))
+        self.assertIsNone(rooms.get("org #42"))
+
+    @patch('webexcortex.client.Client', autospec=True, spec_set=True)
+    def test_create_room_partial_failure(self, client_cls):
+        req = MagicMock(
+            action=RoomAction.CREATE,
+            roomid="",
+            title=ValidRoomTitle,
+            owners=[ValidMemberMail],
+            guests=[ExtraMemberMail, ModMemberMail],
+        )
+        client_mock = client_cls(None, None)
+        client_mock.get_room.side_effect = Exception("error")
+        client_mock.create_room.return_value = ValidRoom
+        client_mock.add_members.side_effect = _added_by_role([ValidMember], MembershipError([ExtraMember], {ModMemberMail: "no such user"}))
+
+        uut = Handler(client_mock)
+        report = uut.handle(req)
+
+        self.assertListEqual(report.to_dict()["events"][2:4], [
+            {'guests added': [
+                {'ID': 'Extramemberid', 'Name': 'Extraname', 'Mail': 'Extra@mail.com', 'IsModerator': False}
+            ]},
+            {'guests failed': {'Mod@mail.com': 'no such user'}},
+        ])
+
+    @patch('webexcortex.client.Client', autospec=True, spec_set=True)
+    def test_create_room_fails_when_every_owner_fails(self, client_cls):
+        req = MagicMock(
+            action=RoomAction.CREATE,
+            roomid="",
+            title=ValidRoomTitle,
+            owners=[ValidMemberMail],
+            guests=[ExtraMemberMail],
+        )
+        client_mock = client_cls(None, None)
+        client_mock.get_room.side_effect = Exception("error")
+        client_mock.create_room.return_value = ValidRoom
+        client_mock.add_members.side_effect = _added_by_role(MembershipError([], {ValidMemberMail: "403 forbidden"}), [ExtraMember])
+
+        uut = Handler(client_mock)
+        with self.assertRaises(MembershipError):
+            uut.handle(req)
+
+    @patch('webexcortex.client.Client', autospec=True, spec_set=True)
+    def test_add_guests_fails_when_every_guest_fails(self, client_cls):
+        req = MagicMock(action=RoomAction.ADD_GUESTS, roomid=ValidRoomID, guests=[ExtraMemberMail, ModMemberMail])
+        client_mock = client_cls(None, None)
+        client_mock.get_room.return_value = ValidRoom
+        client_mock.get_members.return_value = [ValidMember]
+        client_mock.add_members.side_effect = MembershipError([], {ExtraMemberMail: "401 unauthorized", ModMemberMail: "401 unauthorized"})
+
+        uut = Handler(client_mock, _small_room())
+        with self.assertRaises(MembershipError):
+            uut.handle(req)
+
+    @patch('webexcortex.client.Client', autospec=True, spec_set=True)
+    def test_resumed_batch_is_partial_when_the_earlier_run_added_some(self, client_cls):
+        journal = Journals(None, "token").open("org #42")
+        journals = MagicMock(spec=Journals)
+        journals.open.return_value = journal
+        journal.record("room", result=ValidRoom.to_dict())
+        journal.record("guest", "extra@mail.com", ExtraMember.to_dict())
+        req = MagicMock(action=RoomAction.CREATE, roomid="", title=ValidRoomTitle, organization="org", case_id=42,
+                        owners=[], guests=[ExtraMemberMail, ModMemberMail])
+        client_mock = client_cls(None, None)
+        client_mock.get_room.side_effect = _only_room(ValidRoom)
+        client_mock.add_members.side_effect = _added_by_role([], MembershipError([], {ModMemberMail: "no such user"}))
+
+        report = Handler(client_mock, journals=journals).handle(req)
+
+        self.assertListEqual(report.to_dict()["events"][2:4], [
+            {'guests added': [ExtraMember.to_dict()]},
+            {'guests failed': {ModMemberMail: 'no such user'}},
+        ])
 
     @patch('webexcortex.client.Client', autospec=True, spec_set=True)
     def test_create_room_exception(self, client_cls):
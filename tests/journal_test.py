@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+from webexcortex.journal import Journal, Journals, journal_file
+
+
+class TestJournal(unittest.TestCase):
+    def test_rerun_reads_finished_steps(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = journal_file(directory, "token", "org #42")
+            first = Journal(path)
+            first.record("room", result={"ID": "room", "Title": "title"})
+            first.record("guest", "a@mail.com", {"ID": "member"})
+
+            rerun = Journal(path)
+            self.assertEqual(rerun.result("room"), {"ID": "room", "Title": "title"})
+            self.assertEqual(rerun.result("guest", "a@mail.com"), {"ID": "member"})
+            self.assertIsNone(rerun.result("guest", "b@mail.com"))
+
+    def test_line_cut_short_is_ignored(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = journal_file(directory, "token", "org #42")
+            Journal(path).record("room", result={"ID": "room"})
+            with open(path, "a") as f:
+                f.write('{"step": "guest", "key": "a@mail.com", "res')
+
+            self.assertEqual(len(Journal(path)), 1)
+
+    def test_complete_forgets_the_job(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = journal_file(directory, "token", "org #42")
+            uut = Journal(path)
+            uut.record("room", result={"ID": "room"})
+
+            uut.complete()
+
+            self.assertFalse(os.path.exists(path))
+            self.assertIsNone(uut.result("room"))
+
+    def test_journal_per_bot_and_case(self):
+        with tempfile.TemporaryDirectory() as directory:
+            Journals(directory, "token").open("org #42").record("room", result={"ID": "room"})
+
+            self.assertEqual(len(Journals(directory, "token").open("org #42")), 1)
+            self.assertEqual(len(Journals(directory, "token").open("org #43")), 0)
+            self.assertEqual(len(Journals(directory, "other").open("org #42")), 0)
+
+    def test_without_directory_nothing_is_written(self):
+        uut = Journals(None, "token").open("org #42")
+        uut.record("room", result={"ID": "room"})
+
+        self.assertIsNone(uut.path)
+        self.assertEqual(uut.result("room"), {"ID": "room"})
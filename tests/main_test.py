@@ -1,14 +1,51 @@
+import dataclasses
+import http.server
+import json
+import os
+import requests
+import subprocess
+import sys
+import tempfile
+import threading
+from types import SimpleNamespace
 import unittest
 import webexcortex.__main__
-from webexcortex.main import main
+from webexcortex.datatypes import ReportVerbosity, RoomAction
+from webexcortex.main import main, cached_handler, make_bot_handler, pooled_handler, run, _handlers
+from webexcortex.pool import BotPool, bot_digest
+from webexcortex.responder import Config
 from unittest.mock import MagicMock, patch, call, seal, PropertyMock
 
 
+class _WebexRooms(http.server.BaseHTTPRequestHandler):
+    """Just enough of the Webex rooms API for a Delete room job."""
+
+    def _json(self, status: int, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._json(200, {"id": self.path.rsplit("/", 1)[-1], "title": "validtitle"})
+
+    def do_DELETE(self):
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
 class TestMain(unittest.TestCase):
     @patch('webexcortex.client.MembershipsAPI', autospec=True, spec_set=True)
     @patch("webexcortex.client.RoomsAPI", autospec=True, spec_set=True)
     @patch('webexteamssdk.WebexTeamsAPI')
     @patch('cortexutils.worker.Worker', autospec=True, spec_set=True)
+    @patch.dict('webexcortex.transport._apis', clear=True)
     def test_main(self, worker_cls, api_cls, room_cls, member_cls):
         self.maxDiff = None
 
@@ -20,15 +57,18 @@ class TestMain(unittest.TestCase):
         api = api_cls()
         type(api).rooms = PropertyMock(return_value=room_api)
         type(api).memberships = PropertyMock(return_value=member_api)
+        type(api).messages = PropertyMock(return_value=MagicMock())
+        api._session = SimpleNamespace(_req_session=requests.Session(), request=MagicMock())
         seal(api)
         api_cls.return_value = api
 
         worker = worker_cls.return_value
         worker.get_param.side_effect = [
-            "bottoken",
-            "Delete room",
-            "validroomid",
-            "validroomid",
+            {"webex_bot_token": "bottoken"},
+            {"customFields": {
+                "webexteams": {"string": "Delete room"},
+                "webexroomid": {"string": "validroomid"},
+            }},
         ]
         
 
@@ -40,10 +80,8 @@ class TestMain(unittest.TestCase):
             call.delete('validroomid')
         ])
         self.assertListEqual(worker_cls.method_calls, [
-            call().get_param('config.webex_bot_token', default=None),
-            call().get_param('data.customFields.webexteams.string', default=None),
-            call().get_param('data.customFields.webexroomid.string', default=None),
-            call().get_param('data.customFields.webexroomid.string', default=None),
+            call().get_param('config', default=None),
+            call().get_param('data', default=None),
             call().report(
                 output={
                     'success': True,
@@ -53,7 +91,8 @@ class TestMain(unittest.TestCase):
                         'tags': [],
                         'events': [
                             {'room found': {'ID': 'validroomid', 'Title': 'validtitle'}},
-                            {'room deleted': {'ID': 'validroomid', 'Title': 'validtitle'}}
+                            {'room deleted': {'ID': 'validroomid', 'Title': 'validtitle'}},
+                            {'steps run': [{'step': 'room', 'after': []}, {'step': 'delete room', 'after': ['room']}]}
                         ]
                     },
                     'operations': [
@@ -67,6 +106,7 @@ class TestMain(unittest.TestCase):
     @patch("webexcortex.client.RoomsAPI", autospec=True, spec_set=True)
     @patch('webexteamssdk.WebexTeamsAPI')
     @patch('cortexutils.worker.Worker', autospec=True, spec_set=True)
+    @patch.dict('webexcortex.transport._apis', clear=True)
     def test_main_exception(self, worker_cls, api_cls, room_cls, member_cls):
         self.maxDiff = None
 
@@ -78,12 +118,15 @@ class TestMain(unittest.TestCase):
         api = api_cls()
         type(api).rooms = PropertyMock(return_value=room_api)
         type(api).memberships = PropertyMock(return_value=member_api)
+        type(api).messages = PropertyMock(return_value=MagicMock())
+        api._session = SimpleNamespace(_req_session=requests.Session(), request=MagicMock())
         seal(api)
         api_cls.return_value = api
 
         worker = worker_cls.return_value
         worker.get_param.side_effect = [
-            None
+            None,
+            None,
         ]
         
         main()
@@ -93,10 +136,119 @@ class TestMain(unittest.TestCase):
             
         ])
         self.assertListEqual(worker_cls.method_calls, [
-           call().get_param('config.webex_bot_token', default=None),
-           call().error(message='Missing parameter: "config.webex_bot_token"', ensure_ascii=False)
+           call().get_param('config', default=None),
+           call().get_param('data', default=None),
+           call().error(
+               message='Missing parameter: "config.webex_bot_token"; Missing parameter: "data.customFields.webexteams.string"',
+               ensure_ascii=False
+            )
         ])
 
+    def test_run_summarizes_report(self):
+        handler = MagicMock()
+        resp = MagicMock()
+        resp.config = Config(webex_bot_token="token", webex_bot_tokens=("token",), webex_base_url=None, webex_http2=False, trace=False, state_directory=None, report_verbosity=ReportVerbosity.SUMMARY, transcript_directory=None, cache_ttl=0, webex_transcript_token=None)
+        resp.request.action = RoomAction.ADD_GUESTS
+
+        self.assertTrue(run(resp, lambda config: handler))
+
+        resp.report.assert_called_once_with(handler.handle.return_value.summarized.return_value)
+
+    @patch('webexcortex.main.make_handler')
+    def test_cached_handler(self, make_handler_mock):
+        _handlers.clear()
+        self.addCleanup(_handlers.clear)
+        make_handler_mock.side_effect = lambda config: MagicMock()
+        config = Config(webex_bot_token="token", webex_bot_tokens=("token",), webex_base_url=None, webex_http2=False, trace=False, state_directory=None, report_verbosity=ReportVerbosity.FULL, transcript_directory=None, cache_ttl=0, webex_transcript_token=None)
+
+        first = cached_handler(config)
+        second = cached_handler(dataclasses.replace(config, trace=True, report_verbosity=ReportVerbosity.SUMMARY))
+
+        self.assertIs(first, second, "settings that only shape the report share the handler")
+        make_handler_mock.assert_called_once_with(config)
+
+        for change in [
+            {"transcript_directory": "/transcripts"},
+            {"state_directory": "/state"},
+            {"webex_base_url": "http://localhost/v1/"},
+            {"cache_ttl": 30},
+            {"webex_transcript_token": "officer"},
+            {"webex_bot_tokens": ("token", "other")},
+        ]:
+            with self.subTest(change=change):
+                self.assertIsNot(cached_handler(dataclasses.replace(config, **change)), first)
+
+    @patch('webexcortex.transport.shared_api')
+    def test_transcripts_use_transcript_token(self, shared_api_mock):
+        with tempfile.TemporaryDirectory() as directory:
+            config = Config(webex_bot_token="token", webex_bot_tokens=("token",), webex_base_url=None, webex_http2=False, trace=False, state_directory=directory, report_verbosity=ReportVerbosity.FULL, transcript_directory=directory, cache_ttl=0, webex_transcript_token=None)
+
+            handler = make_bot_handler(config, "token")
+            self.assertIsNone(handler.client.messages_api, "the bot token would only list the messages that mention the bot")
+            with self.assertRaises(Exception):
+                list(handler.client.iter_messages("roomid"))
+
+            shared_api_mock.reset_mock()
+            make_bot_handler(dataclasses.replace(config, webex_transcript_token="officer"), "token")
+            self.assertListEqual(shared_api_mock.call_args_list, [call("token", None), call("officer", None)])
+
+    def test_pooled_handler(self):
+        factory = MagicMock(side_effect=lambda config, token: MagicMock(name=token))
+        config = Config(webex_bot_token="token", webex_bot_tokens=("token",), webex_base_url=None, webex_http2=False, trace=False, state_directory=None, report_verbosity=ReportVerbosity.FULL, transcript_directory=None, cache_ttl=0, webex_transcript_token=None)
+
+        handler = pooled_handler(config, factory)
+        factory.assert_called_once_with(config, "token")
+        self.assertEqual(handler._mock_name, "token", "a single bot runs without a pool")
+
+        factory.reset_mock()
+        with tempfile.TemporaryDirectory() as directory:
+            config = dataclasses.replace(config, webex_bot_tokens=("token", "other"), state_directory=directory)
+            pool = pooled_handler(config, factory)
+
+        self.assertIsInstance(pool, BotPool)
+        self.assertListEqual(factory.call_args_list, [call(config, "token"), call(config, "other")])
+        self.assertEqual(pool.primary, bot_digest("token"))
+        self.assertTrue(pool.affinity.path.startswith(directory))
+
+    def test_cli_writes_job_output(self):
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _WebexRooms)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        with tempfile.TemporaryDirectory() as job:
+            os.makedirs(os.path.join(job, "input"))
+            with open(os.path.join(job, "input", "input.json"), "w") as f:
+                json.dump({
+                    "dataType": "thehive:case",
+                    "config": {
+                        "webex_bot_token": "bottoken",
+                        "webex_base_url": f"http://127.0.0.1:{server.server_port}/v1/",
+                        "state_directory": os.path.join(job, "state"),
+                    },
+                    "data": {"customFields": {
+                        "webexteams": {"string": "Delete room"},
+                        "webexroomid": {"string": "validroomid"},
+                    }},
+                }, f)
+
+            out = subprocess.run([sys.executable, "-m", "webexcortex", job], capture_output=True, text=True, timeout=60)
+
+            self.assertEqual(out.returncode, 0, out.stderr)
+            self.assertEqual(out.stdout, "", "the report goes to the job directory")
+            with open(os.path.join(job, "output", "output.json")) as f:
+                output = json.load(f)
+        self.assertTrue(output["success"])
+        self.assertEqual(output["full"]["message"], "Room deleted validroomid")
+
+    def test_lazy_imports(self):
+        out = subprocess.run(
+            [sys.executable, "-c", "import sys, json, webexcortex.main; print(json.dumps(sorted(sys.modules)))"],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        loaded = json.loads(out)
+        for module in ["webexteamssdk", "requests", "cortexutils"]:
+            self.assertNotIn(module, loaded, f"{module} must only be imported when a job needs it")
+
     @patch.object(webexcortex.__main__.sys,'exit')
     @patch.object(webexcortex.__main__, "__name__", "__main__")
     @patch.object(webexcortex.__main__, 'main', return_value=42)
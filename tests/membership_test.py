@@ -0,0 +1,94 @@
+import unittest
+
+from webexcortex.datatypes import Member, MemberID
+from webexcortex.membership import MembershipIndex, RoomSizes, membership_digest, normalize_mail, scan, sync_plan, unique_mails
+
+ValidMember = Member(
+    ID=MemberID("validmemberid"),
+    Name="validname",
+    Mail="valid@mail.com",
+    IsModerator=True
+)
+
+ExtraMember = Member(
+    ID=MemberID("Extramemberid"),
+    Name="Extraname",
+    Mail="Extra@mail.com",
+    IsModerator=False
+)
+
+
+class TestMembershipIndex(unittest.TestCase):
+    def test_normalize_mail(self):
+        self.assertEqual(normalize_mail(" Extra@Mail.COM "), "extra@mail.com")
+
+    def test_lookup_is_case_insensitive(self):
+        uut = MembershipIndex([ValidMember, ExtraMember])
+
+        self.assertEqual(len(uut), 2)
+        self.assertIn("VALID@mail.com", uut)
+        self.assertIs(uut.get("extra@MAIL.com"), ExtraMember)
+        self.assertIsNone(uut.get("nobody@mail.com"))
+
+    def test_missing(self):
+        uut = MembershipIndex([ValidMember])
+
+        self.assertListEqual(
+            uut.missing(["Valid@Mail.com", "New@mail.com", "new@mail.com", "other@mail.com"]),
+            ["New@mail.com", "other@mail.com"],
+            "members and duplicates are dropped, the given spelling is kept",
+        )
+
+    def test_present(self):
+        uut = MembershipIndex([ValidMember, ExtraMember])
+
+        self.assertListEqual(uut.present(["extra@mail.com", "VALID@mail.com", "nobody@mail.com"]), [ValidMember, ExtraMember])
+
+    def test_scan_stops_when_all_found(self):
+        members = iter([ValidMember, ExtraMember])
+
+        self.assertEqual(scan(members, ["VALID@mail.com"]), ([ValidMember], 1))
+        self.assertIs(next(members), ExtraMember, "the rest of the room is not read")
+
+    def test_sync_plan(self):
+        add, remove = sync_plan([ValidMember, ExtraMember], ["new@mail.com", "NEW@mail.com", "valid@mail.com"])
+
+        self.assertListEqual(add, ["new@mail.com"])
+        self.assertListEqual(remove, [ExtraMember], "the moderator stays even though it is not a guest")
+        self.assertEqual(sync_plan([ExtraMember], [], owners=["extra@MAIL.com"]), ([], []))
+
+    def test_membership_digest(self):
+        shouted = Member(ID=MemberID("other"), Name="", Mail=ExtraMember.Mail.upper(), IsModerator=ExtraMember.IsModerator)
+        promoted = Member(ID=ExtraMember.ID, Name=ExtraMember.Name, Mail=ExtraMember.Mail, IsModerator=True)
+
+        digest = membership_digest([ValidMember, ExtraMember])
+        self.assertEqual(membership_digest([ExtraMember, ValidMember]), digest, "listing order does not matter")
+        self.assertEqual(membership_digest([ValidMember, shouted]), digest, "mails are compared normalized")
+        self.assertNotEqual(membership_digest([ValidMember, promoted]), digest)
+        self.assertNotEqual(membership_digest([ValidMember]), digest)
+
+    def test_unique_mails(self):
+        self.assertListEqual(unique_mails(["A@mail.com", "a@mail.com ", "b@mail.com"]), ["a@mail.com", "b@mail.com"])
+
+    def test_room_sizes(self):
+        uut = RoomSizes(maxsize=2)
+
+        self.assertTrue(uut.prefer_lookup("unknown", 3))
+        self.assertFalse(uut.prefer_lookup("unknown", 4))
+
+        uut.put("small", 80)
+        uut.put("large", 1000)
+        self.assertFalse(uut.prefer_lookup("small", 1), "one page lists the whole room")
+        self.assertTrue(uut.prefer_lookup("large", 9))
+        self.assertFalse(uut.prefer_lookup("large", 10))
+
+        uut.put("other", 1)
+        self.assertIsNone(uut.get("small"), "the oldest room is forgotten")
+
+    def test_scan_reads_all_for_missing(self):
+        self.assertEqual(scan([ValidMember, ExtraMember], ["extra@mail.com", "nobody@mail.com"]), ([ExtraMember], 2))
+        self.assertEqual(scan(iter([ValidMember]), []), ([], 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+import urllib.request
+from unittest.mock import MagicMock, patch
+
+from webexcortex import metrics
+from webexcortex.main import run
+from webexcortex.metrics import Metered, Registry, serve, write_textfile
+from webexcortex.datatypes import ReportVerbosity
+from webexcortex.responder import Config
+
+
+class ApiError(Exception):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class TestRegistry(unittest.TestCase):
+    def test_render(self):
+        uut = Registry()
+        uut.inc("webexcortex_jobs_total", action="Delete room", outcome="success")
+        uut.inc("webexcortex_jobs_total", action="Delete room", outcome="success")
+        uut.observe("webexcortex_job_seconds", 0.02, action="Delete room")
+        uut.observe("webexcortex_job_seconds", 60, action="Delete room")
+
+        text = uut.render()
+
+        self.assertIn("# TYPE webexcortex_jobs_total counter", text)
+        self.assertIn('webexcortex_jobs_total{action="Delete room",outcome="success"} 2', text)
+        self.assertIn('webexcortex_job_seconds_bucket{action="Delete room",le="0.01"} 0', text)
+        self.assertIn('webexcortex_job_seconds_bucket{action="Delete room",le="0.025"} 1', text)
+        self.assertIn('webexcortex_job_seconds_bucket{action="Delete room",le="30"} 1', text)
+        self.assertIn('webexcortex_job_seconds_bucket{action="Delete room",le="+Inf"} 2', text)
+        self.assertIn('webexcortex_job_seconds_count{action="Delete room"} 2', text)
+
+    def test_snapshot_merge(self):
+        first = Registry()
+        first.inc("webexcortex_api_calls_total", endpoint="rooms.get", status="ok")
+        first.observe("webexcortex_room_members", 3)
+        second = Registry()
+        second.inc("webexcortex_api_calls_total", endpoint="rooms.get", status="ok")
+        second.observe("webexcortex_room_members", 3)
+
+        first.merge(second.snapshot(reset=True))
+
+        self.assertEqual(first.counters[("webexcortex_api_calls_total", (("endpoint", "rooms.get"), ("status", "ok")))], 2)
+        self.assertEqual(first.histograms[("webexcortex_room_members", ())].count, 2)
+        self.assertEqual(second.counters, {})
+
+
+class TestMetered(unittest.TestCase):
+    def setUp(self):
+        self.registry = Registry()
+        registry_patch = patch.object(metrics, "REGISTRY", self.registry)
+        registry_patch.start()
+        self.addCleanup(registry_patch.stop)
+
+    def test_calls(self):
+        api = MagicMock()
+        api.get.side_effect = [MagicMock(), ApiError(429)]
+        uut = Metered(api, "rooms")
+
+        uut.get(roomId="room")
+        with self.assertRaises(ApiError):
+            uut.get(roomId="room")
+
+        self.assertEqual(self.registry.counters[("webexcortex_api_calls_total", (("endpoint", "rooms.get"), ("status", "ok")))], 1)
+        self.assertEqual(self.registry.counters[("webexcortex_api_calls_total", (("endpoint", "rooms.get"), ("status", "429")))], 1)
+        self.assertEqual(self.registry.counters[("webexcortex_api_throttled_total", (("endpoint", "rooms.get"),))], 1)
+
+    def test_list_counts_members(self):
+        api = MagicMock()
+        api.list.return_value = iter([1, 2, 3])
+        uut = Metered(api, "memberships")
+
+        self.assertEqual(list(uut.list(roomId="room")), [1, 2, 3])
+
+        self.assertEqual(self.registry.histograms[("webexcortex_room_members", ())].sum, 3)
+
+    def test_run_records_job(self):
+        handler = MagicMock()
+        resp = MagicMock()
+        resp.config = Config(webex_bot_token="token", webex_bot_tokens=("token",), webex_base_url=None, webex_http2=False, trace=False, state_directory=None, report_verbosity=ReportVerbosity.FULL, transcript_directory=None, cache_ttl=0, webex_transcript_token=None)
+        resp.request.action.value = "Add guests"
+        resp.request.guests = ("a@mail.com",)
+
+        self.assertTrue(run(resp, lambda config: handler))
+        handler.handle.side_effect = Exception("boom")
+        self.assertFalse(run(resp, lambda config: handler))
+
+        self.assertEqual(self.registry.counters[("webexcortex_jobs_total", (("action", "Add guests"), ("outcome", "success")))], 1)
+        self.assertEqual(self.registry.counters[("webexcortex_jobs_total", (("action", "Add guests"), ("outcome", "error")))], 1)
+        self.assertEqual(self.registry.histograms[("webexcortex_job_seconds", (("action", "Add guests"),))].count, 2)
+
+
+class TestExport(unittest.TestCase):
+    def test_write_textfile_accumulates(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "webexcortex.prom")
+            for _ in range(2):
+                registry = Registry()
+                registry.inc("webexcortex_jobs_total", action="Open room", outcome="success")
+                write_textfile(path, registry)
+                self.assertEqual(registry.counters, {})
+
+            with open(path) as f:
+                text = f.read()
+            self.assertIn('webexcortex_jobs_total{action="Open room",outcome="success"} 2', text)
+            self.assertEqual(sorted(os.listdir(root)), ["webexcortex.prom", "webexcortex.prom.json", "webexcortex.prom.lock"])
+
+    def test_serve(self):
+        registry = Registry()
+        registry.inc("webexcortex_jobs_total", action="Open room", outcome="success")
+        server = serve(0, "127.0.0.1", registry)
+        try:
+            host, port = server.server_address[:2]
+            with urllib.request.urlopen(f"http://{host}:{port}/metrics") as r:
+                text = r.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertIn('webexcortex_jobs_total{action="Open room",outcome="success"} 1', text)
@@ -0,0 +1,72 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from webexcortex.datatypes import Fields, Member, MemberID, Room, RoomID
+from webexcortex.handler import FullReport
+from webexcortex.output import JobOutput, iterencode, write_json
+from webexcortex.responder import Responder
+
+
+def _members(n: int):
+    return [Member(ID=MemberID(f"id{i}"), Name=f"Næme {i}", Mail=f"user{i}@mail.com", IsModerator=i == 0) for i in range(n)]
+
+
+class TestOutput(unittest.TestCase):
+    def test_same_text_as_json_dumps(self):
+        values = [
+            {},
+            [],
+            {"a": [], "b": {}, "c": [[], {}], "d": (1, 2)},
+            {1: "one", True: "yes", None: "nothing", 2.5: "half"},
+            {"events": [{"guests not in room": ["Ünïcode@mail.com", "\"quoted\"\n"]}], "n": [1.5, None, False]},
+            {"members": [m.to_dict() for m in _members(1000)]},
+            list(range(1000)),
+        ]
+        for value in values:
+            for ensure_ascii in (False, True):
+                with self.subTest(value=str(value)[:40], ensure_ascii=ensure_ascii):
+                    self.assertEqual("".join(iterencode(value, ensure_ascii=ensure_ascii)), json.dumps(value, ensure_ascii=ensure_ascii))
+
+    def test_records_are_encoded_by_to_dict(self):
+        members = _members(600)
+        report = FullReport(
+            message="Guests removed",
+            fields=Fields(roomid=RoomID("room")),
+            events=[{"room found": Room(ID=RoomID("room"), Title="title")}, {"guests in room": members}, {"guests removed": tuple(members)}],
+        )
+        out = io.StringIO()
+
+        write_json(out, report.to_records())
+
+        self.assertEqual(out.getvalue(), json.dumps(report.to_dict(), ensure_ascii=False))
+
+    def test_unknown_objects_are_rejected(self):
+        with self.assertRaises(TypeError):
+            "".join(iterencode({"a": object()}))
+
+    def test_responder_streams_to_job_directory(self):
+        report = FullReport(message="Room deleted", fields=Fields(roomid=""), events=[{"room deleted": Room(ID=RoomID("room"), Title="title")}])
+        with tempfile.TemporaryDirectory() as job_directory:
+            worker = MagicMock()
+            Responder(worker, output=JobOutput(job_directory)).report(report)
+
+            with open(os.path.join(job_directory, "output", "output.json")) as f:
+                written = f.read()
+            self.assertListEqual(os.listdir(os.path.join(job_directory, "output")), ["output.json"], "no temporary file is left behind")
+
+        worker.report.assert_not_called()
+        self.assertEqual(written, json.dumps({
+            'success': True,
+            'full': report.to_dict(),
+            'operations': [{'type': 'AddCustomFields', 'name': 'webexroomid', 'value': '', 'tpe': 'string'}],
+        }, ensure_ascii=False))
+
+    def test_stdout_without_job_directory(self):
+        with patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            JobOutput().write({"success": True}, ensure_ascii=False)
+
+        self.assertEqual(stdout.getvalue(), '{"success": true}')
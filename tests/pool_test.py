@@ -0,0 +1,138 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from webexcortex.datatypes import Fields, RoomAction, RoomID
+from webexcortex.handler import FullReport
+from webexcortex.pool import Affinity, BotPool, bot_digest, rendezvous
+
+
+def _create(case_id: int):
+    return MagicMock(action=RoomAction.CREATE, roomid=None, organization="org", case_id=case_id)
+
+
+def _room_action(action: RoomAction, roomid: str):
+    return MagicMock(action=action, roomid=RoomID(roomid))
+
+
+def _handler(roomid: str = ""):
+    handler = MagicMock()
+    handler.handle.return_value = FullReport(message="done", fields=Fields(roomid=RoomID(roomid)))
+    return handler
+
+
+def _budget(value: float):
+    return MagicMock(budget=MagicMock(return_value=value))
+
+
+class TestRendezvous(unittest.TestCase):
+    def test_only_keys_of_a_removed_bot_move(self):
+        bots = [f"bot{i}" for i in range(4)]
+        keys = [f"case {i}" for i in range(400)]
+
+        before = {key: rendezvous(key, bots)[0] for key in keys}
+        after = {key: rendezvous(key, bots[:3])[0] for key in keys}
+
+        moved = [key for key in keys if before[key] != after[key]]
+        self.assertTrue(all(before[key] == "bot3" for key in moved))
+        self.assertEqual(len(set(before.values())), 4, "keys are spread over every bot")
+
+
+class TestAffinity(unittest.TestCase):
+    def test_persisted(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "affinity.json")
+            uut = Affinity(path)
+            uut.put("bot", "room r1", "case org #1")
+            uut.discard("room missing")
+
+            reloaded = Affinity(path)
+            self.assertEqual(reloaded.get("room r1"), "bot")
+            self.assertEqual(reloaded.get("case org #1"), "bot")
+
+            reloaded.discard("room r1")
+            self.assertEqual(len(Affinity(path)), 1)
+
+    def test_shared_between_instances(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "affinity.json")
+            a = Affinity(path)
+            b = Affinity(path)
+
+            a.put("botA", "room r1")
+            b.put("botB", "room r2")
+
+            self.assertEqual(b.get("room r1"), "botA", "b sees what a wrote after it was opened")
+            reloaded = Affinity(path)
+            self.assertEqual((reloaded.get("room r1"), reloaded.get("room r2")), ("botA", "botB"), "neither write is lost")
+
+            a.discard("room r2")
+            self.assertIsNone(b.get("room r2"))
+
+
+class TestBotPool(unittest.TestCase):
+    def test_create_follows_the_case_hash(self):
+        handlers = {"a": _handler("room1"), "b": _handler("room1"), "c": _handler("room1")}
+        uut = BotPool(handlers, {token: _budget(10) for token in handlers})
+        req = _create(42)
+
+        bot, reason = uut.select(req)
+
+        self.assertEqual(bot, rendezvous("case org #42", [bot_digest(t) for t in handlers])[0])
+        self.assertEqual(reason, "hash")
+
+    def test_create_spreads_by_budget(self):
+        handlers = {"a": _handler("room1"), "b": _handler("room1")}
+        budgets = {"a": _budget(10), "b": _budget(10)}
+        uut = BotPool(handlers, budgets)
+        req = _create(42)
+        preferred, _ = uut.select(req)
+        other = "a" if preferred == bot_digest("b") else "b"
+        budgets["a" if other == "b" else "b"].budget.return_value = -3
+
+        bot, reason = uut.select(req)
+
+        self.assertEqual((bot, reason), (bot_digest(other), "budget"))
+
+    def test_room_sticks_to_its_creator(self):
+        handlers = {"a": _handler("room1"), "b": _handler("room1")}
+        budgets = {"a": _budget(10), "b": _budget(10)}
+        uut = BotPool(handlers, budgets)
+
+        uut.handle(_create(42))
+        creator = next(t for t, h in handlers.items() if h.handle.called)
+        for budget in budgets.values():
+            budget.budget.return_value = 10 if budget is not budgets[creator] else -100
+
+        for action in (RoomAction.ADD_GUESTS, RoomAction.DELETE):
+            self.assertEqual(uut.select(_room_action(action, "room1")), (bot_digest(creator), "affinity"))
+        self.assertEqual(uut.select(_create(42)), (bot_digest(creator), "affinity"), "a rerun of the case goes to the same bot")
+
+        uut.handle(_room_action(RoomAction.DELETE, "room1"))
+        self.assertEqual(uut.select(_room_action(RoomAction.ADD_GUESTS, "room1")), (bot_digest("a"), "primary"))
+
+    def test_interrupted_create_reruns_on_the_same_bot(self):
+        handlers = {"a": _handler("room1"), "b": _handler("room1")}
+        budgets = {"a": _budget(10), "b": _budget(10)}
+        uut = BotPool(handlers, budgets)
+        first, _ = uut.select(_create(42))
+        for handler in handlers.values():
+            handler.handle.side_effect = TimeoutError("job killed")
+
+        with self.assertRaises(TimeoutError):
+            uut.handle(_create(42))
+        # The other bot now has more of its budget left
+        next(budget for token, budget in budgets.items() if bot_digest(token) == first).budget.return_value = -100
+
+        self.assertEqual(uut.select(_create(42)), (first, "affinity"))
+
+    def test_unknown_rooms_go_to_primary(self):
+        handlers = {"a": _handler(), "b": _handler()}
+        uut = BotPool(handlers, {})
+
+        report = uut.handle(_room_action(RoomAction.REMOVE_GUESTS, "old"))
+
+        self.assertIs(report, handlers["a"].handle.return_value)
+        handlers["b"].handle.assert_not_called()
+        self.assertEqual(len(uut.affinity), 0)
@@ -0,0 +1,132 @@
+import unittest
+
+from webexcortex.ratelimit import AdaptiveRateLimiter, RateLimited, RateLimitExceeded, retry_after, shared_limiter
+from unittest.mock import MagicMock, call
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class Throttled(Exception):
+    def __init__(self, after: int) -> None:
+        super().__init__("429")
+        self.retry_after = after
+
+
+class TestRetryAfter(unittest.TestCase):
+    def test_retry_after(self):
+        self.assertEqual(retry_after(Throttled(3)), 3)
+        self.assertEqual(retry_after(MagicMock(spec=Exception, status_code=429, response=MagicMock(headers={"Retry-After": "7"}))), 7)
+        self.assertIsNone(retry_after(MagicMock(spec=Exception, status_code=404, response=None)))
+        self.assertIsNone(retry_after(Exception("boom")))
+
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+    def test_burst_then_paced(self):
+        clock = FakeClock()
+        uut = AdaptiveRateLimiter(rate=2, burst=2, increase=0, clock=clock, sleep=clock.sleep)
+
+        for _ in range(4):
+            uut.acquire()
+
+        self.assertAlmostEqual(clock.now, 1.0)
+        self.assertEqual(uut.queue_depth, 0)
+
+    def test_additive_increase(self):
+        uut = AdaptiveRateLimiter(rate=10, max_rate=11, increase=5)
+
+        uut.on_success()
+        self.assertAlmostEqual(uut.rate, 10.5)
+        uut.on_success()
+        uut.on_success()
+        self.assertEqual(uut.rate, 11, "rate is capped at max_rate")
+
+    def test_throttle_retries_after_backoff(self):
+        clock = FakeClock()
+        uut = AdaptiveRateLimiter(rate=8, burst=8, increase=0, clock=clock, sleep=clock.sleep)
+        fn = MagicMock(side_effect=[Throttled(5), "ok"])
+
+        self.assertEqual(uut.call(fn, 1, a=2), "ok")
+
+        self.assertListEqual(fn.mock_calls, [call(1, a=2), call(1, a=2)])
+        self.assertEqual(uut.rate, 4, "rate is halved on a 429")
+        self.assertEqual(uut.throttled, 1)
+        self.assertGreaterEqual(clock.now, 5, "callers wait for Retry-After")
+
+    def test_throttle_gives_up(self):
+        clock = FakeClock()
+        uut = AdaptiveRateLimiter(max_retries=2, clock=clock, sleep=clock.sleep)
+        fn = MagicMock(side_effect=Throttled(1))
+
+        with self.assertRaises(RateLimitExceeded):
+            uut.call(fn)
+        self.assertEqual(fn.call_count, 3)
+
+    def test_other_errors_are_raised(self):
+        uut = AdaptiveRateLimiter()
+        with self.assertRaises(KeyError):
+            uut.call(MagicMock(side_effect=KeyError("x")))
+
+    def test_budget(self):
+        clock = FakeClock()
+        uut = AdaptiveRateLimiter(rate=2, burst=4, increase=0, clock=clock, sleep=clock.sleep)
+
+        self.assertEqual(uut.budget(), 4)
+        uut.acquire()
+        uut.acquire()
+        self.assertEqual(uut.budget(), 2)
+        clock.now += 0.5
+        self.assertEqual(uut.budget(), 3, "refilled at the current rate")
+
+        uut.on_throttle(3)
+        self.assertLess(uut.budget(), 0, "nothing is left while a 429 pause lasts")
+
+    def test_shared_limiter(self):
+        self.assertIs(shared_limiter("token"), shared_limiter("token"))
+        self.assertIsNot(shared_limiter("token"), shared_limiter("other"))
+
+
+class TestRateLimited(unittest.TestCase):
+    def test_proxy(self):
+        api = MagicMock()
+        api.get.return_value = "room"
+        api.list.return_value = iter(["a", "b"])
+        limiter = AdaptiveRateLimiter()
+
+        uut = RateLimited(api, limiter)
+
+        self.assertEqual(uut.get(roomId="id"), "room")
+        self.assertListEqual(list(uut.list(roomId="id")), ["a", "b"])
+        self.assertListEqual(api.method_calls, [call.get(roomId="id"), call.list(roomId="id")])
+
+    def test_list_restarts_after_throttle(self):
+        def pages(roomId):
+            yield "a"
+            if api.list.call_count == 1:
+                raise Throttled(0)
+            yield "b"
+
+        api = MagicMock()
+        api.list.side_effect = pages
+        sleeps = []
+        limiter = AdaptiveRateLimiter(sleep=sleeps.append)
+
+        uut = RateLimited(api, limiter)
+
+        self.assertListEqual(list(uut.list(roomId="id")), ["a", "b"], "items before the 429 are not repeated")
+        self.assertEqual(api.list.call_count, 2)
+        self.assertEqual(limiter.throttled, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,68 +1,203 @@
 import unittest
 
-from webexcortex.datatypes import Member, MemberID, RoomAction, RoomID, Room
-from webexcortex.responder import Config, Request
+from webexcortex.datatypes import Member, MemberID, ReportVerbosity, RoomAction, RoomID, Room
+from webexcortex.responder import Config, ParamError, Request, Responder
 from unittest.mock import MagicMock, patch, call
 
+
+def _params(values):
+    """Nest dotted values the way Cortex delivers the job input."""
+    roots = {}
+    for name, value in values.items():
+        *path, leaf = name.split('.')
+        node = roots
+        for key in path:
+            node = node.setdefault(key, {})
+        node[leaf] = value
+    return lambda name, default: roots.get(name, default)
+
+
+CreateValues = {
+    "config.webex_bot_token": "token",
+    "data.owner": "me@org.com",
+    "data.customFields.webexteams.string": "Open room",
+    "data.caseId": 42,
+    "data.title": "cstitle",
+    "config.organization": "org",
+    "data.customFields.webexroomid.string": "validroomid",
+    "data.tags": ["flaf", "wbx=\"user@com.org\""]
+}
+
+
 class TestConfig(unittest.TestCase):
     @patch('webexcortex.responder.IParams', autospec=True, spec_set=True)
-    def test_get_members(self, params_cls):
+    def test_get_token(self, params_cls):
         
         params_mock = params_cls()
-        params_mock.get_param.side_effect = [
-            "token"
-        ]
+        params_mock.get_param.side_effect = _params({"config.webex_bot_token": "token"})
         
-        uut = Config(params_mock)
+        uut = Config.parse(params_mock)
         self.assertEqual(uut.webex_bot_token, "token")
+        self.assertEqual(uut.report_verbosity, ReportVerbosity.FULL)
+
+    @patch('webexcortex.responder.IParams', autospec=True, spec_set=True)
+    def test_bot_tokens(self, params_cls):
+
+        params_mock = params_cls()
+        params_mock.get_param.side_effect = _params({"config.webex_bot_token": "token"})
+        self.assertEqual(Config.parse(params_mock).webex_bot_tokens, ("token",))
+
+        params_mock.get_param.side_effect = _params({"config.webex_bot_token": "token", "config.webex_bot_tokens": ["other", "token", "third"]})
+        self.assertEqual(Config.parse(params_mock).webex_bot_tokens, ("token", "other", "third"), "the primary bot first, once")
+
+        params_mock.get_param.side_effect = _params({"config.webex_bot_token": "token", "config.webex_bot_tokens": ["other", ""]})
+        with self.assertRaisesRegex(ParamError, 'webex_bot_tokens" must only hold bot tokens'):
+            Config.parse(params_mock)
+
+    @patch('webexcortex.responder.IParams', autospec=True, spec_set=True)
+    def test_report_verbosity(self, params_cls):
+
+        params_mock = params_cls()
+        params_mock.get_param.side_effect = _params({"config.webex_bot_token": "token", "config.report_verbosity": "summary"})
+        self.assertEqual(Config.parse(params_mock).report_verbosity, ReportVerbosity.SUMMARY)
+
+        params_mock.get_param.side_effect = _params({"config.webex_bot_token": "token", "config.report_verbosity": "terse"})
+        with self.assertRaisesRegex(ParamError, 'report_verbosity" \\[terse\\] is not one of'):
+            Config.parse(params_mock)
+
+    @patch('webexcortex.responder.IParams', autospec=True, spec_set=True)
+    def test_cache_ttl(self, params_cls):
+
+        params_mock = params_cls()
+        params_mock.get_param.side_effect = _params({"config.webex_bot_token": "token"})
+        self.assertEqual(Config.parse(params_mock).cache_ttl, 0, "caching is opt-in")
+
+        params_mock.get_param.side_effect = _params({"config.webex_bot_token": "token", "config.cache_ttl": 30})
+        self.assertEqual(Config.parse(params_mock).cache_ttl, 30)
+
+        params_mock.get_param.side_effect = _params({"config.webex_bot_token": "token", "config.cache_ttl": -1})
+        with self.assertRaisesRegex(ParamError, 'cache_ttl" must not be negative'):
+            Config.parse(params_mock)
+
+    @patch('webexcortex.responder.IParams', autospec=True, spec_set=True)
+    def test_transcript_token(self, params_cls):
+
+        params_mock = params_cls()
+        params_mock.get_param.side_effect = _params({"config.webex_bot_token": "token"})
+        self.assertIsNone(Config.parse(params_mock).webex_transcript_token)
+
+        params_mock.get_param.side_effect = _params({"config.webex_bot_token": "token", "config.webex_transcript_token": "officer"})
+        self.assertEqual(Config.parse(params_mock).webex_transcript_token, "officer")
 
     @patch('webexcortex.responder.IParams', autospec=True, spec_set=True)
     def test_get_members(self, params_cls):
         
-        values = {
-            "data.owner": "me@org.com",
-            "data.customFields.webexteams.string": "Open room",
-            "data.caseId": 42,
-            "data.title": "cstitle",
-            "config.organization": "org",
-            "data.customFields.webexroomid.string": "validroomid",
-            "data.tags": ["flaf", "wbx=\"user@com.org\""]
-        }
-
         params_mock = params_cls()
-        params_mock.get_param.side_effect = lambda x, default : values[x]
+        params_mock.get_param.side_effect = _params(CreateValues)
        
         
-        uut = Request(params_mock)
+        uut = Request.parse(params_mock)
         self.assertEqual(uut.action, RoomAction.CREATE)
         self.assertEqual(uut.case_id, 42)
         self.assertEqual(uut.case_title, "cstitle")
         self.assertEqual(uut.organization, "org")
         self.assertEqual(uut.title, "org #42 - cstitle")
         self.assertEqual(uut.roomid, "validroomid")
-        self.assertListEqual(uut.tags, ["flaf", "wbx=\"user@com.org\""])
-        self.assertListEqual(uut.guests, ["user@com.org"])
-        self.assertListEqual(uut.owners, ["me@org.com"])
+        self.assertTupleEqual(uut.tags, ("flaf", "wbx=\"user@com.org\""))
+        self.assertTupleEqual(uut.guests, ("user@com.org",))
+        self.assertTupleEqual(uut.owners, ("me@org.com",))
+
+    @patch('webexcortex.responder.IParams', autospec=True, spec_set=True)
+    def test_snapshot(self, params_cls):
+
+        params_mock = params_cls()
+        params_mock.get_param.side_effect = _params(CreateValues)
+
+        uut = Request.parse(params_mock)
+        uut.guests
+        uut.title
+
+        self.assertListEqual(params_mock.method_calls, [
+            call.get_param('data', default=None),
+            call.get_param('config', default=None),
+        ], "each root is read once")
+        with self.assertRaises(AttributeError):
+            uut.roomid = "other"
+        with self.assertRaises(AttributeError):
+            uut.__dict__
+
+    @patch('webexcortex.responder.IParams', autospec=True, spec_set=True)
+    def test_create_without_room(self, params_cls):
+
+        values = dict(CreateValues)
+        values["data.customFields.webexroomid.string"] = ""
+        params_mock = params_cls()
+        params_mock.get_param.side_effect = _params(values)
+
+        uut = Request.parse(params_mock)
+        self.assertIsNone(uut.roomid)
+
+    @patch('webexcortex.responder.IParams', autospec=True, spec_set=True)
+    def test_delete_needs_only_room(self, params_cls):
+
+        params_mock = params_cls()
+        params_mock.get_param.side_effect = _params({
+            "data.customFields.webexteams.string": "Delete room",
+            "data.customFields.webexroomid.string": "validroomid",
+        })
+
+        uut = Request.parse(params_mock)
+        self.assertEqual(uut.action, RoomAction.DELETE)
+        self.assertEqual(uut.roomid, "validroomid")
+        self.assertIsNone(uut.title)
+        self.assertTupleEqual(uut.owners, ())
 
     @patch('webexcortex.responder.IParams', autospec=True, spec_set=True)
     def test_get_members_exception(self, params_cls):
         
-        values = {
+        params_mock = params_cls()
+        params_mock.get_param.side_effect = _params({
+            "data.customFields.webexteams.string": "Open room",
             "data.owner": 32,
             "data.title": "",
-        }
+            "data.tags": ["wbx=not json"],
+        })
+       
+        with self.assertRaises(ParamError) as ctx:
+            Request.parse(params_mock)
+
+        self.assertEqual(str(ctx.exception), "; ".join([
+            'Invalid parameter value: "data.title" must not be empty',
+            'Missing parameter: "data.caseId"',
+            'Missing parameter: "config.organization"',
+            'Invalid parameter type: "data.owner" is [int] expected [str]',
+            'Invalid parameter value: "data.tags" has a malformed guest tag [wbx=not json]',
+        ]), "all errors are reported together")
+
+    @patch('webexcortex.responder.IParams', autospec=True, spec_set=True)
+    def test_invalid_action(self, params_cls):
 
         params_mock = params_cls()
-        params_mock.get_param.side_effect = lambda x, default : values[x]
-       
-        
-        uut = Request(params_mock)
-        with self.assertRaises(Exception):
-            uut.owners
+        params_mock.get_param.side_effect = _params({
+            "data.customFields.webexteams.string": "Dance",
+        })
+
+        with self.assertRaises(ParamError):
+            Request.parse(params_mock)
+
+
+class TestResponder(unittest.TestCase):
+    @patch('webexcortex.responder.IWorker', autospec=True, spec_set=True)
+    def test_parsed_once(self, worker_cls):
+
+        worker_mock = worker_cls()
+        worker_mock.get_param.side_effect = _params(CreateValues)
 
-        with self.assertRaises(Exception):
-            uut.case_title
+        uut = Responder(worker_mock)
+        self.assertEqual(uut.config.webex_bot_token, "token")
+        self.assertIs(uut.request, uut.request)
+        self.assertEqual(worker_mock.get_param.call_count, 2)
         
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
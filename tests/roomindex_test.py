@@ -0,0 +1,113 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from webexcortex.cache import CachingClient
+from webexcortex.datatypes import Room, RoomID
+from webexcortex.ratelimit import RateLimitExceeded
+from webexcortex.roomindex import RoomIndex, parse_title, state_file
+
+
+def _room(n: int, title: str = "") -> Room:
+    return Room(ID=RoomID(f"room{n}"), Title=title or f"org #{n} - case {n}")
+
+
+class _ApiError(Exception):
+    def __init__(self, status_code: int) -> None:
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class TestRoomIndex(unittest.TestCase):
+    def test_parse_title(self):
+        self.assertEqual(parse_title("org #42 - some - case"), "org #42")
+        self.assertEqual(parse_title("my org #42 - case"), "my org #42")
+        self.assertIsNone(parse_title("team chat"))
+
+    def test_refresh_stops_at_known_rooms(self):
+        uut = RoomIndex()
+
+        self.assertEqual(uut.refresh([_room(2), _room(1), _room(0, "team chat")]), 3)
+        self.assertEqual(uut.get("org #1"), "room1")
+        self.assertEqual(len(uut), 2)
+
+        listed = []
+        def newest_first():
+            for room in [_room(4), _room(3), _room(2), _room(1)]:
+                listed.append(room.ID)
+                yield room
+
+        self.assertEqual(uut.refresh(newest_first()), 2)
+        self.assertListEqual(listed, ["room4", "room3", "room2"], "the listing stops at the first known room")
+        self.assertEqual(uut.get("org #4"), "room4")
+
+    def test_newest_room_of_a_case_wins(self):
+        uut = RoomIndex()
+        uut.refresh([Room(ID=RoomID("new"), Title="org #1 - case"), Room(ID=RoomID("old"), Title="org #1 - case")])
+
+        self.assertEqual(uut.get("org #1"), "new")
+
+    def test_persisted(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = state_file(os.path.join(root, "state"), "rooms", "token")
+            RoomIndex(path).refresh([_room(1)])
+
+            uut = RoomIndex(path)
+            self.assertEqual(uut.get("org #1"), "room1")
+            self.assertEqual(uut.refresh([_room(1)]), 0)
+
+            uut.discard(RoomID("room1"))
+            self.assertIsNone(RoomIndex(path).get("org #1"))
+
+    def test_find_drops_deleted_rooms(self):
+        client = MagicMock(spec=["iter_rooms", "get_room"])
+        client.iter_rooms.return_value = iter([_room(1)])
+        client.get_room.side_effect = _ApiError(404)
+        uut = RoomIndex()
+
+        self.assertIsNone(uut.find("org #1", client))
+        self.assertIsNone(uut.get("org #1"))
+
+    def test_find_checks_past_the_cache(self):
+        client = MagicMock(spec=["iter_rooms", "get_room"])
+        client.get_room.return_value = _room(1)
+        cached = CachingClient(client)
+        uut = RoomIndex()
+        uut.refresh([_room(1)])
+        cached.get_room(RoomID("room1"))
+
+        # Deleted by another process while the room is still cached
+        client.get_room.side_effect = _ApiError(404)
+
+        self.assertIsNone(uut.find("org #1", cached))
+        self.assertIsNone(uut.get("org #1"))
+
+    def test_discard_drops_the_mark(self):
+        uut = RoomIndex()
+        uut.refresh([_room(n) for n in range(8, 0, -1)])
+        for n in range(8, 1, -1):
+            uut.discard(RoomID(f"room{n}"))
+        uut.refresh([_room(9), _room(1)])
+        uut.discard(RoomID("room9"))
+
+        listed = []
+        def newest_first():
+            for room in [_room(10), _room(1), _room(0)]:
+                listed.append(room.ID)
+                yield room
+
+        self.assertEqual(uut.refresh(newest_first()), 1)
+        self.assertListEqual(listed, ["room10", "room1"], "deleted rooms do not push the last live mark out")
+
+    def test_find_keeps_rooms_on_other_errors(self):
+        client = MagicMock(spec=["iter_rooms", "get_room"])
+        uut = RoomIndex()
+        uut.refresh([_room(1)])
+
+        for error in [_ApiError(500), RateLimitExceeded("still throttled"), ConnectionError("reset")]:
+            with self.subTest(error=error):
+                client.get_room.side_effect = error
+                with self.assertRaises(type(error)):
+                    uut.find("org #1", client)
+                self.assertEqual(uut.get("org #1"), "room1", "a room that may still exist is not forgotten")
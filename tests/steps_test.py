@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import unittest
+
+from webexcortex.steps import StepGraph, arun_plan, run_plan
+
+
+def _diamond(calls):
+    graph = StepGraph()
+    graph.add("room", lambda: calls.append("room") or "room")
+    graph.add("owners", lambda room: calls.append("owners") or f"owners of {room}", after=("room",))
+    graph.add("guests", lambda room: calls.append("guests") or f"guests of {room}", after=("room",))
+    graph.add("report", lambda owners, guests: f"{owners}, {guests}", after=("owners", "guests"))
+    return graph
+
+
+class TestStepGraph(unittest.TestCase):
+    def test_results_of_dependencies_are_passed(self):
+        calls = []
+        graph = _diamond(calls)
+
+        results = graph.run()
+
+        self.assertEqual(results["report"], "owners of room, guests of room")
+        self.assertEqual(calls[0], "room")
+        self.assertListEqual([step.name for step in graph.started], ["room", "owners", "guests", "report"])
+
+    def test_independent_steps_overlap(self):
+        # Neither step can finish unless the other one runs at the same time
+        barrier = threading.Barrier(2, timeout=5)
+        graph = StepGraph()
+        graph.add("a", lambda: barrier.wait())
+        graph.add("b", lambda: barrier.wait())
+
+        graph.run()
+
+    def test_failure_stops_dependents(self):
+        calls = []
+        graph = StepGraph()
+        graph.add("room", lambda: calls.append("room"))
+        graph.add("members", lambda: (_ for _ in ()).throw(KeyError("members")))
+        graph.add("add", lambda room, members: calls.append("add"), after=("room", "members"))
+
+        with self.assertRaises(KeyError):
+            graph.run()
+        self.assertListEqual(calls, ["room"], "the steps in flight finish, the ones after the failure never start")
+
+    def test_first_declared_error_is_raised(self):
+        started = threading.Barrier(2, timeout=5)
+
+        def fail(error):
+            started.wait()
+            raise error
+
+        graph = StepGraph()
+        graph.add("room", lambda: fail(LookupError("room")))
+        graph.add("members", lambda: fail(ValueError("members")))
+
+        with self.assertRaises(LookupError):
+            graph.run()
+
+    def test_steps_only_run_after_declared_steps(self):
+        graph = StepGraph()
+        graph.add("room", lambda: None)
+
+        with self.assertRaises(ValueError):
+            graph.add("add", lambda members: None, after=("members",))
+        with self.assertRaises(ValueError):
+            graph.add("room", lambda: None)
+
+    def test_arun(self):
+        both = asyncio.Event()
+
+        async def room():
+            return "room"
+
+        async def owners(room):
+            # Only finishes once guests started too
+            await asyncio.wait_for(both.wait(), 5)
+            return f"owners of {room}"
+
+        async def guests(room):
+            both.set()
+            return f"guests of {room}"
+
+        graph = StepGraph()
+        graph.add("room", room)
+        graph.add("owners", owners, after=("room",))
+        graph.add("guests", guests, after=("room",))
+        graph.add("report", lambda owners, guests: f"{owners}, {guests}", after=("owners", "guests"))
+
+        results = asyncio.run(graph.arun())
+
+        self.assertEqual(results["report"], "owners of room, guests of room", "steps may also return plain values")
+        self.assertListEqual([step.name for step in graph.started], ["room", "owners", "guests", "report"])
+
+    def test_plans(self):
+        def plan():
+            first = StepGraph()
+            first.add("room", lambda: "room")
+            found = yield first
+            second = StepGraph()
+            second.add("guests", lambda: f"guests of {found['room']}")
+            results = yield second
+            return results["guests"]
+
+        self.assertEqual(run_plan(plan()), "guests of room")
+        self.assertEqual(asyncio.run(arun_plan(plan())), "guests of room", "blocking steps of a plan also run on a loop")
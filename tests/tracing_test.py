@@ -0,0 +1,72 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+from webexcortex.client import Client
+from webexcortex.datatypes import ReportVerbosity, RoomAction, RoomID
+from webexcortex.main import run
+from webexcortex.responder import Config
+from webexcortex.tracing import Traced, span, timings, trace, traced
+
+
+class TestTracing(unittest.TestCase):
+    def test_untraced_is_noop(self):
+        with span("step") as s:
+            s.set("key", "value")
+
+        @traced("fn")
+        def fn(value):
+            return value
+
+        self.assertEqual(fn(3), 3)
+
+    def test_nesting(self):
+        @traced("inner")
+        def inner():
+            with span("leaf", n=1):
+                pass
+
+        with trace("job") as root:
+            inner()
+            inner()
+
+        summary = root.summary()
+        self.assertEqual(summary["job/inner"]["calls"], 2)
+        self.assertEqual(summary["job/inner/leaf"]["calls"], 2)
+        self.assertEqual(root.children[0].children[0].attributes, {"n": 1})
+        self.assertIn("timings", timings(root))
+
+    def test_error_is_recorded(self):
+        with trace("job") as root:
+            with self.assertRaises(ValueError):
+                with span("step"):
+                    raise ValueError()
+
+        self.assertEqual(root.children[0].attributes["error"], "ValueError")
+
+    def test_fan_out_threads_nest(self):
+        rooms = MagicMock()
+        memberships = MagicMock()
+        client = Client(room_api=Traced(rooms, "rooms"), memberships_api=Traced(memberships, "memberships"), max_workers=4)
+
+        with trace("job") as root:
+            client.add_members(RoomID("room"), ["a@mail.com", "b@mail.com", "c@mail.com"], False)
+
+        summary = root.summary()
+        self.assertEqual(summary["job/client.add_members"]["calls"], 1)
+        self.assertEqual(summary["job/client.add_members/memberships.create"]["calls"], 3)
+
+    def test_run_attaches_timings(self):
+        report = MagicMock(events=[])
+        handler = MagicMock()
+        handler.handle.return_value = report
+        resp = MagicMock()
+        resp.config = Config(webex_bot_token="token", webex_bot_tokens=("token",), webex_base_url=None, webex_http2=False, trace=True, state_directory=None, report_verbosity=ReportVerbosity.FULL, transcript_directory=None, cache_ttl=0, webex_transcript_token=None)
+        resp.request.action = RoomAction.DELETE
+
+        self.assertTrue(run(resp, lambda config: handler))
+
+        resp.report.assert_called_once_with(report)
+        self.assertIn("timings", report.events[-1])
+        self.assertIn("job", report.events[-1]["timings"])
+
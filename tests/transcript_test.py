@@ -0,0 +1,94 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from webexcortex.datatypes import Message, MessageID, Room, RoomID
+from webexcortex.transcript import Transcripts, prefetch
+
+ValidRoom = Room(ID=RoomID("validid"), Title="new title")
+
+
+def _messages(n: int):
+    return [
+        Message(
+            ID=MessageID(f"m{i}"),
+            Created=f"2024-01-01T00:00:{i % 60:02d}.000Z",
+            PersonEmail=f"user{i % 3}@mail.com",
+            Text=f"mëssage {i}",
+            Files=(f"https://files/{i}",) if i % 10 == 0 else (),
+            ParentID=None,
+        )
+        for i in range(n)
+    ]
+
+
+class TestPrefetch(unittest.TestCase):
+    def test_keeps_order(self):
+        self.assertListEqual(list(prefetch(iter(range(1234)), depth=10)), list(range(1234)))
+
+    def test_raises_listing_error_after_items(self):
+        def items():
+            yield 1
+            yield 2
+            raise ValueError("page failed")
+
+        got = []
+        with self.assertRaises(ValueError):
+            for item in prefetch(items()):
+                got.append(item)
+        self.assertListEqual(got, [1, 2])
+
+    def test_stops_reading_when_closed(self):
+        read = []
+        done = threading.Event()
+
+        def items():
+            try:
+                for i in range(100000):
+                    read.append(i)
+                    yield i
+            finally:
+                done.set()
+
+        it = prefetch(items(), depth=10)
+        self.assertEqual(next(it), 0)
+        it.close()
+
+        self.assertTrue(done.wait(5), "the background listing ends once the reader is gone")
+        self.assertLess(len(read), 1000)
+
+
+class TestTranscripts(unittest.TestCase):
+    def test_export(self):
+        messages = _messages(250)
+        with tempfile.TemporaryDirectory() as directory:
+            transcript = Transcripts(directory).export(ValidRoom, iter(messages))
+
+            self.assertListEqual(os.listdir(directory), [os.path.basename(transcript.path)])
+            with open(transcript.path, "rb") as f:
+                data = f.read()
+
+        self.assertEqual(transcript.messages, 250)
+        self.assertEqual(transcript.files, 25)
+        self.assertEqual(transcript.bytes, len(data))
+        self.assertEqual(transcript.sha256, hashlib.sha256(data).hexdigest())
+
+        lines = [json.loads(line) for line in gzip.decompress(data).decode().splitlines()]
+        self.assertEqual(lines[0]["room"], {"ID": "validid", "Title": "new title"})
+        self.assertIn("exported", lines[0])
+        self.assertListEqual(lines[1:], [m.to_dict() for m in messages])
+
+    def test_failed_export_leaves_nothing(self):
+        def messages():
+            yield from _messages(5)
+            raise Exception("page failed")
+
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaises(Exception):
+                Transcripts(directory).export(ValidRoom, messages())
+
+            self.assertListEqual(os.listdir(directory), [])
@@ -0,0 +1,123 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlsplit
+
+from webexcortex import metrics, transport
+from webexcortex.ratelimit import AdaptiveRateLimiter, RateLimited
+from webexcortex.transport import PooledAdapter, shared_api
+
+
+class _KeepAlive(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        data = b'{"items": []}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _Pages(BaseHTTPRequestHandler):
+    """Five pages of two rooms, linked by cursor; the third page is throttled once."""
+
+    requests = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        cursor = int(parse_qs(urlsplit(self.path).query).get("cursor", ["0"])[0])
+        self.requests.append(cursor)
+        if cursor == 2 and self.requests.count(2) == 1:
+            self.send_response(429)
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        items = [{"id": f"room{cursor * 2 + i}", "title": "room"} for i in range(2)]
+        data = json.dumps({"items": items}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if cursor < 4:
+            host, port = self.server.server_address[:2]
+            self.send_header("Link", f'<http://{host}:{port}/v1/rooms?cursor={cursor + 1}>; rel="next"')
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+class TestTransport(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAlive)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        host, port = self.server.server_address[:2]
+        self.base_url = f"http://{host}:{port}/v1/"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @patch.dict('webexcortex.transport._adapters', clear=True)
+    @patch.dict('webexcortex.transport._apis', clear=True)
+    def test_shared_api_reuses_connections(self):
+        registry = metrics.Registry()
+        with patch.object(metrics, "REGISTRY", registry):
+            api = shared_api("token", self.base_url, pool_size=4)
+            self.assertIs(shared_api("token", self.base_url), api)
+            self.assertIsNot(shared_api("other", self.base_url), api)
+
+            adapter = api._session._req_session.get_adapter(self.base_url)
+            self.assertIsInstance(adapter, PooledAdapter)
+
+            for _ in range(5):
+                list(api.rooms.list())
+
+        stats = adapter.stats()
+        self.assertEqual(stats["requests"], 5)
+        self.assertEqual(stats["connections"], 1)
+        self.assertEqual(stats["reused"], 4)
+        self.assertEqual(registry.counters[("webexcortex_http_requests_total", ())], 5)
+        self.assertEqual(registry.counters[("webexcortex_http_connections_total", ())], 1)
+        self.assertEqual(len(transport.stats()), 2)
+
+    @patch.dict('webexcortex.transport._adapters', clear=True)
+    @patch.dict('webexcortex.transport._apis', clear=True)
+    def test_listing_pages_are_limited(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _Pages)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        host, port = server.server_address[:2]
+        _Pages.requests = []
+        clock = _Clock()
+        limiter = AdaptiveRateLimiter(rate=1.0, burst=1, min_rate=1.0, max_rate=1.0, clock=clock, sleep=clock.sleep)
+
+        api = shared_api("token", f"http://{host}:{port}/v1/")
+        rooms = [r.id for r in RateLimited(api.rooms, limiter).list()]
+
+        self.assertListEqual(rooms, [f"room{i}" for i in range(10)])
+        self.assertListEqual(_Pages.requests, [0, 1, 2, 2, 3, 4], "the throttled page is retried from its cursor")
+        self.assertEqual(limiter.throttled, 1)
+        # A token per page at 1 call/s, and the Retry-After pause before the retry
+        self.assertGreaterEqual(clock.now, 5.0)
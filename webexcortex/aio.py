@@ -0,0 +1,46 @@
+import asyncio
+
+from .handler import FullReport, Handler, IRequest
+from .steps import arun_plan
+
+
+class AsyncHandler:
+    """Runs the plans of a Handler on an event loop, for callers that already have one.
+
+    The steps are the Handler's own, so the report is the same; the Webex SDK
+    is synchronous, so its calls still run on the step threads.
+    """
+
+    def __init__(self, handler: Handler) -> None:
+        self.handler = handler
+
+    async def handle(self, req: IRequest) -> FullReport:
+        return await arun_plan(self.handler.plan(req))
+
+
+class BlockingHandler:
+    """Runs an AsyncHandler behind the synchronous Handler interface used by main."""
+
+    def __init__(self, handler: AsyncHandler) -> None:
+        self.handler = handler
+
+    def handle(self, req: IRequest) -> FullReport:
+        return asyncio.run(self.handler.handle(req))
+
+
+def make_bot_handler(config, token: str):
+    from .main import make_bot_handler as make_sync_handler
+    return BlockingHandler(
+        handler=AsyncHandler(make_sync_handler(config, token))
+    )
+
+
+def make_handler(config):
+    from .main import pooled_handler
+    return pooled_handler(config, make_bot_handler)
+
+
+__all__ = [cls.__name__ for cls in [
+    AsyncHandler,
+    BlockingHandler,
+]]
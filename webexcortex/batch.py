@@ -0,0 +1,161 @@
+import argparse
+import concurrent.futures
+import copy
+import json
+import sys
+from typing import Any, Callable, Dict, Hashable, IO, Iterable, Iterator, List, Optional
+
+from . import metrics
+from .handler import Handler
+from .output import write_json
+from .responder import Config, Responder
+
+
+#region Worker for in-memory jobs
+
+class DictParams:
+    """IParams over a decoded Cortex job input."""
+
+    def __init__(self, input: Dict[str, Any]) -> None:
+        self._input = input
+
+    def get_param(self, name: str, default: Any = None) -> Any:
+        val: Any = self._input
+        for key in name.split('.'):
+            if not isinstance(val, dict):
+                return default
+            val = val.get(key)
+            if val is None:
+                return default
+        return val
+
+
+class BatchWorker(DictParams):
+    """IWorker that keeps the output of a job instead of writing it to the job directory.
+
+    The output is the document cortexutils' Worker would have written.
+    """
+
+    output: Optional[Dict[str, Any]]
+
+    def __init__(self, input: Dict[str, Any]) -> None:
+        super().__init__(input)
+        self.output = None
+
+    def report(self, output, ensure_ascii=False):
+        self.output = output
+
+    def error(self, message, ensure_ascii=False):
+        # Same scrubbing as cortexutils, without touching the input of other jobs
+        job_input = copy.deepcopy(self._input)
+        config = job_input.get('config') if isinstance(job_input, dict) else None
+        for config_key in list(config or {}):
+            if any(secret in config_key.lower() for secret in ['password', 'key', 'secret']):
+                config[config_key] = 'REMOVED'
+        self.output = {
+            'success': False,
+            'input': job_input,
+            'errorMessage': message,
+        }
+
+#endregion
+
+
+class Job:
+
+    index: int
+    responder: Responder
+    key: Hashable
+
+    def __init__(self, index: int, input: Any) -> None:
+        self.index = index
+        self.responder = Responder(BatchWorker(input if isinstance(input, dict) else {}))
+        self.key = self._ordering_key()
+
+    def _ordering_key(self) -> Hashable:
+        """Jobs with the same key run in input order, everything else may overlap."""
+        try:
+            req = self.responder.request
+        except Exception:
+            return ("job", self.index)
+        if req.roomid is not None:
+            return ("room", str(req.roomid))
+        if req.case_id is not None:
+            return ("case", req.case_id)
+        return ("job", self.index)
+
+    @property
+    def output(self):
+        return self.responder.worker.output
+
+
+def read_jobs(stream: IO[str]) -> Iterator[Job]:
+    for index, line in enumerate(stream):
+        line = line.strip()
+        if len(line) == 0:
+            continue
+        try:
+            job_input = json.loads(line)
+        except ValueError as e:
+            job = Job(index, {})
+            job.responder.worker.error(f"Invalid job input: {e}")
+        else:
+            job = Job(index, job_input)
+        yield job
+
+
+def run_batch(
+    jobs: Iterable[Job],
+    out: IO[str],
+    handler_factory: Callable[[Config], Handler],
+    concurrency: int = 8,
+    ensure_ascii: bool = False,
+):
+    """Run jobs concurrently, keeping jobs on the same room in order, and write one output line per job in input order."""
+    from .main import run
+
+    jobs = list(jobs)
+    chains: Dict[Hashable, List[Job]] = {}
+    for job in jobs:
+        chains.setdefault(job.key, []).append(job)
+
+    def run_chain(chain: List[Job]):
+        for job in chain:
+            if job.output is None:
+                run(job.responder, handler_factory)
+            done[job.index].set_result(job.output)
+
+    done = {job.index: concurrent.futures.Future() for job in jobs}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for chain in chains.values():
+            pool.submit(run_chain, chain)
+        for job in jobs:
+            write_json(out, done[job.index].result(), ensure_ascii=ensure_ascii)
+            out.write("\n")
+            out.flush()
+
+
+def main(argv: Optional[List[str]] = None):
+    from .main import cached_handler
+
+    parser = argparse.ArgumentParser(prog="webexcortex batch")
+    parser.add_argument("-i", "--input", type=argparse.FileType("r"), default=sys.stdin, help="JSONL of Cortex job inputs")
+    parser.add_argument("-o", "--output", type=argparse.FileType("w"), default=sys.stdout, help="JSONL of job outputs")
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    from .client import DEFAULT_MAX_WORKERS
+    from .transport import set_pool_size
+    set_pool_size(args.concurrency * DEFAULT_MAX_WORKERS)
+
+    run_batch(read_jobs(args.input), args.output, cached_handler, concurrency=args.concurrency)
+    metrics.flush()
+
+
+__all__ = [cls.__name__ for cls in [
+    DictParams,
+    BatchWorker,
+    Job,
+    read_jobs,
+    run_batch,
+]]
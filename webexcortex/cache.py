@@ -0,0 +1,186 @@
+import collections
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+from .client import MembershipError
+from .datatypes import RoomID, Room, Member, MemberID, Message
+from .handler import IClient
+from .membership import MembershipIndex
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire `ttl` seconds after they were stored."""
+
+    def __init__(self, maxsize: int = 256, ttl: float = 30.0, clock: Callable[[], float] = time.monotonic) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "collections.OrderedDict[Hashable, Tuple[float, Any]]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires <= self._clock():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def update(self, key: Hashable, fn: Callable[[Any], Any]):
+        """Replace a live entry with fn(value), keeping its expiry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self._clock():
+                return
+            self._entries[key] = (entry[0], fn(entry[1]))
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+def _rooms_key():
+    return ("rooms",)
+
+def _room_key(roomid: RoomID):
+    return ("room", str(roomid))
+
+def _members_key(roomID: RoomID):
+    return ("members", str(roomID))
+
+
+class CachingClient:
+    """IClient decorator caching room and membership reads.
+
+    Writes made through this client are applied to the cached entries, so a
+    handler reading a room it just changed does not go back to Webex.
+    """
+
+    client: IClient
+    cache: TTLCache
+    hits: int
+    misses: int
+
+    def __init__(self, client: IClient, maxsize: int = 256, ttl: float = 30.0, clock: Callable[[], float] = time.monotonic) -> None:
+        self.client = client
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl, clock=clock)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def uncached(self) -> IClient:
+        """The wrapped client, for reads that must see what Webex has now."""
+        return self.client
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self.cache),
+        }
+
+    def _cached(self, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        value = self.cache.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = fetch()
+        self.cache.put(key, value)
+        return value
+
+    def create_room(self, title: str) -> Room:
+        room = self.client.create_room(title)
+        self.cache.put(_room_key(room.ID), room)
+        self.cache.update(_rooms_key(), lambda rooms: rooms + [room])
+        return room
+
+    def delete_room(self, roomid: RoomID):
+        self.client.delete_room(roomid)
+        self.cache.pop(_room_key(roomid))
+        self.cache.pop(_members_key(roomid))
+        self.cache.update(_rooms_key(), lambda rooms: [r for r in rooms if r.ID != roomid])
+
+    def get_room(self, roomid: RoomID) -> Room:
+        return self._cached(_room_key(roomid), lambda: self.client.get_room(roomid))
+
+    def get_rooms(self) -> List[Room]:
+        return list(self._cached(_rooms_key(), lambda: list(self.client.get_rooms())))
+
+    def iter_rooms(self) -> Iterator[Room]:
+        return self.client.iter_rooms()
+
+    def iter_messages(self, roomID: RoomID) -> Iterator[Message]:
+        return self.client.iter_messages(roomID)
+
+    def get_members(self, roomID: RoomID) -> List[Member]:
+        return list(self._cached(_members_key(roomID), lambda: list(self.client.get_members(roomID))))
+
+    def iter_members(self, roomID: RoomID) -> Iterator[Member]:
+        # A partly read listing cannot fill the cache, so only a cached room is served from it
+        members = self.cache.get(_members_key(roomID), _MISSING)
+        if members is not _MISSING:
+            self.hits += 1
+            return iter(list(members))
+        self.misses += 1
+        return self.client.iter_members(roomID)
+
+    def find_members(self, roomID: RoomID, memberMails: Iterable[str]) -> List[Member]:
+        members = self.cache.get(_members_key(roomID), _MISSING)
+        if members is not _MISSING:
+            self.hits += 1
+            return MembershipIndex(members).present(memberMails)
+        self.misses += 1
+        return list(self.client.find_members(roomID, memberMails))
+
+    def _members_added(self, roomID: RoomID, added: Iterable[Member]):
+        added = list(added)
+        ids = {m.ID for m in added}
+        self.cache.update(_members_key(roomID), lambda members: [m for m in members if m.ID not in ids] + added)
+
+    def _members_removed(self, roomID: RoomID, removed: Iterable[MemberID]):
+        ids = set(removed)
+        self.cache.update(_members_key(roomID), lambda members: [m for m in members if m.ID not in ids])
+
+    def add_members(self, roomID: RoomID, memberMails: Iterable[str], isModerator: bool = False, on_added: Optional[Callable[[str, Member], None]] = None) -> List[Member]:
+        try:
+            added = list(self.client.add_members(roomID, memberMails, isModerator=isModerator, on_added=on_added))
+        except MembershipError as e:
+            self._members_added(roomID, e.succeeded)
+            raise
+        self._members_added(roomID, added)
+        return added
+
+    def remove_members(self, roomID: RoomID, memberIDs: Iterable[MemberID]) -> List[MemberID]:
+        memberIDs = list(memberIDs)
+        try:
+            removed = self.client.remove_members(roomID, memberIDs)
+        except MembershipError as e:
+            self._members_removed(roomID, e.succeeded)
+            raise
+        self._members_removed(roomID, memberIDs)
+        return list(removed) if removed is not None else memberIDs
+
+
+__all__ = [cls.__name__ for cls in [
+    TTLCache,
+    CachingClient,
+]]
@@ -1,6 +1,11 @@
-from typing import Iterable, Protocol, Optional, List
+import concurrent.futures
+import contextvars
+import sys
+from typing import Any, Callable, Dict, Iterable, Iterator, Protocol, Optional, List, Tuple, TypeVar, Union
 
-from .datatypes import MemberID, RoomID, Room, Member
+from .datatypes import MemberID, MessageID, RoomID, Room, Member, Message
+from .membership import unique_mails
+from .tracing import traced
 
 
 #region Protocols for typing check
@@ -17,12 +22,21 @@ class WTMembership(Protocol):
     isModerator: bool
 
 
+class WTMessage(Protocol):
+    id: str
+    created: Any
+    personEmail: Optional[str]
+    text: Optional[str]
+    files: Optional[List[str]]
+    parentId: Optional[str]
+
+
 class RoomsAPI(Protocol):
     def create(self, title: str, teamId: Optional[str] = None) -> WTRoom: ...
     
     def delete(self, roomId: str) -> None: ...
 
-    def list(self, type: str = None) -> Iterable[WTRoom]: ...
+    def list(self, type: str = None, sortBy: Optional[str] = None) -> Iterable[WTRoom]: ...
 
     def get(self, roomId: str) -> WTRoom: ...
 
@@ -32,25 +46,108 @@ class MembershipsAPI(Protocol):
 
     def delete(self, membershipId: str) -> None: ...
 
-    def list(self, roomId: str) -> Iterable[WTMembership]: ...
+    def list(self, roomId: str, personEmail: Optional[str] = None) -> Iterable[WTMembership]: ...
+
+
+class MessagesAPI(Protocol):
+    def list(self, roomId: str, max: Optional[int] = None) -> Iterable[WTMessage]: ...
 
 
 class TeamsAPI(Protocol):
     rooms: RoomsAPI
     memberships: MembershipsAPI
+    messages: MessagesAPI
 
 #endregion
 
 
+T = TypeVar('T')
+R = TypeVar('R')
+
+DEFAULT_MAX_WORKERS = 8
+
+# Messages per page of a transcript listing, the most Webex returns at once
+MESSAGE_PAGE_SIZE = 1000
+
+
+class MembershipError(RuntimeError):
+    """Raised when some members of a batch failed, after the whole batch has been tried."""
+
+    succeeded: List[Any]
+    failures: Dict[str, str]
+
+    def __init__(self, succeeded: List[Any], failures: Dict[str, str]) -> None:
+        super().__init__(f"Membership changes failed for [{', '.join(failures)}]")
+        self.succeeded = succeeded
+        self.failures = failures
+
+
+def _fan_out(fn: Callable[[T], R], items: Iterable[T], max_workers: int) -> List[Tuple[T, Union[R, Exception]]]:
+    """Call fn for every item with at most max_workers calls in flight, keeping the input order."""
+    items = list(items)
+
+    def attempt(item: T) -> Union[R, Exception]:
+        try:
+            return fn(item)
+        except Exception as e:
+            return e
+
+    if max_workers <= 1 or len(items) <= 1:
+        return [(item, attempt(item)) for item in items]
+
+    # Each call runs in a copy of the caller's context so tracing spans nest under it
+    contexts = [contextvars.copy_context() for _ in items]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(zip(items, pool.map(lambda ctx, item: ctx.run(attempt, item), contexts, items)))
+
+
+def _collect(results: List[Tuple[T, Union[R, Exception]]]) -> List[R]:
+    succeeded = [result for _, result in results if not isinstance(result, Exception)]
+    failures = {str(item): str(result) for item, result in results if isinstance(result, Exception)}
+    if len(failures) > 0:
+        raise MembershipError(succeeded, failures)
+    return succeeded
+
+
+def _intern(value: Any) -> Any:
+    # The same people are listed in room after room, keep one copy of their strings
+    return sys.intern(value) if type(value) is str else value
+
+
+def _member(member: WTMembership) -> Member:
+    return Member(
+        ID=MemberID(member.id),
+        Mail=_intern(member.personEmail),
+        IsModerator=member.isModerator,
+        Name=_intern(member.personDisplayName),
+    )
+
+
+def _message(message: WTMessage) -> Message:
+    return Message(
+        ID=MessageID(message.id),
+        Created=str(message.created),
+        PersonEmail=_intern(message.personEmail),
+        Text=message.text,
+        Files=tuple(message.files or ()),
+        ParentID=MessageID(message.parentId) if message.parentId else None,
+    )
+
+
 class Client:
 
     room_api: RoomsAPI
     membership_api: MembershipsAPI
+    messages_api: Optional[MessagesAPI]
+    max_workers: int
 
-    def __init__(self, room_api: RoomsAPI, memberships_api: MembershipsAPI) -> None:
+    def __init__(self, room_api: RoomsAPI, memberships_api: MembershipsAPI, max_workers: int = DEFAULT_MAX_WORKERS, messages_api: Optional[MessagesAPI] = None) -> None:
         self.room_api = room_api
         self.membership_api = memberships_api
+        self.messages_api = messages_api
+        self.max_workers = max_workers
     
+    @traced("client.create_room")
     def create_room(self, title: str):
         room = self.room_api.create(title=title)
         return Room(
@@ -58,11 +155,13 @@ class Client:
             Title=room.title,
         )
 
+    @traced("client.delete_room")
     def delete_room(self, roomid: RoomID):
         if roomid is None or len(roomid) == 0:
             raise Exception(f"Invalid roomid [{roomid}]")
         self.room_api.delete(roomid)
 
+    @traced("client.get_room")
     def get_room(self, roomid: RoomID):
         if roomid is None or len(roomid) == 0:
             raise Exception(f"Invalid roomid [{roomid}]")
@@ -72,6 +171,7 @@ class Client:
             Title=room.title
         )
 
+    @traced("client.get_rooms")
     def get_rooms(self) -> List[Room]:
         return [
             Room(
@@ -80,33 +180,74 @@ class Client:
             ) for r in self.room_api.list(type="group")
         ]
 
-    def add_members(self, roomID: RoomID, memberMails: Iterable[str], isModerator: bool = False):
-        return [
-            Member(
-                ID=MemberID(member.id),
-                Mail=member.personEmail,
-                IsModerator=member.isModerator,
-                Name=member.personDisplayName,
-            ) for member in [
-                self.membership_api.create(roomId=roomID, personEmail=memberMail, isModerator=isModerator) for memberMail in memberMails
-            ]
-        ]
+    def iter_rooms(self) -> Iterator[Room]:
+        """Group rooms, newest first, as the pages of the listing arrive."""
+        for r in self.room_api.list(type="group", sortBy="created"):
+            yield Room(
+                ID=RoomID(r.id),
+                Title=r.title,
+            )
+
+    def _add_member(self, roomID: RoomID, memberMail: str, isModerator: bool):
+        member = self.membership_api.create(roomId=roomID, personEmail=memberMail, isModerator=isModerator)
+        return _member(member)
+
+    def _remove_member(self, memberID: MemberID):
+        self.membership_api.delete(membershipId=memberID)
+        return memberID
+
+    @traced("client.add_members")
+    def add_members(self, roomID: RoomID, memberMails: Iterable[str], isModerator: bool = False, on_added: Optional[Callable[[str, Member], None]] = None):
+        """Add every mail, calling on_added as soon as one of them is in the room."""
+        def add(memberMail: str):
+            member = self._add_member(roomID, memberMail, isModerator)
+            if on_added is not None:
+                on_added(memberMail, member)
+            return member
+
+        return _collect(_fan_out(add, memberMails, self.max_workers))
         
+    @traced("client.remove_members")
     def remove_members(self, roomID: RoomID, memberIDs : Iterable[MemberID]):
-        for memberID in memberIDs:
-            self.membership_api.delete(membershipId=memberID)
-
+        return _collect(_fan_out(
+            self._remove_member,
+            memberIDs,
+            self.max_workers,
+        ))
+
+    def iter_members(self, roomID: RoomID) -> Iterator[Member]:
+        """Members of the room as the pages of the listing arrive."""
+        for member in self.membership_api.list(roomId=str(roomID)):
+            yield _member(member)
+
+    @traced("client.get_members")
     def get_members(self, roomID: RoomID):
-        return [
-            Member(
-                ID=MemberID(member.id),
-                Mail=member.personEmail,
-                Name=member.personDisplayName,
-                IsModerator=member.isModerator
-            ) for member in self.membership_api.list(roomId=str(roomID))
-        ]
-        
+        return list(self.iter_members(roomID))
+
+    @traced("client.find_members")
+    def find_members(self, roomID: RoomID, memberMails: Iterable[str]) -> List[Member]:
+        """The members among memberMails, from one filtered listing per mail run concurrently."""
+        results = _fan_out(
+            lambda mail: list(self.membership_api.list(roomId=str(roomID), personEmail=mail)),
+            unique_mails(memberMails),
+            self.max_workers,
+        )
+        members = []
+        for _, result in results:
+            if isinstance(result, Exception):
+                raise result
+            members.extend(_member(member) for member in result)
+        return members
+
+    def iter_messages(self, roomID: RoomID) -> Iterator[Message]:
+        """Messages of the room, newest first, as the pages of the listing arrive."""
+        if self.messages_api is None:
+            raise Exception("Client has no messages API; a transcript needs the token of a member or a compliance officer")
+        for message in self.messages_api.list(roomId=str(roomID), max=MESSAGE_PAGE_SIZE):
+            yield _message(message)
+
 
 __all__ = [cls.__name__ for cls in [
-    Client
+    Client,
+    MembershipError,
 ]]
\ No newline at end of file
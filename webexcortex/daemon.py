@@ -0,0 +1,195 @@
+import argparse
+import dataclasses
+import logging
+import multiprocessing
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from . import metrics
+
+
+log = logging.getLogger(__name__)
+
+INPUT_FILE = os.path.join("input", "input.json")
+OUTPUT_FILE = os.path.join("output", "output.json")
+CLAIM_FILE = ".webexcortex.claim"
+
+
+@dataclasses.dataclass
+class JobResult:
+    job_directory: str
+    success: bool
+    seconds: float
+    # What the job added to the metrics of the pool process that ran it
+    metrics: Dict[str, Any] = dataclasses.field(default_factory=dict)
+
+    def to_dict(self):
+        return self.__dict__
+
+
+#region Job discovery
+
+def find_jobs(root: str) -> Iterator[str]:
+    with os.scandir(root) as entries:
+        for entry in sorted(entries, key=lambda e: e.name):
+            if not entry.is_dir():
+                continue
+            if not os.path.isfile(os.path.join(entry.path, INPUT_FILE)):
+                continue
+            if os.path.exists(os.path.join(entry.path, OUTPUT_FILE)):
+                continue
+            yield entry.path
+
+
+def claim_job(job_directory: str) -> bool:
+    try:
+        fd = os.open(os.path.join(job_directory, CLAIM_FILE), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w") as f:
+        f.write(str(os.getpid()))
+    return True
+
+
+def release_job(job_directory: str):
+    try:
+        os.remove(os.path.join(job_directory, CLAIM_FILE))
+    except FileNotFoundError:
+        pass
+
+#endregion
+
+
+#region Pool worker
+
+def _warm_up():
+    # Pay for the heavy imports once per pooled process instead of once per job
+    import webexteamssdk  # noqa: F401
+    import cortexutils.worker  # noqa: F401
+
+
+def run_job(job_directory: str) -> JobResult:
+    from .main import cached_handler, make_responder, run
+
+    start = time.perf_counter()
+    success = False
+    try:
+        success = run(make_responder(job_directory), cached_handler)
+    except SystemExit:
+        # Worker.error always exits, the output has already been written
+        pass
+    except Exception:
+        log.exception("job %s crashed", job_directory)
+    finally:
+        # A crashed job keeps its claim so it is not retried in a loop
+        if os.path.exists(os.path.join(job_directory, OUTPUT_FILE)):
+            release_job(job_directory)
+    return JobResult(
+        job_directory=job_directory,
+        success=success,
+        seconds=time.perf_counter() - start,
+        metrics=metrics.REGISTRY.snapshot(reset=True),
+    )
+
+#endregion
+
+
+class Daemon:
+
+    root: str
+    processes: int
+    poll_interval: float
+    results: List[JobResult]
+
+    def __init__(
+        self,
+        root: str,
+        processes: int = 4,
+        poll_interval: float = 0.2,
+        metrics_file: Optional[str] = None,
+    ) -> None:
+        self.root = root
+        self.processes = processes
+        self.poll_interval = poll_interval
+        self.metrics_file = metrics_file
+        self.results = []
+        self._pending: Set[str] = set()
+        self._pool = None
+        # Totals stay in metrics.REGISTRY for the endpoint, this only holds what is not in the file yet
+        self._unflushed = metrics.Registry()
+
+    def __enter__(self):
+        ctx = multiprocessing.get_context("fork")
+        self._pool = ctx.Pool(processes=self.processes, initializer=_warm_up)
+        return self
+
+    def __exit__(self, *exc):
+        self._pool.close()
+        self._pool.join()
+        self._pool = None
+
+    def _done(self, result: JobResult):
+        metrics.REGISTRY.merge(result.metrics)
+        self._unflushed.merge(result.metrics)
+        self._pending.discard(result.job_directory)
+        self.results.append(result)
+        log.info(
+            "job %s %s in %.3fs",
+            result.job_directory,
+            "succeeded" if result.success else "failed",
+            result.seconds,
+        )
+
+    def poll(self) -> int:
+        dispatched = 0
+        for job_directory in find_jobs(self.root):
+            if job_directory in self._pending or not claim_job(job_directory):
+                continue
+            self._pending.add(job_directory)
+            self._pool.apply_async(run_job, (job_directory,), callback=self._done)
+            dispatched += 1
+        return dispatched
+
+    def drain(self):
+        while len(self._pending) > 0:
+            time.sleep(self.poll_interval / 10)
+
+    def flush_metrics(self):
+        if self.metrics_file is not None and len(self._unflushed.counters) > 0:
+            metrics.write_textfile(self.metrics_file, self._unflushed)
+
+    def serve(self, once: bool = False):
+        while True:
+            self.poll()
+            if once:
+                self.drain()
+                self.flush_metrics()
+                return
+            self.flush_metrics()
+            time.sleep(self.poll_interval)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="webexcortex daemon")
+    parser.add_argument("root", help="directory where Cortex places job directories")
+    parser.add_argument("-p", "--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("-i", "--poll-interval", type=float, default=0.2)
+    parser.add_argument("--once", action="store_true", help="process the pending jobs and exit")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port")
+    parser.add_argument("--metrics-file", default=os.environ.get(metrics.METRICS_FILE_ENV), help="Prometheus textfile to update")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.metrics_port is not None:
+        metrics.serve(args.metrics_port)
+    with Daemon(args.root, processes=args.processes, poll_interval=args.poll_interval, metrics_file=args.metrics_file) as d:
+        d.serve(once=args.once)
+
+
+__all__ = [o.__name__ for o in [
+    JobResult,
+    Daemon,
+    find_jobs,
+    run_job,
+]]
@@ -1,23 +1,39 @@
 import enum
 import dataclasses
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
 
 
-class RoomID(str): pass
+# No __dict__ per ID, a room of 10k members holds 10k of them
+class RoomID(str):
+    __slots__ = ()
 
 
-class Token(str): pass
+class Token(str):
+    __slots__ = ()
 
 
-class MemberID(str): pass
+class MemberID(str):
+    __slots__ = ()
+
+
+class MessageID(str):
+    __slots__ = ()
 
 
 class RoomAction(enum.Enum):
     CREATE = "Open room"
     ADD_GUESTS = "Add guests"
     REMOVE_GUESTS = "Remove guests"
+    SYNC_GUESTS = "Sync guests"
     DELETE = "Delete room"
 
+
+class ReportVerbosity(enum.Enum):
+    # Every listing in the report, as it was read
+    FULL = "full"
+    # Counts and a digest instead of room listings; changed members are still listed
+    SUMMARY = "summary"
+
 @dataclasses.dataclass
 class Fields:
     roomid: Optional[str] = None
@@ -26,23 +42,62 @@ class Fields:
         return self.__dict__
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class Room:
+    __slots__ = ("ID", "Title")
+
     ID: RoomID
     Title: str
 
     def to_dict(self):
-        return self.__dict__
+        return {"ID": self.ID, "Title": self.Title}
 
-@dataclasses.dataclass
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Room":
+        return cls(ID=RoomID(d["ID"]), Title=d["Title"])
+
+
+@dataclasses.dataclass(frozen=True)
 class Member:
+    """One membership; the same record is shared by every event and cache that mentions it."""
+
+    __slots__ = ("ID", "Name", "Mail", "IsModerator")
+
     ID: MemberID
     Name: str
     Mail: str
     IsModerator: bool
 
     def to_dict(self):
-        return self.__dict__
+        return {"ID": self.ID, "Name": self.Name, "Mail": self.Mail, "IsModerator": self.IsModerator}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Member":
+        return cls(ID=MemberID(d["ID"]), Name=d["Name"], Mail=d["Mail"], IsModerator=d["IsModerator"])
+
+
+@dataclasses.dataclass(frozen=True)
+class Message:
+    """One message of a room transcript; Files are the content URLs Webex lists for it."""
+
+    __slots__ = ("ID", "Created", "PersonEmail", "Text", "Files", "ParentID")
+
+    ID: MessageID
+    Created: str
+    PersonEmail: Optional[str]
+    Text: Optional[str]
+    Files: Tuple[str, ...]
+    ParentID: Optional[MessageID]
+
+    def to_dict(self):
+        return {
+            "ID": self.ID,
+            "Created": self.Created,
+            "PersonEmail": self.PersonEmail,
+            "Text": self.Text,
+            "Files": list(self.Files),
+            "ParentID": self.ParentID,
+        }
 
 
 
@@ -50,8 +105,11 @@ __all__ = [cls.__name__ for cls in [
     RoomID,
     Token,
     MemberID,
+    MessageID,
     RoomAction,
+    ReportVerbosity,
     Fields,
     Room,
-    Member
+    Member,
+    Message,
 ]]
\ No newline at end of file
@@ -1,8 +1,15 @@
 import dataclasses
 import abc
-from typing import Any, List, Dict, Protocol, Iterable
+from typing import Any, Callable, List, Dict, Optional, Protocol, Iterable, Iterator, Sequence, Tuple
 
-from .datatypes import RoomAction, Fields, RoomID, Room, Member, MemberID
+from .client import MembershipError
+from .datatypes import RoomAction, Fields, RoomID, Room, Member, MemberID, Message
+from .journal import Journal, Journals
+from .membership import MembershipIndex, RoomSizes, membership_digest, normalize_mail, scan, sync_plan, unique_mails
+from .roomindex import RoomIndex, case_key, is_not_found, parse_title, uncached
+from .steps import Plan, StepGraph, run_plan
+from .tracing import traced
+from .transcript import Transcript, Transcripts
 
 
 class IRequest(Protocol):
@@ -16,6 +23,12 @@ class IRequest(Protocol):
     @abc.abstractproperty
     def title(self) -> str: ...
 
+    @abc.abstractproperty
+    def organization(self) -> str: ...
+
+    @abc.abstractproperty
+    def case_id(self) -> int: ...
+
     @abc.abstractproperty
     def guests(self) -> Iterable[str]: ...
 
@@ -33,12 +46,20 @@ class IClient(Protocol):
 
     def get_rooms(self) -> Iterable[Room]: ...
 
-    def add_members(self, roomID: RoomID, memberMails: Iterable[str], isModerator: bool = False) -> Iterable[Member]: ...
+    def iter_rooms(self) -> Iterator[Room]: ...
+
+    def add_members(self, roomID: RoomID, memberMails: Iterable[str], isModerator: bool = False, on_added: Optional[Callable[[str, Member], None]] = None) -> Iterable[Member]: ...
         
-    def remove_members(self, roomID: RoomID, memberIDs : Iterable[MemberID]): ...
+    def remove_members(self, roomID: RoomID, memberIDs : Iterable[MemberID]) -> Iterable[MemberID]: ...
 
     def get_members(self, roomID: RoomID) -> Iterable[Member]: ...
 
+    def iter_members(self, roomID: RoomID) -> Iterator[Member]: ...
+
+    def find_members(self, roomID: RoomID, memberMails: Iterable[str]) -> Iterable[Member]: ...
+
+    def iter_messages(self, roomID: RoomID) -> Iterator[Message]: ...
+
 
 @dataclasses.dataclass
 class FullReport:
@@ -47,7 +68,12 @@ class FullReport:
     tags: List[str] = dataclasses.field(default_factory=list)
     events: List[Dict[str, Any]] = dataclasses.field(default_factory=list)
 
-    def to_dict(self) -> Dict[str, Any]:
+    def summarized(self) -> "FullReport":
+        """The report with every room listing replaced by its count and digest; the changes stay listed."""
+        return dataclasses.replace(self, events=[_summarized(event) for event in self.events])
+
+    def to_records(self) -> Dict[str, Any]:
+        """to_dict without turning the records of the events into dicts, for a writer that encodes them itself."""
         return {
             'message': self.message,
             'fields': self.fields.to_dict(),
@@ -55,66 +81,233 @@ class FullReport:
             'events': self.events
         }
 
+    def to_dict(self) -> Dict[str, Any]:
+        # Events hold the records themselves; they become dicts only here, once
+        # per record however many events mention it
+        memo: Dict[int, Any] = {}
+        return {
+            'message': self.message,
+            'fields': self.fields.to_dict(),
+            'tags': self.tags,
+            'events': [_plain(event, memo) for event in self.events]
+        }
+
+
+# Events that list the members of a room as read, rather than the members a job changed
+_LISTINGS = ("members in room",)
+
+
+def _summarized(event: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        name: {"count": len(value), "digest": membership_digest(value)} if name in _LISTINGS else value
+        for name, value in event.items()
+    }
+
+
+def _plain(value: Any, memo: Dict[int, Any]) -> Any:
+    if isinstance(value, (Room, Member)):
+        plain = memo.get(id(value))
+        if plain is None:
+            plain = memo[id(value)] = value.to_dict()
+        return plain
+    if isinstance(value, dict):
+        return {key: _plain(item, memo) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item, memo) for item in value]
+    return value
+
 
 class RoomExistsError(RuntimeError):
     pass
 
 
+def _shared(members: Iterable[Member]) -> Sequence[Member]:
+    # The handler is done with its lists by then, no need for a copy per event
+    return members if isinstance(members, (list, tuple)) else tuple(members)
+
 def _room_found(room: Room):
-    return {"room found" : room.to_dict()}
+    return {"room found" : room}
 
 def _room_created(room: Room):
-    return {"room create" : room.to_dict()}
+    return {"room create" : room}
+
+def _room_resumed(room: Room):
+    return {"room resumed" : room}
+
+def _room_relinked(room: Room):
+    return {"room relinked" : room}
+
+def _transcript_exported(transcript: Transcript):
+    return {"transcript exported" : transcript.to_dict()}
 
 def _room_deleted(room: Room):
-    return {"room deleted" : room.to_dict()}
+    return {"room deleted" : room}
 
 def _owners_added(members: Iterable[Member]):
-    return { "owners added" : [member.to_dict() for member in members] }
+    return { "owners added" : _shared(members) }
 
 def _members_in_room(members: Iterable[Member]):
-    return { "members in room" : [member.to_dict() for member in members] }
+    return { "members in room" : _shared(members) }
+
+def _members_read(members: Iterable[Member], listed: bool):
+    # Guests looked up by mail are only the part of the room the job asked about
+    return _members_in_room(members) if listed else _guests_in_room(members)
+
+def _members_scanned(count: int):
+    return { "members scanned" : count }
 
 def _guests_in_room(members: Iterable[Member]):
-    return { "guests in room" : [member.to_dict() for member in members] }
+    return { "guests in room" : _shared(members) }
 
 def _guests_added(members: Iterable[Member]):
-    return { "guests added" : [member.to_dict() for member in members] }
+    return { "guests added" : _shared(members) }
 
 def _guests_removed(members: Iterable[Member]):
-    return { "guests removed" : [member.to_dict() for member in members] }
+    return { "guests removed" : _shared(members) }
 
 def _guests_not_in_room(guestmails: Iterable[str]):
     return { "guests not in room" : guestmails }
 
+def _guests_not_wanted(members: Iterable[Member]):
+    return { "guests not wanted" : _shared(members) }
+
+def _owners_failed(failures: Dict[str, str]):
+    return { "owners failed" : failures }
+
+def _guests_failed(failures: Dict[str, str]):
+    return { "guests failed" : failures }
+
+def _failed_by_mail(members: Iterable[Member], failures: Dict[str, str]) -> Dict[str, str]:
+    """Key the failures of a removal, which are by membership ID, by the mail of the member."""
+    mails = {m.ID: m.Mail for m in members}
+    return {mails.get(memberID, memberID): reason for memberID, reason in failures.items()}
+
+def _steps_run(graph: StepGraph):
+    return { "steps run" : [step.to_dict() for step in graph.started] }
+
+
+def _guests_missing(members: Iterable[Member], guestmails: Iterable[str]) -> List[str]:
+    return MembershipIndex(members).missing(guestmails)
+
+
+def _journaled(journal: Journal, step: str, mails: Iterable[str]) -> Tuple[List[Member], List[str]]:
+    """The members a journal says were added by an earlier run, and the mails still to add."""
+    done, pending = [], []
+    for mail in mails:
+        result = journal.result(step, normalize_mail(mail))
+        if result is None:
+            pending.append(mail)
+        else:
+            done.append(Member.from_dict(result))
+    return done, pending
+
+
+def _partial(fn: Callable[..., Any], *args, **kwargs) -> Tuple[Any, Dict[str, str]]:
+    """Run a membership batch, returning what succeeded and a message per failed member.
+
+    A batch where every member failed, e.g. for a bad token or a 403, fails the job.
+    """
+    try:
+        return fn(*args, **kwargs), {}
+    except MembershipError as e:
+        if len(e.succeeded) == 0:
+            raise
+        return e.succeeded, e.failures
+
+
+def _people_events(results: Dict[str, Any], actions: List[Dict[str, Any]]):
+    owners_added, owners_failed = results["add owners"]
+    actions.append(_owners_added(owners_added))
+    if len(owners_failed) > 0:
+        actions.append(_owners_failed(owners_failed))
+    guests_added, guests_failed = results["add guests"]
+    actions.append(_guests_added(guests_added))
+    if len(guests_failed) > 0:
+        actions.append(_guests_failed(guests_failed))
+
 
 
 class Handler:
-    def __init__(self, client: IClient) -> None:
+    """Runs every action as a plan of step graphs.
+
+    The plan_* methods decide what to call and what to report; handle runs
+    them on threads, and webexcortex.aio runs the same plans on an event loop.
+    """
+
+    def __init__(
+        self,
+        client: IClient,
+        room_sizes: Optional[RoomSizes] = None,
+        rooms: Optional[RoomIndex] = None,
+        journals: Optional[Journals] = None,
+        transcripts: Optional[Transcripts] = None,
+    ) -> None:
         self.client = client
+        self.room_sizes = room_sizes if room_sizes is not None else RoomSizes()
+        self.rooms = rooms
+        self.journals = journals
+        self.transcripts = transcripts
 
-    def create_room(self, req: IRequest):
-        actions = []
-
+    def _no_room(self, roomid: RoomID):
         # Testing that either we don't have a roomid, or if the provided roomid doesn't exists
         try:
-            room = self.client.get_room(req.roomid)
+            room = self.client.get_room(roomid)
         except Exception:
-            pass
-        else:
-            raise Exception(f"Room already exists with title [{room.Title}]")
-            
-        # Create room
-        room = self.client.create_room(req.title)
-        actions.append(_room_created(room))
+            return
+        raise Exception(f"Room already exists with title [{room.Title}]")
+
+    def _resume_room(self, journal: Journal, created: Dict[str, Any]) -> Optional[Room]:
+        """The room an earlier run of the job created, None once it was deleted since."""
+        try:
+            return uncached(self.client).get_room(Room.from_dict(created).ID)
+        except Exception as e:
+            if not is_not_found(e):
+                raise
+        # The earlier run is moot, this one starts over
+        journal.complete()
+        return None
+
+    def _case_room(self, key: str) -> Optional[Room]:
+        # A retried job, or one whose room id was lost, gets the room of its case back
+        if self.rooms is None:
+            return None
+        return self.rooms.find(key, self.client)
+
+    def plan_create_room(self, req: IRequest) -> "Plan[FullReport]":
+        actions = []
 
-        # Add owners
-        owners_added = self.client.add_members(room.ID, req.owners, isModerator=True)
-        actions.append(_owners_added(owners_added))
+        key = case_key(req.organization, req.case_id)
+        journal = self.journals.open(key) if self.journals is not None else None
 
-        # Add guests
-        guests_added = self.client.add_members(room.ID, req.guests, isModerator=False)
-        actions.append(_guests_added(guests_added))
+        # A rerun of a job that died halfway carries on where it stopped
+        created = journal.result("room") if journal is not None else None
+
+        lookup = StepGraph()
+        lookup.add("no room", lambda: self._no_room(req.roomid))
+        if created is not None:
+            lookup.add("resumed room", lambda _: self._resume_room(journal, created), after=("no room",))
+            lookup.add("case room", lambda resumed: self._case_room(key) if resumed is None else None, after=("resumed room",))
+        else:
+            lookup.add("case room", lambda _: self._case_room(key), after=("no room",))
+        found = yield lookup
+        resumed: Optional[Room] = found.get("resumed room")
+        room = found.get("case room")
+        if room is not None:
+            return (yield from self._plan_relink_room(req, room))
+
+        # Owners and guests only depend on the room
+        graph = StepGraph()
+        graph.add("room", lambda: self._open_room(req, key, journal, resumed))
+        graph.add("add owners", lambda room: self._add_members(room, req.owners, True, journal), after=("room",))
+        graph.add("add guests", lambda room: self._add_members(room, req.guests, False, journal), after=("room",))
+        results = yield graph
+        if journal is not None:
+            journal.complete()
+
+        room = results["room"]
+        actions.append(_room_resumed(room) if resumed is not None else _room_created(room))
+        _people_events(results, actions)
+        actions.append(_steps_run(graph))
 
         # Return report
         return FullReport(
@@ -125,14 +318,83 @@ class Handler:
             events=actions
         )
 
-    def delete_room(self, req: IRequest):
+    def _open_room(self, req: IRequest, key: str, journal: Optional[Journal], resumed: Optional[Room]) -> Room:
+        if resumed is not None:
+            return resumed
+
+        room = self.client.create_room(req.title)
+        if journal is not None:
+            journal.record("room", result=room.to_dict())
+        if self.rooms is not None:
+            self.rooms.put(key, room.ID)
+        return room
+
+    def _plan_relink_room(self, req: IRequest, room: Room) -> "Plan[FullReport]":
+        actions = [_room_relinked(room)]
+
+        # Whoever the earlier attempt did not get to yet
+        graph = StepGraph()
+        graph.add("members", lambda: list(self.client.get_members(room.ID)))
+        graph.add("add owners", lambda members: self._add_members(room, _guests_missing(members, req.owners), True, None), after=("members",))
+        graph.add("add guests", lambda members: self._add_members(room, _guests_missing(members, req.guests), False, None), after=("members",))
+        results = yield graph
+
+        _people_events(results, actions)
+        actions.append(_steps_run(graph))
+
+        return FullReport(
+            message=f"Room relinked {room.Title}",
+            fields=Fields(
+                roomid=room.ID
+            ),
+            events=actions
+        )
+
+    def _add_members(self, room: Room, mails: Iterable[str], isModerator: bool, journal: Optional[Journal]):
+        if journal is None:
+            return _partial(self.client.add_members, room.ID, mails, isModerator=isModerator)
+
+        # Members are journaled one by one, so a rerun only adds the ones left
+        step = "owner" if isModerator else "guest"
+        done, pending = _journaled(journal, step, mails)
+        try:
+            added, failed = _partial(
+                self.client.add_members, room.ID, pending, isModerator=isModerator,
+                on_added=lambda mail, member: journal.record(step, normalize_mail(mail), member.to_dict()),
+            )
+        except MembershipError as e:
+            # Members added by the earlier run count as the part that succeeded
+            if len(done) == 0:
+                raise
+            added, failed = [], e.failures
+        return done + list(added), failed
+
+    def plan_delete_room(self, req: IRequest) -> "Plan[FullReport]":
         actions = []
 
-        room = self.client.get_room(req.roomid)
-        actions.append(_room_found(room))
+        graph = StepGraph()
+        graph.add("room", lambda: self.client.get_room(req.roomid))
+        before_delete: Tuple[str, ...] = ("room",)
+        # The conversation is kept for the case record; a failed export keeps the room
+        if self.transcripts is not None:
+            graph.add("transcript", lambda room: self.transcripts.export(room, self.client.iter_messages(room.ID)), after=("room",))
+            before_delete = ("room", "transcript")
+        graph.add("delete room", lambda room, *_: self.client.delete_room(room.ID), after=before_delete)
+        results = yield graph
+
+        room = results["room"]
+        if self.rooms is not None:
+            self.rooms.discard(room.ID)
+        # A later Open room for the case must not resume the deleted room
+        key = parse_title(room.Title)
+        if self.journals is not None and key is not None:
+            self.journals.open(key).complete()
 
-        self.client.delete_room(room.ID)
+        actions.append(_room_found(room))
+        if "transcript" in results:
+            actions.append(_transcript_exported(results["transcript"]))
         actions.append(_room_deleted(room))
+        actions.append(_steps_run(graph))
 
         return FullReport(
             message=f"Room deleted {req.roomid}",
@@ -142,22 +404,36 @@ class Handler:
             events=actions
         )
 
-    def add_guests(self, req: IRequest):
+    def _room_members(self, roomid: RoomID, guests: Iterable[str]) -> Tuple[List[Member], bool]:
+        """The members to plan against, and whether they are the whole room rather than the guests found."""
+        # Look the guests up one by one when that takes fewer calls than listing the room
+        if self.room_sizes.prefer_lookup(roomid, len(unique_mails(guests))):
+            return list(self.client.find_members(roomid, guests)), False
+        members = list(self.client.get_members(roomid))
+        self.room_sizes.put(roomid, len(members))
+        return members, True
+
+    def plan_add_guests(self, req: IRequest) -> "Plan[FullReport]":
         
         actions = []
 
-        room = self.client.get_room(req.roomid)
-        actions.append(_room_found(room))
-
-        members = self.client.get_members(room.ID)
-        actions.append(_members_in_room(members))
+        # The room is read while its members are listed
+        graph = StepGraph()
+        graph.add("room", lambda: self.client.get_room(req.roomid))
+        graph.add("members", lambda: self._room_members(req.roomid, req.guests))
+        graph.add("plan", lambda members: _guests_missing(members[0], req.guests), after=("members",))
+        graph.add("add guests", lambda room, guestmails: _partial(self.client.add_members, room.ID, guestmails, isModerator=False), after=("room", "plan"))
+        results = yield graph
 
-        membermails = [m.Mail for m in members]
-        guestmails = [guestmail for guestmail in req.guests if guestmail not in membermails]
-        actions.append(_guests_not_in_room(guestmails))
-        
-        guests_added = self.client.add_members(room.ID, guestmails, isModerator=False)
+        room = results["room"]
+        actions.append(_room_found(room))
+        actions.append(_members_read(*results["members"]))
+        actions.append(_guests_not_in_room(results["plan"]))
+        guests_added, guests_failed = results["add guests"]
         actions.append(_guests_added(guests_added))
+        if len(guests_failed) > 0:
+            actions.append(_guests_failed(guests_failed))
+        actions.append(_steps_run(graph))
 
         # Return report
         return FullReport(
@@ -165,21 +441,36 @@ class Handler:
             events=actions
         )
 
-    def remove_guests(self, req: IRequest):
+    def _find_guests(self, roomid: RoomID, wanted: List[str]) -> Tuple[List[Member], int]:
+        if self.room_sizes.prefer_lookup(roomid, len(wanted)):
+            guests = list(self.client.find_members(roomid, wanted))
+            return guests, len(guests)
+        # Only read as much of the room as it takes to find every guest
+        guests, scanned = scan(self.client.iter_members(roomid), wanted)
+        if len(guests) < len(wanted):
+            self.room_sizes.put(roomid, scanned)
+        return guests, scanned
+
+    def plan_remove_guests(self, req: IRequest) -> "Plan[FullReport]":
         actions = []
 
-        room = self.client.get_room(req.roomid)
-        actions.append(_room_found(room))
+        wanted = unique_mails(req.guests)
+        graph = StepGraph()
+        graph.add("room", lambda: self.client.get_room(req.roomid))
+        graph.add("members", lambda: self._find_guests(req.roomid, wanted))
+        graph.add("remove guests", lambda room, found: _partial(self.client.remove_members, room.ID, [g.ID for g in found[0]]), after=("room", "members"))
+        results = yield graph
 
-       
-        members = self.client.get_members(room.ID)
-        actions.append(_members_in_room(members))
-
-        guests = [member for member in members if member.Mail in req.guests]
+        room = results["room"]
+        guests, scanned = results["members"]
+        _, guests_failed = results["remove guests"]
+        actions.append(_room_found(room))
+        actions.append(_members_scanned(scanned))
         actions.append(_guests_in_room(guests))
-
-        self.client.remove_members(room.ID, [g.ID for g in guests])
-        actions.append(_guests_removed(guests))
+        actions.append(_guests_removed([g for g in guests if g.ID not in guests_failed]))
+        if len(guests_failed) > 0:
+            actions.append(_guests_failed(_failed_by_mail(guests, guests_failed)))
+        actions.append(_steps_run(graph))
 
         # Return report
         return FullReport(
@@ -187,6 +478,73 @@ class Handler:
             events=actions
         )
 
+    def plan_sync_guests(self, req: IRequest) -> "Plan[FullReport]":
+        actions = []
+
+        # A single read of the room decides both the adds and the removes
+        graph = StepGraph()
+        graph.add("room", lambda: self.client.get_room(req.roomid))
+        graph.add("members", lambda: list(self.client.get_members(req.roomid)))
+        graph.add("plan", lambda members: sync_plan(members, req.guests, req.owners), after=("members",))
+        graph.add("add guests", lambda room, plan: _partial(self.client.add_members, room.ID, plan[0], isModerator=False), after=("room", "plan"))
+        graph.add("remove guests", lambda room, plan: _partial(self.client.remove_members, room.ID, [m.ID for m in plan[1]]), after=("room", "plan"))
+        results = yield graph
+
+        room = results["room"]
+        members = results["members"]
+        guestmails, leaving = results["plan"]
+        (guests_added, added_failed), (_, removed_failed) = results["add guests"], results["remove guests"]
+        self.room_sizes.put(room.ID, len(members))
+        actions.append(_room_found(room))
+        actions.append(_members_scanned(len(members)))
+        actions.append(_guests_not_in_room(guestmails))
+        actions.append(_guests_not_wanted(leaving))
+        actions.append(_guests_added(guests_added))
+        actions.append(_guests_removed([m for m in leaving if m.ID not in removed_failed]))
+        guests_failed = {**added_failed, **_failed_by_mail(leaving, removed_failed)}
+        if len(guests_failed) > 0:
+            actions.append(_guests_failed(guests_failed))
+        actions.append(_steps_run(graph))
+
+        return FullReport(
+            message=f"Guests synced in {room.Title}",
+            events=actions
+        )
+
+    @traced("handler.create_room")
+    def create_room(self, req: IRequest) -> FullReport:
+        return run_plan(self.plan_create_room(req))
+
+    @traced("handler.delete_room")
+    def delete_room(self, req: IRequest) -> FullReport:
+        return run_plan(self.plan_delete_room(req))
+
+    @traced("handler.add_guests")
+    def add_guests(self, req: IRequest) -> FullReport:
+        return run_plan(self.plan_add_guests(req))
+
+    @traced("handler.remove_guests")
+    def remove_guests(self, req: IRequest) -> FullReport:
+        return run_plan(self.plan_remove_guests(req))
+
+    @traced("handler.sync_guests")
+    def sync_guests(self, req: IRequest) -> FullReport:
+        return run_plan(self.plan_sync_guests(req))
+
+    def plan(self, req: IRequest) -> "Plan[FullReport]":
+        action = req.action
+        if action == RoomAction.CREATE:
+            return self.plan_create_room(req)
+        if action == RoomAction.DELETE:
+            return self.plan_delete_room(req)
+        if action == RoomAction.ADD_GUESTS:
+            return self.plan_add_guests(req)
+        if action == RoomAction.REMOVE_GUESTS:
+            return self.plan_remove_guests(req)
+        if action == RoomAction.SYNC_GUESTS:
+            return self.plan_sync_guests(req)
+        raise Exception(f"Invalid action {action}")
+
     def handle(self, req: IRequest):
         action = req.action
         if action == RoomAction.CREATE:
@@ -197,6 +555,8 @@ class Handler:
             return self.add_guests(req)
         if action == RoomAction.REMOVE_GUESTS:
             return self.remove_guests(req)
+        if action == RoomAction.SYNC_GUESTS:
+            return self.sync_guests(req)
         raise Exception(f"Invalid action {action}")
 
 
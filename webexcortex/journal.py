@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+
+def journal_file(directory: str, token: str, key: str) -> str:
+    """A journal per bot token and case."""
+    digest = hashlib.sha256(f"{token}\n{key}".encode()).hexdigest()[:16]
+    return os.path.join(directory, "journals", f"{digest}.jsonl")
+
+
+class Journal:
+    """Append-only log of the finished steps of one job and what the API returned for them.
+
+    Every step is a JSON line written as soon as its call succeeded, so a rerun
+    of a job that died halfway reads back what was already done and only makes
+    the calls that are left. A line cut short by the crash is ignored. Without
+    a path nothing is kept.
+    """
+
+    path: Optional[str]
+    _steps: Dict[Tuple[str, str], Any]
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+        self._steps = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self):
+        return len(self._steps)
+
+    def _load(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path) as f:
+                lines = f.readlines()
+        except OSError:
+            return
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            self._steps[(entry["step"], entry["key"])] = entry["result"]
+
+    def result(self, step: str, key: str = "") -> Optional[Any]:
+        """What the step returned when it finished, None if it did not."""
+        with self._lock:
+            return self._steps.get((step, key))
+
+    def record(self, step: str, key: str = "", result: Any = True):
+        line = json.dumps({"step": step, "key": key, "result": result}) + "\n"
+        with self._lock:
+            self._steps[(step, key)] = result
+            if self.path is None:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                # One write per line in append mode, so lines of concurrent steps never interleave
+                fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+                try:
+                    os.write(fd, line.encode())
+                finally:
+                    os.close(fd)
+            except OSError:
+                # Without the journal a rerun falls back to the case room index
+                pass
+
+    def complete(self):
+        """The job is done, a later run of it starts over."""
+        with self._lock:
+            self._steps = {}
+            if self.path is None:
+                return
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+class Journals:
+    """Opens the journal of a case for one bot; without a directory journals are kept in memory only."""
+
+    directory: Optional[str]
+    token: str
+
+    def __init__(self, directory: Optional[str], token: str) -> None:
+        self.directory = directory
+        self.token = token
+
+    def open(self, key: str) -> Journal:
+        if self.directory is None:
+            return Journal()
+        return Journal(journal_file(self.directory, self.token, key))
+
+
+__all__ = [o.__name__ for o in [
+    Journal,
+    Journals,
+    journal_file,
+]]
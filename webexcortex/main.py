@@ -1,32 +1,174 @@
-import webexteamssdk
-import cortexutils.worker
-from .client import Client
+import dataclasses
+import sys
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from .datatypes import ReportVerbosity
 from .responder import Responder, Config
-from .handler import Handler
+from . import metrics, tracing
+
+if TYPE_CHECKING:
+    from .handler import Handler, IClient
+    from .pool import IHandler
+
+# The SDK and its requests stack cost more to import than most jobs spend on
+# Webex, so they are only imported once a job actually needs the API.
+
+
+def _messages_api(config: Config):
+    """The messages API of the transcript token, or None when there is none.
 
+    A bot only lists the messages of a group room that mention it, so its own
+    token would export part of the conversation as if it were all of it.
+    """
+    if config.webex_transcript_token is None:
+        return None
 
+    from .metrics import Metered
+    from .ratelimit import RateLimited, shared_limiter
+    from .tracing import Traced
+    from .transport import shared_api
 
-def make_handler(config: Config):
-    api = webexteamssdk.WebexTeamsAPI(access_token=config.webex_bot_token)
+    api = shared_api(config.webex_transcript_token, config.webex_base_url)
+    limiter = shared_limiter(config.webex_transcript_token)
+    return Traced(RateLimited(Metered(api.messages, "messages"), limiter), "messages")
+
+
+def make_bot_handler(config: Config, token: str) -> "Handler":
+    from .cache import CachingClient
+    from .client import Client
+    from .handler import Handler
+    from .journal import Journals
+    from .metrics import Metered
+    from .ratelimit import RateLimited, shared_limiter
+    from .roomindex import RoomIndex, default_state_directory, state_file
+    from .tracing import Traced
+    from .transcript import Transcripts
+    from .transport import enable_http2, shared_api
+
+    if config.webex_http2:
+        enable_http2()
+    api = shared_api(token, config.webex_base_url)
+    limiter = shared_limiter(token)
+    state_directory = config.state_directory or default_state_directory()
+    client: "IClient" = Client(
+        room_api=Traced(RateLimited(Metered(api.rooms, "rooms"), limiter), "rooms"),
+        memberships_api=Traced(RateLimited(Metered(api.memberships, "memberships"), limiter), "memberships"),
+        messages_api=_messages_api(config),
+    )
+    if config.cache_ttl > 0:
+        # Only this process sees its writes, so another one may act on a stale room
+        client = CachingClient(client=client, ttl=config.cache_ttl)
     return Handler(
-        client=Client(
-            room_api=api.rooms,
-            memberships_api=api.memberships,
-        )
+        client=client,
+        rooms=RoomIndex(state_file(state_directory, "rooms", token)),
+        journals=Journals(state_directory, token),
+        transcripts=Transcripts(config.transcript_directory) if config.transcript_directory else None,
     )
 
-def make_responder():
-    worker = cortexutils.worker.Worker(job_directory=None)
+
+def pooled_handler(config: Config, bot_handler_factory: Callable[[Config, str], "IHandler"]) -> "IHandler":
+    """The handler of the bot, or a BotPool spreading the jobs over the bots of webex_bot_tokens."""
+    if len(config.webex_bot_tokens) <= 1:
+        return bot_handler_factory(config, config.webex_bot_token)
+
+    from .pool import Affinity, BotPool
+    from .ratelimit import shared_limiter
+    from .roomindex import default_state_directory, state_file
+
+    state_directory = config.state_directory or default_state_directory()
+    return BotPool(
+        handlers={token: bot_handler_factory(config, token) for token in config.webex_bot_tokens},
+        budgets={token: shared_limiter(token) for token in config.webex_bot_tokens},
+        affinity=Affinity(state_file(state_directory, "affinity", "\n".join(config.webex_bot_tokens))),
+    )
+
+
+def make_handler(config: Config) -> "IHandler":
+    return pooled_handler(config, make_bot_handler)
+
+_handlers: Dict[Config, "IHandler"] = {}
+
+
+def _handler_key(config: Config) -> Config:
+    # Everything but what only shapes the report goes into the handler
+    return dataclasses.replace(config, trace=False, report_verbosity=ReportVerbosity.FULL)
+
+
+def cached_handler(config: Config) -> "IHandler":
+    """One handler, and so one API session per bot, per handler configuration for the life of the process."""
+    key = _handler_key(config)
+    handler = _handlers.get(key)
+    if handler is None:
+        handler = _handlers[key] = make_handler(config)
+    return handler
+
+
+def make_responder(job_directory: Optional[str] = None):
+    import cortexutils.worker
+    from .output import JobOutput
+
+    worker = cortexutils.worker.Worker(job_directory=job_directory)
+    # Resolved by cortexutils from argv or /job; None once it fell back to stdin, where it prints the report itself
+    job_directory = getattr(worker, "job_directory", None)
     return Responder(
-        worker=worker
-    )    
-    
+        worker=worker,
+        output=JobOutput(job_directory) if job_directory is not None else None
+    )
+
+
+def _record_job(action: str, outcome: str, start: float):
+    metrics.inc("webexcortex_jobs_total", action=action, outcome=outcome)
+    metrics.observe("webexcortex_job_seconds", time.perf_counter() - start, action=action)
+
 
-def main():
-    resp = make_responder()
+def run(resp: Responder, handler_factory: Callable[[Config], "IHandler"] = make_handler):
+    start = time.perf_counter()
+    action = "invalid"
     try:
-        handler = make_handler(resp.config)
-        report = handler.handle(resp.request)
+        config = resp.config
+        action = resp.request.action.value
+        metrics.observe("webexcortex_job_guests", len(resp.request.guests), action=action)
+        handler = handler_factory(config)
+        if config.trace:
+            with tracing.trace("job", action=resp.request.action.value) as root:
+                report = handler.handle(resp.request)
+            report.events.append(tracing.timings(root))
+        else:
+            report = handler.handle(resp.request)
+        if config.report_verbosity == ReportVerbosity.SUMMARY:
+            report = report.summarized()
         resp.report(report)
     except Exception as e:
+        _record_job(action, "error", start)
         resp.error(e)
+        return False
+    _record_job(action, "success", start)
+    return True
+
+
+def daemon(argv: List[str]):
+    from .daemon import main as daemon_main
+    return daemon_main(argv)
+
+
+def batch(argv: List[str]):
+    from .batch import main as batch_main
+    return batch_main(argv)
+
+
+COMMANDS: Dict[str, Callable[[List[str]], Optional[int]]] = {
+    "daemon": daemon,
+    "batch": batch,
+}
+
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) > 0 and argv[0] in COMMANDS:
+        return COMMANDS[argv[0]](argv[1:])
+    try:
+        run(make_responder())
+    finally:
+        # Also reached through the SystemExit of a failed job
+        metrics.flush()
@@ -0,0 +1,151 @@
+import hashlib
+import math
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+from .datatypes import Member
+
+# Memberships per page of a Webex listing
+PAGE_SIZE = 100
+
+# Guests looked up one by one in a room whose size is not known yet
+LOOKUP_MAX_GUESTS = 3
+
+# Bots, the responder's own included, are members of rooms but never guests
+BOT_DOMAIN = "@webex.bot"
+
+
+def normalize_mail(mail: str) -> str:
+    """Webex treats addresses case-insensitively, so compare them casefolded."""
+    return mail.strip().casefold()
+
+
+class MembershipIndex:
+    """Members of a room keyed by normalized email, in the order they were listed."""
+
+    _by_mail: Dict[str, Member]
+
+    def __init__(self, members: Iterable[Member] = ()) -> None:
+        self._by_mail = {}
+        for member in members:
+            self.add(member)
+
+    def __len__(self):
+        return len(self._by_mail)
+
+    def __iter__(self) -> Iterator[Member]:
+        return iter(self._by_mail.values())
+
+    def __contains__(self, mail: str) -> bool:
+        return normalize_mail(mail) in self._by_mail
+
+    def add(self, member: Member):
+        self._by_mail.setdefault(normalize_mail(member.Mail), member)
+
+    def get(self, mail: str) -> Optional[Member]:
+        return self._by_mail.get(normalize_mail(mail))
+
+    def missing(self, mails: Iterable[str]) -> List[str]:
+        """The mails not in the room, without duplicates, as they were given."""
+        seen = set()
+        result = []
+        for mail in mails:
+            key = normalize_mail(mail)
+            if key in self._by_mail or key in seen:
+                continue
+            seen.add(key)
+            result.append(mail)
+        return result
+
+    def present(self, mails: Iterable[str]) -> List[Member]:
+        """The members whose mail is among mails, in room order."""
+        wanted = {normalize_mail(mail) for mail in mails}
+        return [member for key, member in self._by_mail.items() if key in wanted]
+
+
+def scan(members: Iterable[Member], mails: Iterable[str]) -> Tuple[List[Member], int]:
+    """The members whose mail is among mails, in room order, and how many members were read.
+
+    Reading stops as soon as every mail has been found, so with a lazy listing the
+    remaining pages of the room are never fetched.
+    """
+    wanted = {normalize_mail(mail) for mail in mails}
+    found: List[Member] = []
+    scanned = 0
+    if len(wanted) == 0:
+        return found, scanned
+    for member in members:
+        scanned += 1
+        key = normalize_mail(member.Mail)
+        if key in wanted:
+            wanted.discard(key)
+            found.append(member)
+            if len(wanted) == 0:
+                break
+    return found, scanned
+
+
+def sync_plan(members: Iterable[Member], guestmails: Iterable[str], owners: Iterable[str] = ()) -> Tuple[List[str], List[Member]]:
+    """The guests to add and the members to remove so that the guests of the room are exactly guestmails.
+
+    Moderators, owners and bots are left alone.
+    """
+    guestmails = list(guestmails)
+    index = MembershipIndex(members)
+    keep = set(unique_mails(guestmails)) | set(unique_mails(owners))
+    remove = [
+        member for member in index
+        if not member.IsModerator
+        and not normalize_mail(member.Mail).endswith(BOT_DOMAIN)
+        and normalize_mail(member.Mail) not in keep
+    ]
+    return index.missing(guestmails), remove
+
+
+def membership_digest(members: Iterable[Member]) -> str:
+    """Stable digest of who is in a room and who moderates it, whatever the listing order."""
+    entries = sorted(f"{normalize_mail(m.Mail)}\t{int(bool(m.IsModerator))}" for m in members)
+    return hashlib.sha256("\n".join(entries).encode()).hexdigest()[:16]
+
+
+def unique_mails(mails: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(normalize_mail(mail) for mail in mails))
+
+
+class RoomSizes:
+    """Member counts of rooms seen in full listings, to price the next lookup in them.
+
+    A targeted lookup costs one call per guest, a full listing one call per page
+    of the room.
+    """
+
+    _sizes: Dict[Hashable, int]
+
+    def __init__(self, maxsize: int = 4096) -> None:
+        self.maxsize = maxsize
+        self._sizes = {}
+
+    def get(self, roomid: Hashable) -> Optional[int]:
+        return self._sizes.get(roomid)
+
+    def put(self, roomid: Hashable, size: int):
+        self._sizes.pop(roomid, None)
+        self._sizes[roomid] = size
+        while len(self._sizes) > self.maxsize:
+            del self._sizes[next(iter(self._sizes))]
+
+    def prefer_lookup(self, roomid: Hashable, guests: int) -> bool:
+        size = self.get(roomid)
+        if size is None:
+            return guests <= LOOKUP_MAX_GUESTS
+        return guests < math.ceil(size / PAGE_SIZE)
+
+
+__all__ = [o.__name__ for o in [
+    normalize_mail,
+    MembershipIndex,
+    RoomSizes,
+    scan,
+    sync_plan,
+    membership_digest,
+    unique_mails,
+]]
@@ -0,0 +1,300 @@
+import bisect
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+METRICS_FILE_ENV = "WEBEXCORTEX_METRICS_FILE"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+
+# name: (type, help, buckets)
+METRICS: Dict[str, Tuple[str, str, Sequence[float]]] = {
+    "webexcortex_jobs_total": ("counter", "Jobs run, by action and outcome.", ()),
+    "webexcortex_job_seconds": ("histogram", "Job latency in seconds, by action.", LATENCY_BUCKETS),
+    "webexcortex_job_guests": ("histogram", "Guests requested per job, by action.", COUNT_BUCKETS),
+    "webexcortex_api_calls_total": ("counter", "Webex API calls, by endpoint and status.", ()),
+    "webexcortex_api_call_seconds": ("histogram", "Webex API call latency in seconds, by endpoint.", LATENCY_BUCKETS),
+    "webexcortex_api_throttled_total": ("counter", "Webex API calls answered with 429, by endpoint.", ()),
+    "webexcortex_room_members": ("histogram", "Memberships read per membership listing.", COUNT_BUCKETS),
+    "webexcortex_http_requests_total": ("counter", "HTTP requests sent to Webex.", ()),
+    "webexcortex_http_connections_total": ("counter", "HTTP connections opened to Webex; the rest of the requests reused one.", ()),
+    "webexcortex_bot_jobs_total": ("counter", "Jobs run by each bot of a token pool, by bot digest and why it was chosen.", ()),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        # Counts are per bucket here and made cumulative when rendered
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, counts: List[int], sum: float, count: int):
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+        self.sum += sum
+        self.count += count
+
+
+class Registry:
+    """Counters and histograms of one process, mergeable with those of others."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: Any):
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any):
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(METRICS[name][2])
+            histogram.observe(value)
+
+    def snapshot(self, reset: bool = False) -> Dict[str, Any]:
+        """JSON friendly copy of every value, optionally starting over from zero."""
+        with self._lock:
+            snapshot = {
+                "counters": [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                "histograms": [
+                    [name, list(labels), h.counts, h.sum, h.count]
+                    for (name, labels), h in self.histograms.items()
+                ],
+            }
+            if reset:
+                self.counters = {}
+                self.histograms = {}
+        return snapshot
+
+    def merge(self, snapshot: Dict[str, Any]):
+        with self._lock:
+            for name, labels, value in snapshot.get("counters", []):
+                key = (name, tuple(tuple(label) for label in labels))
+                self.counters[key] = self.counters.get(key, 0) + value
+            for name, labels, counts, sum, count in snapshot.get("histograms", []):
+                key = (name, tuple(tuple(label) for label in labels))
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram(METRICS[name][2])
+                histogram.merge(counts, sum, count)
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, (list(h.counts), h.sum, h.count)) for key, h in self.histograms.items())
+
+        lines: List[str] = []
+        described = set()
+
+        def describe(name: str):
+            if name not in described:
+                described.add(name)
+                kind, help, _ = METRICS.get(name, ("untyped", "", ()))
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            describe(name)
+            lines.append(f"{name}{_format(labels)} {_number(value)}")
+        for (name, labels), (counts, sum, count) in histograms:
+            describe(name)
+            cumulative = 0
+            for bound, n in zip(METRICS[name][2], counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_format(labels + (('le', _number(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_format(labels)} {_number(sum)}")
+            lines.append(f"{name}_count{_format(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format(labels: Labels) -> str:
+    if len(labels) == 0:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+REGISTRY = Registry()
+
+
+def inc(name: str, value: float = 1, **labels: Any):
+    REGISTRY.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels: Any):
+    REGISTRY.observe(name, value, **labels)
+
+
+#region Webex API calls
+
+def _status(e: Exception) -> str:
+    response = getattr(e, 'response', None)
+    status_code = getattr(e, 'status_code', getattr(response, 'status_code', None))
+    return str(status_code) if status_code is not None else "error"
+
+
+class Metered:
+    """Proxy for a RoomsAPI/MembershipsAPI that counts and times every call.
+
+    Put it below RateLimited so that every attempt, 429s included, is counted;
+    the retried pages of a listing are paced below the SDK, so a listing counts once.
+    """
+
+    def __init__(self, api: Any, endpoint: str) -> None:
+        self._api = api
+        self._endpoint = endpoint
+
+    def _record(self, method: str, start: float, status: str):
+        endpoint = f"{self._endpoint}.{method}"
+        inc("webexcortex_api_calls_total", endpoint=endpoint, status=status)
+        observe("webexcortex_api_call_seconds", time.perf_counter() - start, endpoint=endpoint)
+        if status == "429":
+            inc("webexcortex_api_throttled_total", endpoint=endpoint)
+
+    def _call(self, method: str, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._record(method, start, _status(e))
+            raise
+        self._record(method, start, "ok")
+        return result
+
+    def _list(self, fn, *args, **kwargs) -> Iterator:
+        # Listings page lazily, so the call only ends once the last page is read
+        # or once the reader stops early
+        start = time.perf_counter()
+        status = "ok"
+        items = 0
+        try:
+            for item in fn(*args, **kwargs):
+                items += 1
+                yield item
+        except Exception as e:
+            status = _status(e)
+            raise
+        finally:
+            self._record("list", start, status)
+            if self._endpoint == "memberships" and kwargs.get("personEmail") is None:
+                observe("webexcortex_room_members", items)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._api, name)
+        if not callable(attr):
+            return attr
+        if name == 'list':
+            return lambda *args, **kwargs: self._list(attr, *args, **kwargs)
+        return lambda *args, **kwargs: self._call(name, attr, *args, **kwargs)
+
+#endregion
+
+
+#region Export
+
+def _atomic_write(path: str, data: str):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def write_textfile(path: str, registry: Registry = REGISTRY):
+    """Add what the registry counted since the last write to a textfile-collector file.
+
+    The running totals live next to it in `<path>.json`; concurrent processes
+    take turns through an flock on `<path>.lock` and the .prom file is replaced
+    atomically, so the collector never reads a partial file.
+    """
+    import fcntl
+
+    delta = registry.snapshot(reset=True)
+    with open(f"{path}.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        totals = Registry()
+        try:
+            with open(f"{path}.json") as f:
+                totals.merge(json.load(f))
+        except (FileNotFoundError, ValueError):
+            pass
+        totals.merge(delta)
+        _atomic_write(f"{path}.json", json.dumps(totals.snapshot()))
+        _atomic_write(path, totals.render())
+
+
+def flush(path: Optional[str] = None):
+    """Write to the textfile named by WEBEXCORTEX_METRICS_FILE, if any."""
+    path = path or os.environ.get(METRICS_FILE_ENV)
+    if path:
+        write_textfile(path)
+
+
+def serve(port: int, host: str = "", registry: Registry = REGISTRY):
+    """Serve the registry on http://host:port/metrics from a background thread."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            data = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+#endregion
+
+
+__all__ = [o.__name__ for o in [
+    Histogram,
+    Registry,
+    Metered,
+    inc,
+    observe,
+    write_textfile,
+    flush,
+    serve,
+]]
@@ -0,0 +1,99 @@
+import json
+import os
+import sys
+from typing import IO, Any, Callable, Iterator, Optional
+
+
+# Leaves encoded per call; bounds the text held at once for rooms of any size
+_CHUNK = 256
+
+
+def _record(value: Any) -> Any:
+    # Room and Member records of report events, serialized as they are written
+    to_dict = getattr(value, "to_dict", None)
+    if to_dict is None:
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    return to_dict()
+
+
+def _key(key: Any) -> str:
+    # json turns keys that are not strings into their JSON text, e.g. true or 1
+    return key if isinstance(key, str) else json.dumps(key)
+
+
+def _is_container(value: Any) -> bool:
+    return isinstance(value, (dict, list, tuple))
+
+
+def _iterencode(value: Any, encode: Callable[[Any], str]) -> Iterator[str]:
+    if isinstance(value, dict):
+        if len(value) == 0:
+            yield "{}"
+            return
+        separator = "{"
+        for key, item in value.items():
+            yield f"{separator}{encode(_key(key))}: "
+            yield from _iterencode(item, encode)
+            separator = ", "
+        yield "}"
+    elif isinstance(value, (list, tuple)):
+        if len(value) == 0:
+            yield "[]"
+            return
+        if any(_is_container(item) for item in value):
+            separator = "["
+            for item in value:
+                yield separator
+                yield from _iterencode(item, encode)
+                separator = ", "
+        else:
+            # A run of leaves goes through the C encoder in one call, brackets cut off
+            for start in range(0, len(value), _CHUNK):
+                yield ("[" if start == 0 else ", ") + encode(list(value[start:start + _CHUNK]))[1:-1]
+        yield "]"
+    else:
+        yield encode(value)
+
+
+def iterencode(value: Any, ensure_ascii: bool = False) -> Iterator[str]:
+    """The text of json.dumps(value, ensure_ascii=ensure_ascii) in pieces, with records encoded by their to_dict."""
+    encoder = json.JSONEncoder(ensure_ascii=ensure_ascii, default=_record)
+    return _iterencode(value, encoder.encode)
+
+
+def write_json(out: IO[str], value: Any, ensure_ascii: bool = False):
+    for chunk in iterencode(value, ensure_ascii=ensure_ascii):
+        out.write(chunk)
+
+
+class JobOutput:
+    """Where cortexutils' Worker writes the output of a job: the job directory, or stdout without one.
+
+    The output is streamed as it is encoded, and a job directory only ever
+    sees the whole file, so a job that dies halfway leaves no output behind.
+    """
+
+    job_directory: Optional[str]
+
+    def __init__(self, job_directory: Optional[str] = None) -> None:
+        self.job_directory = job_directory
+
+    def write(self, output: Any, ensure_ascii: bool = False):
+        if self.job_directory is None:
+            write_json(sys.stdout, output, ensure_ascii=ensure_ascii)
+            sys.stdout.flush()
+            return
+        directory = os.path.join(self.job_directory, "output")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, "output.json")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, mode="w") as f:
+            write_json(f, output, ensure_ascii=ensure_ascii)
+        os.replace(tmp, path)
+
+
+__all__ = [o.__name__ for o in [
+    JobOutput,
+    iterencode,
+    write_json,
+]]
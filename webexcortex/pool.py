@@ -0,0 +1,192 @@
+import contextlib
+import hashlib
+import json
+import math
+import os
+import threading
+from typing import Callable, Dict, Iterator, List, Mapping, Optional, Protocol, Tuple
+
+from .datatypes import RoomAction, RoomID
+from .handler import FullReport, IRequest
+from .roomindex import case_key
+from . import metrics
+
+
+#region Protocols
+
+class IHandler(Protocol):
+    def handle(self, req: IRequest) -> FullReport: ...
+
+
+class IBudget(Protocol):
+    def budget(self) -> float: ...
+
+#endregion
+
+
+def bot_digest(token: str) -> str:
+    """Names a bot in state files and metrics without its token."""
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+def rendezvous(key: str, bots: List[str]) -> List[str]:
+    """The bots in the order a key prefers them; adding or removing a bot only moves the keys it wins or held."""
+    return sorted(bots, key=lambda bot: hashlib.sha256(f"{bot}\n{key}".encode()).digest(), reverse=True)
+
+
+class Affinity:
+    """Room and case to the bot that created the room, and so moderates it.
+
+    Bots are kept as digests of their tokens. With a path the map is shared by
+    every process using it: each lookup reads the file again, and each change
+    is merged into what is on disk under an flock on `<path>.lock` before the
+    file is replaced atomically.
+    """
+
+    path: Optional[str]
+    _bots: Dict[str, str]
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+        self._bots = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self):
+        with self._locked(shared=True):
+            return len(self._bots)
+
+    @contextlib.contextmanager
+    def _locked(self, shared: bool = False) -> Iterator[None]:
+        with self._lock:
+            if self.path is None:
+                yield
+                return
+            import fcntl
+
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                lock = open(f"{self.path}.lock", "a")
+            except OSError:
+                # Without the lock this process still sees its own changes
+                yield
+                return
+            with lock:
+                fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+                self._load()
+                yield
+
+    def _load(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path) as f:
+                self._bots = dict(json.load(f).get("bots", {}))
+        except (OSError, ValueError):
+            return
+
+    def _save(self):
+        if self.path is None:
+            return
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump({"bots": self._bots}, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            # Without the map, later jobs on the room go to the primary bot
+            pass
+
+    def get(self, key: str) -> Optional[str]:
+        with self._locked(shared=True):
+            return self._bots.get(key)
+
+    def put(self, bot: str, *keys: str):
+        with self._locked():
+            for key in keys:
+                self._bots[key] = bot
+            self._save()
+
+    def discard(self, key: str):
+        with self._locked():
+            if self._bots.pop(key, None) is not None:
+                self._save()
+
+
+def _room_key(roomid: RoomID) -> str:
+    return f"room {roomid}"
+
+
+def _case_key(req: IRequest) -> str:
+    return f"case {case_key(req.organization, req.case_id)}"
+
+
+class BotPool:
+    """Runs every job with one bot of a pool of bot tokens, each with its own rate limit.
+
+    A job on an existing room goes to the bot that created the room, which is
+    its moderator; rooms the pool does not know go to the primary, the first
+    token. A new room goes to the bot its case hashes to, unless another bot
+    has clearly more of its rate budget left, and the room and the case stick
+    to the bot that created it.
+    """
+
+    primary: str
+    handlers: Dict[str, IHandler]
+    budgets: Dict[str, Callable[[], float]]
+    affinity: Affinity
+
+    def __init__(self, handlers: Mapping[str, IHandler], budgets: Mapping[str, IBudget], affinity: Optional[Affinity] = None) -> None:
+        if len(handlers) == 0:
+            raise ValueError("A bot pool needs at least one bot")
+        # Keyed by digest, so the tokens themselves are not kept past this point
+        self.primary = bot_digest(next(iter(handlers)))
+        self.handlers = {bot_digest(token): handler for token, handler in handlers.items()}
+        self.budgets = {bot_digest(token): budget.budget for token, budget in budgets.items()}
+        self.affinity = affinity if affinity is not None else Affinity()
+
+    def _budget(self, bot: str) -> int:
+        budget = self.budgets.get(bot)
+        # Whole calls, so bots with about the same budget keep the order of the case
+        return math.floor(budget()) if budget is not None else 0
+
+    def select(self, req: IRequest) -> Tuple[str, str]:
+        """The bot for the job, and why it was chosen."""
+        if req.action == RoomAction.CREATE:
+            bot = self.affinity.get(_case_key(req))
+            if bot in self.handlers:
+                return bot, "affinity"
+            preferred = rendezvous(_case_key(req), list(self.handlers))
+            budgets = {bot: self._budget(bot) for bot in preferred}
+            bot = max(preferred, key=lambda bot: budgets[bot])
+            return bot, "hash" if bot == preferred[0] else "budget"
+
+        if req.roomid:
+            bot = self.affinity.get(_room_key(req.roomid))
+            if bot in self.handlers:
+                return bot, "affinity"
+        return self.primary, "primary"
+
+    def handle(self, req: IRequest) -> FullReport:
+        bot, reason = self.select(req)
+        metrics.inc("webexcortex_bot_jobs_total", bot=bot, reason=reason)
+        if req.action == RoomAction.CREATE and reason != "affinity":
+            # Before the room exists, so a rerun of a job that died halfway goes to
+            # the bot holding its journal and case index, whatever the budgets say
+            self.affinity.put(bot, _case_key(req))
+        report = self.handlers[bot].handle(req)
+
+        if req.action == RoomAction.CREATE and report.fields.roomid:
+            self.affinity.put(bot, _room_key(report.fields.roomid), _case_key(req))
+        elif req.action == RoomAction.DELETE and req.roomid:
+            self.affinity.discard(_room_key(req.roomid))
+        return report
+
+
+__all__ = [o.__name__ for o in [
+    Affinity,
+    BotPool,
+    bot_digest,
+    rendezvous,
+]]
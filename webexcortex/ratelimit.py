@@ -0,0 +1,251 @@
+import contextvars
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, TypeVar
+
+
+T = TypeVar('T')
+
+
+class RateLimitExceeded(RuntimeError):
+    pass
+
+
+def retry_after(e: Exception) -> Optional[float]:
+    """Seconds to back off if e is a Webex 429, otherwise None."""
+    after = getattr(e, 'retry_after', None)
+    if after is not None:
+        return float(after)
+    response = getattr(e, 'response', None)
+    status_code = getattr(e, 'status_code', getattr(response, 'status_code', None))
+    if status_code != 429:
+        return None
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('Retry-After', 1))
+    except (TypeError, ValueError):
+        return 1.0
+
+
+class AdaptiveRateLimiter:
+    """Token bucket whose rate follows the 429s from Webex (AIMD).
+
+    Every successful call raises the rate additively by about `increase` calls/s per
+    second of traffic, every 429 multiplies it by `decrease` and pauses all callers for
+    the Retry-After period. Callers queue in `acquire` instead of failing.
+    """
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        burst: int = 10,
+        min_rate: float = 0.5,
+        max_rate: float = 100.0,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        max_retries: int = 5,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self._rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.max_retries = max_retries
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._resume_at = 0.0
+        self._waiting = 0
+        self.throttled = 0
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    @property
+    def queue_depth(self) -> int:
+        return self._waiting
+
+    def _refill(self, now: float):
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def budget(self) -> float:
+        """Calls that could start now without waiting; negative while callers queue or a 429 pause lasts."""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            return self._tokens - self._waiting - max(self._resume_at - now, 0.0) * self._rate
+
+    def acquire(self):
+        with self._lock:
+            self._waiting += 1
+        try:
+            while True:
+                with self._lock:
+                    now = self._clock()
+                    self._refill(now)
+                    if now >= self._resume_at and self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = max(self._resume_at - now, (1 - self._tokens) / self._rate)
+                self._sleep(wait)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def on_success(self):
+        with self._lock:
+            self._rate = min(self.max_rate, self._rate + self.increase / self._rate)
+
+    def on_throttle(self, after: float):
+        with self._lock:
+            self.throttled += 1
+            self._rate = max(self.min_rate, self._rate * self.decrease)
+            self._tokens = 0
+            self._resume_at = max(self._resume_at, self._clock() + after)
+
+    def _call(self, fn: Callable[..., T], args, kwargs, prepaid: bool = False) -> T:
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0 or not prepaid:
+                self.acquire()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                after = retry_after(e)
+                if after is None:
+                    raise
+                self.on_throttle(after)
+                continue
+            self.on_success()
+            return result
+        raise RateLimitExceeded(f"Still rate limited after {self.max_retries} retries")
+
+    def call(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        return self._call(fn, args, kwargs)
+
+    def iterate(self, fn: Callable[..., Iterable[T]], *args, **kwargs) -> Iterator[T]:
+        """Stream a listing, a token per page.
+
+        Pages requested through a session set up by `limit_pages` are paced and
+        retried one by one, from their own cursor; any other listing takes one
+        token and a 429 on a later page restarts it past what was already yielded.
+        """
+        yielded = 0
+        for _ in range(self.max_retries + 1):
+            # The token of the first page
+            self.acquire()
+            listing = _Listing(self)
+            position = 0
+            try:
+                items = iter(fn(*args, **kwargs))
+                while True:
+                    try:
+                        item = listing.next(items)
+                    except StopIteration:
+                        break
+                    if position >= yielded:
+                        yielded += 1
+                        yield item
+                    position += 1
+            except Exception as e:
+                after = retry_after(e)
+                if after is None:
+                    raise
+                self.on_throttle(after)
+                continue
+            if listing.pages == 0:
+                self.on_success()
+            return
+        raise RateLimitExceeded(f"Still rate limited after {self.max_retries} retries")
+
+
+class _Listing:
+    """The listing being read on this thread, for the page requests the SDK makes inside it."""
+
+    __slots__ = ("limiter", "pages")
+
+    def __init__(self, limiter: AdaptiveRateLimiter) -> None:
+        self.limiter = limiter
+        self.pages = 0
+
+    def next(self, items: Iterator[T]) -> T:
+        # Only while the SDK generator runs, never while the reader has the item
+        token = _listing.set(self)
+        try:
+            return next(items)
+        finally:
+            _listing.reset(token)
+
+    def fetch(self, request: Callable[..., T], *args, **kwargs) -> T:
+        prepaid = self.pages == 0
+        self.pages += 1
+        return self.limiter._call(request, args, kwargs, prepaid=prepaid)
+
+
+_listing: "contextvars.ContextVar[Optional[_Listing]]" = contextvars.ContextVar("listing", default=None)
+
+
+def limit_pages(session: Any):
+    """Route the page requests of a webexteamssdk RestSession through the limiter of their listing.
+
+    The SDK requests the pages of a listing inside its generator, following the
+    cursor of the previous page; a throttled page is requested again with the
+    same cursor instead of the listing starting over.
+    """
+    request = session.request
+
+    def paced(method, url, erc, **kwargs):
+        listing = _listing.get()
+        if listing is None:
+            return request(method, url, erc, **kwargs)
+        return listing.fetch(request, method, url, erc, **kwargs)
+
+    session.request = paced
+
+
+class RateLimited:
+    """Proxy for a RoomsAPI/MembershipsAPI that routes every call through a limiter.
+
+    `list` results are paged lazily by the SDK and stay lazy here; every page takes
+    a token, and a 429 on a later page is retried instead of failing the listing.
+    """
+
+    def __init__(self, api: Any, limiter: AdaptiveRateLimiter) -> None:
+        self._api = api
+        self._limiter = limiter
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._api, name)
+        if not callable(attr):
+            return attr
+        if name == 'list':
+            return lambda *args, **kwargs: self._limiter.iterate(attr, *args, **kwargs)
+        return lambda *args, **kwargs: self._limiter.call(attr, *args, **kwargs)
+
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def shared_limiter(token: str) -> AdaptiveRateLimiter:
+    """The limiter for a bot token, shared by every Client in the process."""
+    with _limiters_lock:
+        limiter = _limiters.get(token)
+        if limiter is None:
+            limiter = _limiters[token] = AdaptiveRateLimiter()
+        return limiter
+
+
+__all__ = [cls.__name__ for cls in [
+    RateLimitExceeded,
+    AdaptiveRateLimiter,
+    RateLimited,
+    limit_pages,
+    shared_limiter,
+]]
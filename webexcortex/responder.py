@@ -1,7 +1,8 @@
+import dataclasses
 import json
-from typing import List, NoReturn, Protocol, TypeVar, Type, cast, Sized, Any, Dict
+from typing import Iterable, List, NoReturn, Optional, Protocol, Tuple, TypeVar, Type, cast, Sized, Any, Dict
 
-from .datatypes import Fields, RoomID, RoomAction
+from .datatypes import Fields, RoomID, RoomAction, ReportVerbosity
 
 
 #region Protocols
@@ -15,12 +16,18 @@ class IReport(Protocol):
 
     def to_dict(self) -> Dict[str, Any]: ...
 
+    def to_records(self) -> Dict[str, Any]: ...
+
 
 class IWorker(IParams, Protocol):
     def report(self, output, ensure_ascii=False): ...
 
     def error(self, message, ensure_ascii=False) -> NoReturn: ...
 
+
+class IOutput(Protocol):
+    def write(self, output: Any, ensure_ascii: bool = False): ...
+
 T = TypeVar('T')
 
 #endregion
@@ -32,95 +39,229 @@ class ParamError(RuntimeError):
     pass
 
 
-def _get_param(resp: IParams, name: str, cls: Type[T], empty_ok: bool = False) -> T:
-    val = resp.get_param(name, default=None)
-    if val is None:
-        raise ParamError(f'Missing parameter: "{name}"')
-
-    if not isinstance(val, cls):
-        raise ParamError(f'Invalid parameter type: "{name}" is [{type(val).__name__}] expected [{cls.__name__}]')
-
-    if not empty_ok and isinstance(val, Sized) and len(val) == 0:
-        raise ParamError(f'Invalid parameter value: "{name}" must not be empty')
-        
-    return cast(T, val)
+_MISSING = object()
 
-#endregion
 
-
-class Request:
+class _Params:
+    """Reads the job input once, collecting every validation error."""
 
     resp: IParams
+    errors: List[str]
 
     def __init__(self, resp: IParams) -> None:
         self.resp = resp
+        self.errors = []
+        self._roots: Dict[str, Any] = {}
+
+    def _lookup(self, name: str) -> Any:
+        root, *path = name.split('.')
+        if root not in self._roots:
+            self._roots[root] = self.resp.get_param(root, default=None)
+        val = self._roots[root]
+        for key in path:
+            if not isinstance(val, dict):
+                return None
+            val = val.get(key)
+        return val
+
+    def get(self, name: str, cls: Type[T], required: bool = True, empty_ok: bool = False) -> Optional[T]:
+        val = self._lookup(name)
+        if val is None or (not required and isinstance(val, Sized) and len(val) == 0):
+            if required:
+                self.errors.append(f'Missing parameter: "{name}"')
+            return None
+
+        if not isinstance(val, cls):
+            self.errors.append(f'Invalid parameter type: "{name}" is [{type(val).__name__}] expected [{cls.__name__}]')
+            return None
+
+        if not empty_ok and isinstance(val, Sized) and len(val) == 0:
+            self.errors.append(f'Invalid parameter value: "{name}" must not be empty')
+            return None
+
+        return cast(T, val)
+
+    def invalid(self, name: str, reason: str):
+        self.errors.append(f'Invalid parameter value: "{name}" {reason}')
+
+    def check(self):
+        if len(self.errors) > 0:
+            raise ParamError("; ".join(self.errors))
 
-   
-    @property
-    def roomid(self):
-        return RoomID(_get_param(self.resp, 'data.customFields.webexroomid.string', str))
+#endregion
 
-    @property
-    def case_title(self):
-        return _get_param(self.resp, 'data.title', str)
-    
-    @property
-    def case_id(self):
-        return _get_param(self.resp, 'data.caseId', int)
-    
-    @property
-    def organization(self):
-        return _get_param(self.resp, 'config.organization', str)
 
-    @property
-    def title(self):
-        return f"{self.organization} #{self.case_id} - {self.case_title}"
-    
-    @property
-    def tags(self) -> List[str]:
-        return _get_param(self.resp, 'data.tags', list)
+GUEST_PREFIX = "wbx="
 
-    @property
-    def guests(self) -> List[str]:
-        prefix = "wbx="
-        prefix_len = len(prefix)
-        return [ json.loads(tag[prefix_len:]) for tag in self.tags if tag.startswith(prefix) ]
-    
-    @property
-    def owners(self):
-        return [ _get_param(self.resp, 'data.owner', str) ]
-    
-    @property
-    def action(self):
-        return RoomAction(_get_param(self.resp, 'data.customFields.webexteams.string', str))
+# Actions that work on an existing room, and the ones that read the case
+_ROOM_ACTIONS = {RoomAction.DELETE, RoomAction.ADD_GUESTS, RoomAction.REMOVE_GUESTS, RoomAction.SYNC_GUESTS}
+_CASE_ACTIONS = {RoomAction.CREATE}
+_GUEST_ACTIONS = {RoomAction.CREATE, RoomAction.ADD_GUESTS, RoomAction.REMOVE_GUESTS, RoomAction.SYNC_GUESTS}
 
 
-class Config:
+def _parse_guests(params: _Params, tags: Iterable[str]) -> Tuple[str, ...]:
+    guests = []
+    for tag in tags:
+        if not tag.startswith(GUEST_PREFIX):
+            continue
+        try:
+            guests.append(json.loads(tag[len(GUEST_PREFIX):]))
+        except ValueError:
+            params.invalid('data.tags', f'has a malformed guest tag [{tag}]')
+    return tuple(guests)
 
-    resp: IParams
 
-    def __init__(self, resp: IParams) -> None:
-        self.resp = resp
+@dataclasses.dataclass(frozen=True)
+class Request:
+    """Immutable snapshot of the job data, parsed and validated once."""
+
+    __slots__ = ("action", "roomid", "case_id", "case_title", "organization", "title", "tags", "guests", "owners")
+
+    action: RoomAction
+    roomid: Optional[RoomID]
+    case_id: Optional[int]
+    case_title: Optional[str]
+    organization: Optional[str]
+    title: Optional[str]
+    tags: Tuple[str, ...]
+    guests: Tuple[str, ...]
+    owners: Tuple[str, ...]
+
+    @classmethod
+    def _parse(cls, params: _Params) -> "Request":
+        action = None
+        name = params.get('data.customFields.webexteams.string', str)
+        if name is not None:
+            try:
+                action = RoomAction(name)
+            except ValueError:
+                params.invalid('data.customFields.webexteams.string', f'[{name}] is not a room action')
+
+        needs_room = action in _ROOM_ACTIONS
+        needs_case = action in _CASE_ACTIONS
+        needs_guests = action in _GUEST_ACTIONS
+
+        roomid = params.get('data.customFields.webexroomid.string', str, required=needs_room)
+        case_title = params.get('data.title', str, required=needs_case)
+        case_id = params.get('data.caseId', int, required=needs_case)
+        organization = params.get('config.organization', str, required=needs_case)
+        owner = params.get('data.owner', str, required=needs_case)
+        tags = params.get('data.tags', list, required=needs_guests) or []
+
+        title = None
+        if None not in (organization, case_id, case_title):
+            title = f"{organization} #{case_id} - {case_title}"
+
+        return cls(
+            action=action,
+            roomid=RoomID(roomid) if roomid is not None else None,
+            case_id=case_id,
+            case_title=case_title,
+            organization=organization,
+            title=title,
+            tags=tuple(tags),
+            guests=_parse_guests(params, tags),
+            owners=(owner,) if owner is not None else (),
+        )
 
-    @property
-    def webex_bot_token(self):
-        return _get_param(self.resp, 'config.webex_bot_token', str)
+    @classmethod
+    def parse(cls, resp: IParams) -> "Request":
+        params = _Params(resp)
+        req = cls._parse(params)
+        params.check()
+        return req
+
+
+@dataclasses.dataclass(frozen=True)
+class Config:
+    """Immutable snapshot of the responder configuration."""
+
+    __slots__ = ("webex_bot_token", "webex_bot_tokens", "webex_base_url", "webex_http2", "trace", "state_directory", "report_verbosity", "transcript_directory", "cache_ttl", "webex_transcript_token")
+
+    webex_bot_token: str
+    webex_bot_tokens: Tuple[str, ...]
+    webex_base_url: Optional[str]
+    webex_http2: bool
+    trace: bool
+    state_directory: Optional[str]
+    report_verbosity: ReportVerbosity
+    transcript_directory: Optional[str]
+    cache_ttl: int
+    webex_transcript_token: Optional[str]
+
+    @classmethod
+    def _parse(cls, params: _Params) -> "Config":
+        verbosity = ReportVerbosity.FULL
+        name = params.get('config.report_verbosity', str, required=False)
+        if name is not None:
+            try:
+                verbosity = ReportVerbosity(name)
+            except ValueError:
+                params.invalid('config.report_verbosity', f'[{name}] is not one of {[v.value for v in ReportVerbosity]}')
+
+        cache_ttl = params.get('config.cache_ttl', int, required=False) or 0
+        if cache_ttl < 0:
+            params.invalid('config.cache_ttl', 'must not be negative')
+
+        # The primary bot first, then the rest of the pool
+        token = params.get('config.webex_bot_token', str)
+        tokens = [token] if token is not None else []
+        for extra in params.get('config.webex_bot_tokens', list, required=False) or []:
+            if not isinstance(extra, str) or len(extra) == 0:
+                params.invalid('config.webex_bot_tokens', 'must only hold bot tokens')
+                break
+            if extra not in tokens:
+                tokens.append(extra)
+
+        return cls(
+            webex_bot_token=token,
+            webex_bot_tokens=tuple(tokens),
+            webex_base_url=params.get('config.webex_base_url', str, required=False),
+            webex_http2=params.get('config.webex_http2', bool, required=False) or False,
+            trace=params.get('config.trace', bool, required=False) or False,
+            state_directory=params.get('config.state_directory', str, required=False),
+            report_verbosity=verbosity,
+            transcript_directory=params.get('config.transcript_directory', str, required=False),
+            cache_ttl=cache_ttl,
+            webex_transcript_token=params.get('config.webex_transcript_token', str, required=False),
+        )
+
+    @classmethod
+    def parse(cls, resp: IParams) -> "Config":
+        params = _Params(resp)
+        config = cls._parse(params)
+        params.check()
+        return config
 
 
 class Responder():
 
     worker: IWorker
+    output: Optional[IOutput]
 
-    def __init__(self, worker: IWorker) -> None:
+    def __init__(self, worker: IWorker, output: Optional[IOutput] = None) -> None:
         self.worker = worker
+        # Reports are streamed to output when given, instead of handed to the worker as a whole
+        self.output = output
+        self._parsed: Optional[Tuple[Config, Request]] = None
+
+    def _parse(self) -> Tuple[Config, Request]:
+        # Config and request are validated together so every error is reported at once
+        if self._parsed is None:
+            params = _Params(self.worker)
+            config = Config._parse(params)
+            request = Request._parse(params)
+            params.check()
+            self._parsed = (config, request)
+        return self._parsed
 
     @property
-    def request(self):
-        return Request(self.worker)
+    def request(self) -> Request:
+        return self._parse()[1]
     
     @property
-    def config(self):
-        return Config(self.worker)
+    def config(self) -> Config:
+        return self._parse()[0]
 
     @staticmethod
     def add_fields_ops(ops: List[Any], fields: Fields):
@@ -141,10 +282,14 @@ class Responder():
         
         output = {
             'success': True,
-            'full': report.to_dict(),
+            'full': report.to_dict() if self.output is None else report.to_records(),
             'operations': operations
         }
 
+        if self.output is not None:
+            self.output.write(output, ensure_ascii=ensure_ascii)
+            return
+
         self.worker.report(
             output=output,
             ensure_ascii=ensure_ascii
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Protocol
+
+from .datatypes import Room, RoomID
+
+
+STATE_DIRECTORY_ENV = "WEBEXCORTEX_STATE_DIRECTORY"
+
+# Rooms are titled "{organization} #{case_id} - {title}" when they are created
+_TITLE = re.compile(r"^(?P<organization>.+?) #(?P<case_id>\S+) - ", re.DOTALL)
+
+# How many of the newest rooms a refresh remembers to know where to stop next time
+_MARKS = 8
+
+
+class IRoomClient(Protocol):
+
+    def get_room(self, roomid: RoomID) -> Room: ...
+
+    def iter_rooms(self) -> Iterator[Room]: ...
+
+
+def is_not_found(e: Exception) -> bool:
+    """Whether e is the Webex 404 of a room that is gone; the SDK is not imported for the check."""
+    response = getattr(e, 'response', None)
+    return getattr(e, 'status_code', getattr(response, 'status_code', None)) == 404
+
+
+def uncached(client: IRoomClient) -> IRoomClient:
+    """The client under a CachingClient, for reads that must see what Webex has now."""
+    return getattr(client, "uncached", client)
+
+
+def case_key(organization: Any, case_id: Any) -> str:
+    return f"{organization} #{case_id}"
+
+
+def parse_title(title: str) -> Optional[str]:
+    """The case key of a room title, None for rooms not created for a case."""
+    match = _TITLE.match(title)
+    if match is None:
+        return None
+    return case_key(match.group("organization"), match.group("case_id"))
+
+
+def default_state_directory() -> str:
+    directory = os.environ.get(STATE_DIRECTORY_ENV)
+    if directory:
+        return directory
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache, "webexcortex")
+
+
+def state_file(directory: str, kind: str, token: str) -> str:
+    """A file per bot token, since every bot sees its own rooms."""
+    digest = hashlib.sha256(token.encode()).hexdigest()[:16]
+    return os.path.join(directory, f"{kind}-{digest}.json")
+
+
+class RoomIndex:
+    """Case key to room ID, kept up to date from the newest rooms first.
+
+    A refresh lists the group rooms newest first and stops at the first room
+    it has already seen, so only rooms created since the last refresh are read.
+    With a path the index survives the process; it is only a cache of Webex, so
+    a write lost to a concurrent process is made up by the next refresh.
+    """
+
+    path: Optional[str]
+    _rooms: Dict[str, RoomID]
+    _marks: List[RoomID]
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+        self._rooms = {}
+        self._marks = []
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self):
+        return len(self._rooms)
+
+    def _load(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._rooms = {key: RoomID(roomid) for key, roomid in state.get("rooms", {}).items()}
+        self._marks = [RoomID(roomid) for roomid in state.get("marks", [])]
+
+    def _save(self):
+        if self.path is None:
+            return
+        state = {"rooms": self._rooms, "marks": self._marks}
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            # Losing the index only costs a longer refresh later
+            pass
+
+    def get(self, key: str) -> Optional[RoomID]:
+        with self._lock:
+            return self._rooms.get(key)
+
+    def put(self, key: str, roomid: RoomID):
+        with self._lock:
+            self._rooms[key] = roomid
+            self._save()
+
+    def discard(self, roomid: RoomID):
+        with self._lock:
+            keys = [key for key, value in self._rooms.items() if value == roomid]
+            # A refresh would never meet a deleted mark and read past it
+            marked = roomid in self._marks
+            if len(keys) == 0 and not marked:
+                return
+            for key in keys:
+                del self._rooms[key]
+            self._marks = [mark for mark in self._marks if mark != roomid]
+            self._save()
+
+    def refresh(self, rooms: Iterable[Room]) -> int:
+        """Index the rooms, newest first, up to the first one seen before. Returns how many were read."""
+        with self._lock:
+            marks = set(self._marks)
+            newest: List[RoomID] = []
+            indexed = set()
+            read = 0
+            for room in rooms:
+                if room.ID in marks:
+                    break
+                read += 1
+                if len(newest) < _MARKS:
+                    newest.append(room.ID)
+                key = parse_title(room.Title)
+                if key is not None and key not in indexed:
+                    # The newest room of a case wins
+                    indexed.add(key)
+                    self._rooms[key] = room.ID
+            if read > 0:
+                self._marks = (newest + self._marks)[:_MARKS]
+                self._save()
+            return read
+
+    def find(self, key: str, client: IRoomClient) -> Optional[Room]:
+        """The room of a case, refreshing the index if it is not known yet."""
+        roomid = self.get(key)
+        if roomid is None:
+            self.refresh(client.iter_rooms())
+            roomid = self.get(key)
+        if roomid is None:
+            return None
+        try:
+            # A cached read would return a room deleted within its TTL
+            return uncached(client).get_room(roomid)
+        except Exception as e:
+            # Only a room deleted outside of Cortex is forgotten; on any other error
+            # the job fails rather than open a second room for the case
+            if not is_not_found(e):
+                raise
+            self.discard(roomid)
+            return None
+
+
+__all__ = [o.__name__ for o in [
+    RoomIndex,
+    case_key,
+    is_not_found,
+    uncached,
+    parse_title,
+    default_state_directory,
+    state_file,
+]]
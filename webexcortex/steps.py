@@ -0,0 +1,191 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import dataclasses
+import functools
+import inspect
+import threading
+from typing import Any, Callable, Dict, Generator, List, Optional, Tuple, TypeVar
+
+
+# Threads shared by the step graphs of every job in the process; a step must
+# not wait on a graph of its own, or a busy process could run out of them
+MAX_STEP_WORKERS = 32
+
+R = TypeVar("R")
+
+_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_STEP_WORKERS, thread_name_prefix="webexcortex-step")
+        return _pool
+
+
+@dataclasses.dataclass(frozen=True)
+class Step:
+    """A step of a handler action, called with the results of the steps it runs after."""
+
+    __slots__ = ("name", "fn", "after")
+
+    name: str
+    fn: Callable[..., Any]
+    after: Tuple[str, ...]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"step": self.name, "after": list(self.after)}
+
+
+class StepGraph:
+    """The steps of a handler action and what each one needs, run as soon as that is done.
+
+    Steps only run after steps declared before them, so the graph has no
+    cycles. Independent steps overlap: run hands them to threads shared by the
+    graphs of the process and runs the first one itself, arun starts them as
+    tasks, running coroutine functions on the loop and the rest on those threads. Once a step fails no other step starts; the ones in flight are
+    waited for and the error of the first declared failed step is raised.
+    `started` lists the steps in the order they started, which for a given
+    graph does not depend on timing as long as every step only waits on steps
+    started together.
+    """
+
+    steps: Dict[str, Step]
+    started: List[Step]
+
+    def __init__(self) -> None:
+        self.steps = {}
+        self.started = []
+
+    def add(self, name: str, fn: Callable[..., Any], after: Tuple[str, ...] = ()):
+        if name in self.steps:
+            raise ValueError(f"Step [{name}] is declared twice")
+        for dependency in after:
+            if dependency not in self.steps:
+                raise ValueError(f"Step [{name}] runs after [{dependency}] which is not declared before it")
+        self.steps[name] = Step(name=name, fn=fn, after=tuple(after))
+
+    def _start(self, pending: List[Step], results: Dict[str, Any]) -> List[Step]:
+        ready = [step for step in pending if all(dependency in results for dependency in step.after)]
+        for step in ready:
+            pending.remove(step)
+            self.started.append(step)
+        return ready
+
+    def _args(self, step: Step, results: Dict[str, Any]) -> List[Any]:
+        return [results[dependency] for dependency in step.after]
+
+    async def _await(self, step: Step, args: List[Any]) -> Any:
+        if inspect.iscoroutinefunction(step.fn):
+            return await step.fn(*args)
+        # Blocking steps run on the step threads so they do not hold up the loop
+        context = contextvars.copy_context()
+        result = await asyncio.get_running_loop().run_in_executor(_executor(), functools.partial(context.run, step.fn, *args))
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    def _raise(self, failed: Dict[str, Exception]):
+        if len(failed) > 0:
+            raise failed[next(name for name in self.steps if name in failed)]
+
+    def run(self) -> Dict[str, Any]:
+        """Run the steps, returning the result of each by name."""
+        pending = list(self.steps.values())
+        results: Dict[str, Any] = {}
+        failed: Dict[str, Exception] = {}
+        running: Dict["concurrent.futures.Future[Any]", Step] = {}
+        while len(pending) > 0 or len(running) > 0:
+            ready = self._start(pending, results) if len(failed) == 0 else []
+            if len(ready) > 0:
+                for step in ready[1:]:
+                    # In a copy of the caller's context so tracing spans nest under it
+                    context = contextvars.copy_context()
+                    running[_executor().submit(context.run, step.fn, *self._args(step, results))] = step
+                # The caller would only wait, so it runs the first step itself
+                step = ready[0]
+                try:
+                    results[step.name] = step.fn(*self._args(step, results))
+                except Exception as e:
+                    failed[step.name] = e
+                continue
+            if len(running) == 0:
+                break
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                try:
+                    results[step.name] = future.result()
+                except Exception as e:
+                    failed[step.name] = e
+        self._raise(failed)
+        return results
+
+    async def arun(self) -> Dict[str, Any]:
+        """Run the steps, awaiting what they return, returning the result of each by name."""
+        pending = list(self.steps.values())
+        results: Dict[str, Any] = {}
+        failed: Dict[str, Exception] = {}
+        running: Dict["asyncio.Future[Any]", Step] = {}
+        try:
+            while len(pending) > 0 or len(running) > 0:
+                ready = self._start(pending, results) if len(failed) == 0 else []
+                if len(ready) == 1 and len(running) == 0:
+                    step = ready[0]
+                    try:
+                        results[step.name] = await self._await(step, self._args(step, results))
+                    except Exception as e:
+                        failed[step.name] = e
+                    continue
+                for step in ready:
+                    running[asyncio.ensure_future(self._await(step, self._args(step, results)))] = step
+                if len(running) == 0:
+                    break
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    try:
+                        results[step.name] = future.result()
+                    except Exception as e:
+                        failed[step.name] = e
+        finally:
+            if len(running) > 0:
+                await asyncio.wait(running)
+        self._raise(failed)
+        return results
+
+
+# A handler action: yields the graphs it needs run, one after the other, and
+# returns what it made of their results
+Plan = Generator[StepGraph, Dict[str, Any], R]
+
+
+def run_plan(plan: "Plan[R]") -> R:
+    """Run the graphs of a plan on the calling thread and the step threads."""
+    try:
+        graph = next(plan)
+        while True:
+            graph = plan.send(graph.run())
+    except StopIteration as stop:
+        return stop.value
+
+
+async def arun_plan(plan: "Plan[R]") -> R:
+    """Run the graphs of a plan as tasks of the running loop."""
+    try:
+        graph = next(plan)
+        while True:
+            graph = plan.send(await graph.arun())
+    except StopIteration as stop:
+        return stop.value
+
+
+__all__ = [o.__name__ for o in [
+    Step,
+    StepGraph,
+    arun_plan,
+    run_plan,
+]]
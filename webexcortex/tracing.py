@@ -0,0 +1,206 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+
+T = TypeVar('T')
+
+# Close enough to process start to tell startup cost apart from the job itself
+STARTED = time.perf_counter()
+
+OTEL_ENV = "WEBEXCORTEX_OTEL"
+
+
+class Span:
+    """A timed step. Spans only exist below a trace, so untraced code pays one ContextVar lookup."""
+
+    __slots__ = ("name", "attributes", "start", "end", "children", "_lock", "_otel")
+
+    def __init__(self, name: str, attributes: Dict[str, Any]) -> None:
+        self.name = name
+        self.attributes = attributes
+        self.start = 0.0
+        self.end = 0.0
+        self.children: List["Span"] = []
+        self._lock = threading.Lock()
+        self._otel = None
+
+    @property
+    def ms(self) -> float:
+        return (self.end - self.start) * 1000
+
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+        if self._otel is not None:
+            self._otel.set_attribute(key, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "ms": round(self.ms, 3),
+            "attributes": self.attributes,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Calls and total time per span path, compact enough to put in a report."""
+        totals: Dict[str, Dict[str, Any]] = {}
+
+        def walk(span: "Span", prefix: str):
+            path = f"{prefix}/{span.name}" if prefix else span.name
+            entry = totals.setdefault(path, {"calls": 0, "ms": 0.0})
+            entry["calls"] += 1
+            entry["ms"] += span.ms
+            for child in span.children:
+                walk(child, path)
+
+        walk(self, "")
+        for entry in totals.values():
+            entry["ms"] = round(entry["ms"], 3)
+        return totals
+
+
+_current: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("webexcortex_span", default=None)
+
+
+def _otel_tracer():
+    if os.environ.get(OTEL_ENV, "") in ("", "0"):
+        return None
+    try:
+        from opentelemetry import trace as otel_trace
+    except ImportError:
+        return None
+    return otel_trace.get_tracer("webexcortex")
+
+
+class _SpanContext:
+
+    __slots__ = ("span", "parent", "_token", "_otel_context")
+
+    def __init__(self, span: Span, parent: Optional[Span]) -> None:
+        self.span = span
+        self.parent = parent
+        self._token = None
+        self._otel_context = None
+
+    def __enter__(self) -> Span:
+        otel = _otel_tracer()
+        if otel is not None:
+            self._otel_context = otel.start_as_current_span(self.span.name, attributes=dict(self.span.attributes))
+            self.span._otel = self._otel_context.__enter__()
+        self._token = _current.set(self.span)
+        self.span.start = time.perf_counter()
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.end = time.perf_counter()
+        _current.reset(self._token)
+        if exc is not None:
+            self.span.set("error", type(exc).__name__)
+        if self.parent is not None:
+            with self.parent._lock:
+                self.parent.children.append(self.span)
+        if self._otel_context is not None:
+            self._otel_context.__exit__(exc_type, exc, tb)
+        return False
+
+
+class _NoSpan:
+    """Shared do-nothing context used when no trace is active."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, key: str, value: Any):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str, **attributes: Any):
+    parent = _current.get()
+    if parent is None:
+        return _NO_SPAN
+    return _SpanContext(Span(name, attributes), parent)
+
+
+_startup_reported = False
+
+
+def trace(name: str, **attributes: Any) -> _SpanContext:
+    """Start a root span; everything below it in this context is recorded."""
+    global _startup_reported
+    root = Span(name, attributes)
+    if not _startup_reported:
+        # Only the first job of a process pays for starting it
+        _startup_reported = True
+        root.set("startup_ms", round((time.perf_counter() - STARTED) * 1000, 3))
+    return _SpanContext(root, _current.get())
+
+
+def traced(name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    def decorator(fn: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _traced_iter(name: str, items: Iterable[T]) -> Iterator[T]:
+    # The span covers reading the items, but is never made current: the reader
+    # runs its own code between items
+    parent = _current.get()
+    if parent is None:
+        yield from items
+        return
+    s = Span(name, {})
+    s.start = time.perf_counter()
+    try:
+        yield from items
+    finally:
+        s.end = time.perf_counter()
+        with parent._lock:
+            parent.children.append(s)
+
+
+class Traced:
+    """Proxy for a RoomsAPI/MembershipsAPI with a span around every call."""
+
+    def __init__(self, api: Any, prefix: str) -> None:
+        self._api = api
+        self._prefix = prefix
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._api, name)
+        if not callable(attr):
+            return attr
+        if name == 'list':
+            return lambda *args, **kwargs: _traced_iter(f"{self._prefix}.{name}", attr(*args, **kwargs))
+        return traced(f"{self._prefix}.{name}")(attr)
+
+
+def timings(root: Span) -> Dict[str, Any]:
+    return {"timings": root.summary()}
+
+
+__all__ = [o.__name__ for o in [
+    Span,
+    Traced,
+    span,
+    trace,
+    traced,
+    timings,
+]]
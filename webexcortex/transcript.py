@@ -0,0 +1,176 @@
+import contextvars
+import dataclasses
+import gzip
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+from .client import MESSAGE_PAGE_SIZE
+from .datatypes import Message, Room
+from .tracing import traced
+
+
+T = TypeVar('T')
+
+# Messages read ahead of the writer: the page being written and the next one
+PREFETCH = 2 * MESSAGE_PAGE_SIZE
+
+# Messages handed over at once; divides the page size, so a batch never waits on the next page
+_BATCH = 100
+
+
+class _End:
+    __slots__ = ("error",)
+
+    def __init__(self, error: Optional[Exception] = None) -> None:
+        self.error = error
+
+
+def prefetch(items: Iterable[T], depth: int = PREFETCH) -> Iterator[T]:
+    """Iterate items on a background thread, at most depth ahead of the reader.
+
+    Webex pages transcripts with a cursor, so the pages of one listing cannot be
+    requested at once; reading ahead lets the next page download while the
+    current one is being compressed.
+    """
+    batch = min(_BATCH, depth)
+    pending: "queue.Queue[Any]" = queue.Queue(maxsize=max(depth // batch, 1))
+    stopped = threading.Event()
+
+    def put(item: Any) -> bool:
+        while not stopped.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def pump():
+        chunk: List[T] = []
+        try:
+            for item in items:
+                chunk.append(item)
+                if len(chunk) == batch:
+                    if not put(chunk):
+                        return
+                    chunk = []
+        except Exception as e:
+            if chunk and not put(chunk):
+                return
+            put(_End(e))
+            return
+        if chunk and not put(chunk):
+            return
+        put(_End())
+
+    # The reader's context, so the spans of the listing nest under the export
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(pump,), daemon=True).start()
+    try:
+        while True:
+            chunk = pending.get()
+            if isinstance(chunk, _End):
+                if chunk.error is not None:
+                    raise chunk.error
+                return
+            yield from chunk
+    finally:
+        stopped.set()
+
+
+@dataclasses.dataclass(frozen=True)
+class Transcript:
+    """Where the transcript of a room was written, and what it holds."""
+
+    __slots__ = ("path", "messages", "files", "bytes", "sha256")
+
+    path: str
+    messages: int
+    files: int
+    bytes: int
+    sha256: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "messages": self.messages,
+            "files": self.files,
+            "bytes": self.bytes,
+            "sha256": self.sha256,
+        }
+
+
+class _Hashing:
+    """File wrapper counting and hashing what is written, so the artifact is not read back."""
+
+    def __init__(self, f) -> None:
+        self.f = f
+        self.bytes = 0
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data: bytes) -> int:
+        self.bytes += len(data)
+        self.sha256.update(data)
+        return self.f.write(data)
+
+    def flush(self):
+        self.f.flush()
+
+
+class Transcripts:
+    """Writes room transcripts as gzip compressed JSON lines to a directory.
+
+    The first line describes the room, every other line is a message, newest
+    first. The file is written under a temporary name and only appears once it
+    is complete.
+    """
+
+    directory: str
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    def _path(self, room: Room, now: float) -> str:
+        digest = hashlib.sha256(room.ID.encode()).hexdigest()[:16]
+        stamp = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime(now))
+        return os.path.join(self.directory, f"{digest}-{stamp}.jsonl.gz")
+
+    @traced("transcript.export")
+    def export(self, room: Room, messages: Iterable[Message]) -> Transcript:
+        now = time.time()
+        path = self._path(room, now)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        os.makedirs(self.directory, exist_ok=True)
+
+        count = files = 0
+        try:
+            with open(tmp, "wb") as raw:
+                hashing = _Hashing(raw)
+                with gzip.GzipFile(fileobj=hashing, mode="wb", compresslevel=6, mtime=int(now)) as f:
+                    header = {"room": room.to_dict(), "exported": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now))}
+                    f.write(json.dumps(header, ensure_ascii=False).encode() + b"\n")
+                    for message in prefetch(messages):
+                        f.write(json.dumps(message.to_dict(), ensure_ascii=False).encode() + b"\n")
+                        count += 1
+                        files += len(message.Files)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+        return Transcript(path=path, messages=count, files=files, bytes=hashing.bytes, sha256=hashing.sha256.hexdigest())
+
+
+__all__ = [o.__name__ for o in [
+    Transcript,
+    Transcripts,
+    prefetch,
+]]
@@ -0,0 +1,130 @@
+import hashlib
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import requests.adapters
+
+from . import metrics
+from .client import DEFAULT_MAX_WORKERS
+from .ratelimit import limit_pages
+
+
+# Room for the member fan-out of a few jobs running at once on the same bot
+DEFAULT_POOL_SIZE = DEFAULT_MAX_WORKERS * 4
+
+
+class PooledAdapter(requests.adapters.HTTPAdapter):
+    """Keep-alive connection pool that counts how often a connection was reused."""
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE) -> None:
+        # Webex is a single host, so one pool per scheme is enough
+        super().__init__(pool_connections=2, pool_maxsize=pool_size, max_retries=0, pool_block=False)
+        self.pool_size = pool_size
+        self._lock = threading.Lock()
+        self._counted = (0, 0)
+
+    def _totals(self) -> Tuple[int, int]:
+        requests = connections = 0
+        pools = self.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                requests += pool.num_requests
+                connections += pool.num_connections
+        return requests, connections
+
+    def stats(self) -> Dict[str, int]:
+        requests, connections = self._totals()
+        return {
+            "pool_size": self.pool_size,
+            "requests": requests,
+            "connections": connections,
+            "reused": max(0, requests - connections),
+        }
+
+    def send(self, request, *args, **kwargs):
+        try:
+            return super().send(request, *args, **kwargs)
+        finally:
+            self._count()
+
+    def _count(self):
+        with self._lock:
+            requests, connections = self._totals()
+            counted_requests, counted_connections = self._counted
+            # An evicted pool takes its counts along, so never count backwards
+            metrics.inc("webexcortex_http_requests_total", max(0, requests - counted_requests))
+            metrics.inc("webexcortex_http_connections_total", max(0, connections - counted_connections))
+            self._counted = (requests, connections)
+
+
+_http2 = False
+
+
+def enable_http2() -> bool:
+    """Switch urllib3 to HTTP/2 where the server offers it; needs urllib3>=2.3 with h2."""
+    global _http2
+    if not _http2:
+        try:
+            import urllib3.http2
+            urllib3.http2.inject_into_urllib3()
+        except ImportError:
+            return False
+        _http2 = True
+    return True
+
+
+_pool_size = DEFAULT_POOL_SIZE
+
+
+def set_pool_size(pool_size: int):
+    """Pool size for the APIs created from now on, e.g. jobs run at once times DEFAULT_MAX_WORKERS."""
+    global _pool_size
+    _pool_size = pool_size
+
+
+_apis: Dict[Tuple[str, Optional[str]], Any] = {}
+_adapters: Dict[Tuple[str, Optional[str]], PooledAdapter] = {}
+_apis_lock = threading.Lock()
+
+
+def shared_api(token: str, base_url: Optional[str] = None, pool_size: Optional[int] = None):
+    """One WebexTeamsAPI, and so one connection pool, per bot token for the life of the process."""
+    import webexteamssdk
+
+    key = (token, base_url)
+    with _apis_lock:
+        api = _apis.get(key)
+        if api is None:
+            options = {}
+            if base_url is not None:
+                options["base_url"] = base_url
+            # 429s are handled by the shared limiter instead of sleeping inside the SDK
+            api = webexteamssdk.WebexTeamsAPI(access_token=token, wait_on_rate_limit=False, **options)
+            limit_pages(api._session)
+            adapter = PooledAdapter(pool_size or _pool_size)
+            session = api._session._req_session
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _apis[key] = api
+            _adapters[key] = adapter
+        return api
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    """Connection reuse per bot, keyed by the base URL and a digest of the token."""
+    with _apis_lock:
+        adapters = list(_adapters.items())
+    return {
+        f"{base_url or 'default'} {hashlib.sha256(token.encode()).hexdigest()[:8]}": adapter.stats()
+        for (token, base_url), adapter in adapters
+    }
+
+
+__all__ = [o.__name__ for o in [
+    PooledAdapter,
+    enable_http2,
+    set_pool_size,
+    shared_api,
+    stats,
+]]